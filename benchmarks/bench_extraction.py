@@ -0,0 +1,163 @@
+"""
+页面提取微基准
+对 benchmarks/fixtures 中保存的 Nitter 页面，比较:
+- tweet_extractor (lxml + 每条目单次遍历)
+- 旧实现 (BeautifulSoup html.parser + 逐个 select)，需要安装 beautifulsoup4，未安装时只测新引擎
+同时核对两者提取出的推文字段是否一致
+
+用法: python benchmarks/bench_extraction.py [--rounds 200]
+"""
+import os
+import sys
+import time
+import argparse
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tweet_extractor import extract_timeline, extract_status, absolute_url, get_original_image_url
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+INSTANCE = 'https://nitter.example.com'
+COMPARED_FIELDS = ('tweet_id', 'content', 'published', 'author', 'is_pinned', 'is_retweet', 'images', 'video_url', 'poster')
+
+
+def legacy_extract_item(item, instance):
+    """旧实现的提取逻辑 (select 版)，仅用于对照"""
+    images = []
+    for img in item.select('.attachment.image img, .tweet-image img, .still-image img, .attachments img'):
+        if any(c in str(img.parent.get('class', [])) for c in ['avatar', 'profile']):
+            continue
+        src = img.get('src', '')
+        if src and 'emoji' not in src.lower() and 'hashtag_click' not in src:
+            images.append(get_original_image_url(absolute_url(src, instance)))
+
+    video_url = poster = None
+    video_tag = item.select_one('video')
+    if video_tag:
+        data_url = video_tag.get('data-url', '')
+        if data_url.startswith('/video/'):
+            parts = data_url.split('/', 3)
+            if len(parts) > 3:
+                video_url = unquote(parts[3])
+        elif data_url:
+            video_url = absolute_url(data_url, instance)
+        if not video_url and video_tag.get('src', ''):
+            video_url = absolute_url(video_tag['src'], instance)
+        if video_tag.get('poster', ''):
+            poster = get_original_image_url(absolute_url(video_tag['poster'], instance))
+    if not video_url:
+        source = item.select_one('video source')
+        if source and source.get('src', ''):
+            video_url = absolute_url(source['src'], instance)
+    if not video_url:
+        for link in item.select('a[href*=".mp4"], a[href*=".m3u8"]'):
+            video_url = absolute_url(link['href'], instance)
+            break
+
+    content_el = item.select_one('.tweet-content')
+    link_el = item.select_one('.tweet-link')
+    date_el = item.select_one('.tweet-date a')
+    author_el = item.select_one('.username')
+    link_href = link_el.get('href', '') if link_el else None
+    tweet_id = None
+    if link_href is not None:
+        tweet_id = link_href.split('/status/')[-1].split('#')[0] if '/status/' in link_href else link_href
+    return {
+        'tweet_id': tweet_id,
+        'content': content_el.get_text(strip=True) if content_el else None,
+        'published': date_el.get('title', '') if date_el else 'Unknown Time',
+        'author': author_el.get_text(strip=True) if author_el else None,
+        'is_pinned': item.select_one('.pinned') is not None,
+        'is_retweet': item.select_one('.retweet-header') is not None,
+        'images': images,
+        'video_url': video_url,
+        'poster': poster,
+    }
+
+
+def legacy_timeline(html, instance):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [legacy_extract_item(item, instance) for item in soup.select('.timeline-item')]
+
+
+def legacy_status(html, instance):
+    main = BeautifulSoup(html, 'html.parser').select_one('.main-tweet')
+    return [legacy_extract_item(main, instance)] if main else []
+
+
+def engine_timeline(html, instance):
+    return extract_timeline(html, instance)[0]
+
+
+def engine_status(html, instance):
+    record = extract_status(html, instance)
+    return [record] if record else []
+
+
+def measure(func, html, rounds):
+    """返回 (每页墙钟毫秒, 每页 CPU 毫秒)"""
+    func(html, INSTANCE)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(rounds):
+        func(html, INSTANCE)
+    wall = (time.perf_counter() - wall_start) / rounds * 1000
+    cpu = (time.process_time() - cpu_start) / rounds * 1000
+    return wall, cpu
+
+
+def check_parity(name, engine_records, legacy_records):
+    if len(engine_records) != len(legacy_records):
+        print(f"  ❌ {name}: 条目数不一致 ({len(engine_records)} vs {len(legacy_records)})")
+        return False
+    ok = True
+    for index, (new, old) in enumerate(zip(engine_records, legacy_records)):
+        for field in COMPARED_FIELDS:
+            if new[field] != old[field]:
+                print(f"  ❌ {name} 第 {index} 条 {field}: {new[field]!r} != {old[field]!r}")
+                ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nitter 页面提取微基准')
+    parser.add_argument('--rounds', type=int, default=200, help='每个页面重复解析次数 (默认 200)')
+    args = parser.parse_args()
+
+    cases = [
+        ('timeline.html', engine_timeline, legacy_timeline),
+        ('status.html', engine_status, legacy_status),
+    ]
+    if BeautifulSoup is None:
+        print("未安装 beautifulsoup4，只测量新引擎\n")
+
+    parity_ok = True
+    for filename, engine, legacy in cases:
+        with open(os.path.join(FIXTURES_DIR, filename), 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        records = engine(html, INSTANCE)
+        print(f"{filename} ({len(html) / 1024:.1f} KB, {len(records)} 条推文)")
+        wall, cpu = measure(engine, html, args.rounds)
+        print(f"  lxml 引擎:           {wall:7.2f} ms/页  CPU {cpu:7.2f} ms/页")
+
+        if BeautifulSoup is not None:
+            legacy_wall, legacy_cpu = measure(legacy, html, args.rounds)
+            print(f"  BeautifulSoup 旧实现: {legacy_wall:7.2f} ms/页  CPU {legacy_cpu:7.2f} ms/页  "
+                  f"(提速 {legacy_wall / wall:.1f}x)")
+            if check_parity(filename, records, legacy(html, INSTANCE)):
+                print(f"  ✅ 提取结果与旧实现一致")
+            else:
+                parity_ok = False
+        print()
+
+    return 0 if parity_ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
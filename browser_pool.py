@@ -0,0 +1,182 @@
+"""
+Playwright 浏览器池
+由 main() 持有，在一轮轮询（LOOP_MODE 下跨多轮）内复用同一个 Chromium 进程，
+按需发放已应用 stealth 的预热页面，避免每个抓取目标都冷启动一次浏览器
+"""
+from contextlib import contextmanager, nullcontext
+from playwright.sync_api import sync_playwright
+from playwright_stealth import stealth_sync
+
+
+class PooledPage:
+    """
+    池中的一个槽位: 一个浏览器上下文 + 一个已应用 stealth 的页面
+    block_resources 为 True 时拦截池配置的资源类型 (精简加载)，每次加载前由调用方设置
+    user_agent 为创建上下文时使用的 UA (保存的验证 cookie 需要配合同一个 UA 使用)
+    """
+
+    def __init__(self, context, page, user_agent):
+        self.context = context
+        self.page = page
+        self.user_agent = user_agent
+        self.uses = 0
+        self.block_resources = False
+
+
+class BrowserPool:
+    """
+    浏览器池
+    - 首次 acquire() 时才启动 Chromium，没有抓取任务时不付启动成本
+    - 空闲槽位最多保留 warm_size 个，使用 max_context_uses 次后回收重建
+    - 浏览器崩溃/断开后自动重新启动
+    - blocked_resource_types: 精简加载时中止的资源类型 (image / media / font / stylesheet 等)
+    - timer: 可选的计时函数 timer(stage) -> 上下文管理器，记录浏览器启动 (browser_launch) 和建上下文 (browser_context) 耗时
+    注意: 基于 sync API，只能在创建它的线程中使用
+    """
+
+    def __init__(self, user_agent_factory, warm_size=2, max_context_uses=20, headless=True, blocked_resource_types=(),
+                 timer=None):
+        self.user_agent_factory = user_agent_factory
+        self.timer = timer or (lambda stage: nullcontext())
+        self.warm_size = max(1, warm_size)
+        self.max_context_uses = max(1, max_context_uses)
+        self.headless = headless
+        self.blocked_resource_types = frozenset(blocked_resource_types)
+
+        self._playwright = None
+        self._browser = None
+        self._idle = []
+
+        # 统计信息
+        self.launches = 0
+        self.contexts_created = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _ensure_browser(self):
+        """确保浏览器可用，崩溃时重新启动"""
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+        if self._browser is not None and self._browser.is_connected():
+            return
+
+        if self._browser is not None:
+            print("[浏览器池] ⚠️ 检测到浏览器已断开，正在重新启动...")
+            # 旧浏览器上的上下文已全部失效
+            self._idle.clear()
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+
+        with self.timer('browser_launch'):
+            self._browser = self._playwright.chromium.launch(headless=self.headless)
+        self.launches += 1
+        print(f"[浏览器池] Chromium 已启动 (第 {self.launches} 次)")
+
+    def _new_slot(self, user_agent=None):
+        user_agent = user_agent or self.user_agent_factory()
+        with self.timer('browser_context'):
+            context = self._browser.new_context(
+                user_agent=user_agent,
+                viewport={'width': 1280, 'height': 720}
+            )
+            page = context.new_page()
+            stealth_sync(page)
+        slot = PooledPage(context, page, user_agent)
+        if self.blocked_resource_types:
+            blocked = self.blocked_resource_types
+
+            def handle(route):
+                if slot.block_resources and route.request.resource_type in blocked:
+                    route.abort()
+                else:
+                    route.continue_()
+
+            page.route('**/*', handle)
+        self.contexts_created += 1
+        return slot
+
+    def _close_slot(self, slot):
+        try:
+            slot.context.close()
+        except Exception:
+            pass
+
+    def warm_up(self):
+        """预先创建空闲槽位"""
+        self._ensure_browser()
+        while len(self._idle) < self.warm_size:
+            self._idle.append(self._new_slot())
+
+    def acquire(self, user_agent=None):
+        """
+        取出一个可用槽位
+        user_agent: 需要特定 UA 时 (如复用保存的 cookie) 只取该 UA 的空闲槽位，没有则新建
+        """
+        self._ensure_browser()
+        for slot in [s for s in self._idle if s.page.is_closed()]:
+            self._idle.remove(slot)
+            self._close_slot(slot)
+        for index in range(len(self._idle) - 1, -1, -1):
+            if user_agent is None or self._idle[index].user_agent == user_agent:
+                return self._idle.pop(index)
+        return self._new_slot(user_agent)
+
+    def release(self, slot, discard=False):
+        """
+        归还槽位
+        discard=True 时直接丢弃 (例如页面加载异常，状态不可信)
+        """
+        slot.uses += 1
+        reusable = (
+            not discard
+            and slot.uses < self.max_context_uses
+            and not slot.page.is_closed()
+            and self._browser is not None
+            and self._browser.is_connected()
+            and len(self._idle) < self.warm_size
+        )
+        if reusable:
+            self._idle.append(slot)
+        else:
+            self._close_slot(slot)
+
+    @contextmanager
+    def page(self):
+        """以上下文管理器方式借出页面，异常时丢弃该槽位"""
+        slot = self.acquire()
+        discard = True
+        try:
+            yield slot.page
+            discard = False
+        finally:
+            self.release(slot, discard=discard)
+
+    def close(self):
+        """关闭所有上下文、浏览器和 Playwright"""
+        for slot in self._idle:
+            self._close_slot(slot)
+        self._idle.clear()
+
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+
+        if self.launches:
+            print(f"[浏览器池] 已关闭 (启动 {self.launches} 次，创建上下文 {self.contexts_created} 个)")
@@ -1,20 +1,46 @@
 import os
+import re
+import sys
 import time
+import subprocess
 import random
 import json
+import asyncio
+import urllib.parse
 import requests
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from datetime import datetime
-from playwright.sync_api import sync_playwright
-from playwright_stealth import stealth_sync
-from bs4 import BeautifulSoup
+from playwright.async_api import async_playwright
+from playwright_stealth import stealth_async
 import psycopg2
-from psycopg2.extras import Json
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 from openai import OpenAI
 import cv2
 import tempfile
 import base64
 import shutil
+import hashlib
+from browser_pool import BrowserPool
+from instance_health import InstanceHealth
+from storage_state import StorageStateStore
+from translation_pipeline import TranslationPipeline
+from translation_cache import TranslationCache
+from tweet_writer import TweetWriter, upsert_tweet_rows
+from cover_scanner import CoverScanner
+from video_frames import grab_frame, frame_dhash, open_capture
+from image_cache import ImageUploadCache, content_key, source_key
+from media_workers import MediaWorkerPool
+from job_queue import JobQueue
+from sharding import HashRing
+from poll_scheduler import PollScheduler, posting_interval
+from tweet_extractor import extract_timeline, extract_status
+from run_metrics import RunMetrics
 
 # 加载环境变量
 load_dotenv()
@@ -26,17 +52,143 @@ USERS = [u.strip() for u in USERS_STR.split(',') if u.strip()]
 # DeepSeek API 配置
 DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
 DEEPSEEK_BASE_URL = os.environ.get('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
+DEEPSEEK_MODEL = 'deepseek-chat'
+
+# 批量翻译配置 (TRANSLATION_BATCH_SIZE=1 时关闭流水线，保存时逐条翻译)
+TRANSLATION_BATCH_SIZE = int(os.environ.get('TRANSLATION_BATCH_SIZE', '8'))
+TRANSLATION_BATCH_WAIT = float(os.environ.get('TRANSLATION_BATCH_WAIT', '2'))  # 攒批最长等待时间 (秒)
+TRANSLATION_BATCH_MAX_CHARS = int(os.environ.get('TRANSLATION_BATCH_MAX_CHARS', '6000'))  # 单次请求原文总字符数上限
 
 # Neon Database 配置
 DATABASE_URL = os.environ.get('DATABASE_URL')
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', '4'))  # 连接池最大连接数
+DB_IDLE_CHECK = float(os.environ.get('DB_IDLE_CHECK', '60'))  # 连接空闲超过该秒数后借出前先探活
+DB_BATCH_SIZE = int(os.environ.get('DB_BATCH_SIZE', '20'))  # 批量写入条数，1 表示逐条写入
+DB_FLUSH_INTERVAL = float(os.environ.get('DB_FLUSH_INTERVAL', '5'))  # 批量写入最长间隔 (秒)
+DB_VERIFY_WRITES = os.environ.get('DB_VERIFY_WRITES', 'false').lower() == 'true'  # 写入后核对视频 URL
 
 # 运行模式配置
 LOOP_MODE = os.environ.get('LOOP_MODE', 'false').lower() == 'true'
 INTERVAL = int(os.environ.get('LOOP_INTERVAL', '600'))  # 默认 10 分钟
 
+# 浏览器池配置
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', '2'))  # 保留的预热页面数
+BROWSER_CONTEXT_MAX_USES = int(os.environ.get('BROWSER_CONTEXT_MAX_USES', '20'))  # 单个上下文最多复用次数
+
+# 并发抓取配置 (async Playwright)
+CONCURRENT_MODE = os.environ.get('CONCURRENT_MODE', 'false').lower() == 'true'
+SCRAPE_CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', '4'))  # 同时抓取的目标数
+PER_INSTANCE_CONCURRENCY = int(os.environ.get('PER_INSTANCE_CONCURRENCY', '2'))  # 单个实例同时在途的请求数
+
+# 时间线抓取配置
+# latest: 每个用户只取最新一条非置顶推文；all: 提取页面上所有新推文直到遇到已入库推文
+TIMELINE_MODE = os.environ.get('TIMELINE_MODE', 'latest').lower()
+TIMELINE_MAX_ITEMS = int(os.environ.get('TIMELINE_MAX_ITEMS', '40'))  # all 模式下每个用户最多提取的推文数
+TIMELINE_MAX_PAGES = int(os.environ.get('TIMELINE_MAX_PAGES', '1'))  # all 模式下最多跟随 "Load more" 翻几页 (含第一页)
+
+# HTTP 快速通道配置: 实例未下发验证时直接用 requests 抓取 HTML，跳过浏览器
+HTTP_FAST_PATH = os.environ.get('HTTP_FAST_PATH', 'true').lower() == 'true'
+HTTP_FETCH_TIMEOUT = float(os.environ.get('HTTP_FETCH_TIMEOUT', '10'))  # 秒
+BROWSER_REQUIRED_TTL = float(os.environ.get('BROWSER_REQUIRED_TTL', '86400'))  # 实例被标记为需要浏览器后多久重新尝试 HTTP (秒)
+
+# 精简页面加载配置: 浏览器只需要 HTML，拦截图片/视频/字体/样式请求，等到 DOM 就绪即读取
+LEAN_PAGE_LOAD = os.environ.get('LEAN_PAGE_LOAD', 'true').lower() == 'true'
+LEAN_BLOCKED_RESOURCES = frozenset(
+    t.strip() for t in os.environ.get('LEAN_BLOCKED_RESOURCES', 'image,media,font,stylesheet').split(',') if t.strip()
+)
+FULL_RENDER_INSTANCES = {  # 始终完整渲染的实例 (验证页依赖图片/样式时)
+    i.strip().rstrip('/') for i in os.environ.get('FULL_RENDER_INSTANCES', '').split(',') if i.strip()
+}
+FULL_RENDER_TTL = float(os.environ.get('FULL_RENDER_TTL', '86400'))  # 精简加载验证失败后完整渲染多久 (秒)
+PAGE_READY_TIMEOUT = float(os.environ.get('PAGE_READY_TIMEOUT', '15'))  # 精简加载等待内容选择器的超时 (秒)
+
+# 浏览器验证等待配置: 在页面内轮询 "内容出现 / 验证文字消失"，不再固定 sleep
+CHALLENGE_TIMEOUT = float(os.environ.get('CHALLENGE_TIMEOUT', '25'))  # 单个实例等待验证的最长时间 (秒)
+CHALLENGE_MIN_WAIT = float(os.environ.get('CHALLENGE_MIN_WAIT', '5'))  # 按历史耗时推算的时限下限 (秒)
+CHALLENGE_POLL_MS = int(os.environ.get('CHALLENGE_POLL_MS', '250'))  # 页面内检查间隔 (毫秒)
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 INSTANCES_FILE = os.path.join(BASE_DIR, 'instances.json')
 
+# 翻译缓存配置 (修改翻译提示词时需要同步提升 TRANSLATION_PROMPT_VERSION，使旧缓存失效)
+TRANSLATION_PROMPT_VERSION = 'v1'
+TRANSLATION_CACHE_ENABLED = os.environ.get('TRANSLATION_CACHE', 'true').lower() == 'true'
+TRANSLATION_CACHE_FILE = os.environ.get('TRANSLATION_CACHE_FILE', os.path.join(BASE_DIR, 'translation_cache.db'))
+
+# 封面健康扫描配置 (REPAIR_MODE)
+COVER_SCAN_WORKERS = int(os.environ.get('COVER_SCAN_WORKERS', '16'))  # 并发线程数
+COVER_SCAN_PER_HOST = int(os.environ.get('COVER_SCAN_PER_HOST', '4'))  # 单个域名同时在途的请求数
+COVER_SCAN_RECHECK_AFTER = float(os.environ.get('COVER_SCAN_RECHECK_AFTER', '604800'))  # 检查结果有效期 (秒)，默认 7 天
+COVER_SCAN_FILE = os.environ.get('COVER_SCAN_FILE', os.path.join(BASE_DIR, 'cover_health.json'))
+
+# 视频封面取帧配置
+VIDEO_COVER_STREAMING = os.environ.get('VIDEO_COVER_STREAMING', 'true').lower() == 'true'  # 流式读取 (Range 请求)，不下载整个视频
+VIDEO_COVER_EARLY_KEYFRAME = os.environ.get('VIDEO_COVER_EARLY_KEYFRAME', 'false').lower() == 'true'  # 取开头附近的关键帧而不是正中间
+VIDEO_COVER_EARLY_OFFSET = float(os.environ.get('VIDEO_COVER_EARLY_OFFSET', '1.0'))  # 关键帧最早时间 (秒)，跳过开头黑屏
+
+# 图床上传去重缓存 (相同封面/图片不重复上传)
+IMAGE_CACHE_ENABLED = os.environ.get('IMAGE_CACHE', 'true').lower() == 'true'
+IMAGE_CACHE_FILE = os.environ.get('IMAGE_CACHE_FILE', os.path.join(BASE_DIR, 'image_cache.db'))
+
+# 媒体工作线程配置 (封面检查与生成)
+MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', '2'))  # 0 表示在保存前同步处理
+MEDIA_RETRY_DELAY = float(os.environ.get('MEDIA_RETRY_DELAY', '5'))  # 推文尚未入库时重试更新的间隔 (秒)
+
+# 持久化任务队列配置 (jobs 表，多个进程可共同消费)
+JOB_QUEUE_ENABLED = os.environ.get('JOB_QUEUE', 'false').lower() == 'true'
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '600'))  # 租约时长，超时未完成的任务可被其他进程领取
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE = float(os.environ.get('JOB_RETRY_BASE', '60'))  # 失败重试的基础退避时间 (秒)，每次失败翻倍
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', '7'))  # 已完成任务保留天数
+
+# 分片配置 (多进程 / CI 矩阵横向扩展): 每个进程按一致性哈希只处理属于自己的用户和推文
+SHARD_COUNT = max(1, int(os.environ.get('SHARD_COUNT', '1')))
+SHARD_INDEX = int(os.environ.get('SHARD_INDEX', '0'))
+SHARD_PROCESSES = int(os.environ.get('SHARD_PROCESSES', '0'))  # >1 时在本机启动该数量的子进程，每个处理一个分片
+if not 0 <= SHARD_INDEX < SHARD_COUNT:
+    raise ValueError(f"SHARD_INDEX 必须在 0 到 {SHARD_COUNT - 1} 之间，当前为 {SHARD_INDEX}")
+SHARD_RING = HashRing(SHARD_COUNT)
+
+def shard_file(path):
+    """
+    分片模式下每个分片读写自己的文件 (instance_health.json -> instance_health.shard0.json)
+    各分片进程的状态文件互不覆盖
+    """
+    if SHARD_COUNT == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{SHARD_INDEX}{ext}"
+
+# 自适应轮询配置 (LOOP_MODE): 按账号发帖频率安排下次轮询
+ADAPTIVE_POLLING = os.environ.get('ADAPTIVE_POLLING', 'false').lower() == 'true'
+POLL_MIN_INTERVAL = int(os.environ.get('POLL_MIN_INTERVAL', '300'))  # 最短轮询间隔 (秒)
+POLL_MAX_INTERVAL = int(os.environ.get('POLL_MAX_INTERVAL', '21600'))  # 休眠账号的轮询间隔 (秒)，默认 6 小时
+POLL_RATE_WINDOW_DAYS = int(os.environ.get('POLL_RATE_WINDOW_DAYS', '14'))  # 统计发帖频率的时间窗口 (天)
+POLL_JITTER = float(os.environ.get('POLL_JITTER', '0.1'))  # 间隔随机抖动比例
+POLL_BUDGET_PER_HOUR = int(os.environ.get('POLL_BUDGET_PER_HOUR', '0'))  # 每小时最多轮询账号次数，0 表示不限
+
+# 实例健康记分板配置
+INSTANCE_HEALTH_FILE = os.environ.get('INSTANCE_HEALTH_FILE', os.path.join(BASE_DIR, 'instance_health.json'))
+INSTANCE_HEALTH = InstanceHealth(
+    shard_file(INSTANCE_HEALTH_FILE),
+    half_life=float(os.environ.get('INSTANCE_HEALTH_HALF_LIFE', '21600')),  # 计数衰减半衰期 (秒)，默认 6 小时
+    failure_threshold=int(os.environ.get('INSTANCE_FAILURE_THRESHOLD', '3')),  # 连续失败多少次后熔断
+    cooldown=float(os.environ.get('INSTANCE_COOLDOWN', '600'))  # 首次熔断时长 (秒)
+)
+
+# 浏览器状态持久化: 按实例保存验证通过后的 cookie，之后的上下文 (以及下次运行) 直接带上
+STORAGE_STATE_ENABLED = os.environ.get('STORAGE_STATE_ENABLED', 'true').lower() == 'true'
+STORAGE_STATE_FILE = os.environ.get('STORAGE_STATE_FILE', os.path.join(BASE_DIR, 'browser_state.json'))
+STORAGE_STATE = StorageStateStore(
+    shard_file(STORAGE_STATE_FILE),
+    ttl=float(os.environ.get('STORAGE_STATE_TTL', '43200'))  # 保存的 cookie 使用多久 (秒)，默认 12 小时
+) if STORAGE_STATE_ENABLED else None
+
+# 运行指标: 每轮结束输出各阶段耗时 (JSON 报告 + 直方图摘要)，可选 Prometheus 文本格式
+METRICS_REPORT_FILE = os.environ.get('METRICS_REPORT_FILE', os.path.join(BASE_DIR, 'run_report.json'))  # 留空不写报告
+METRICS_PROMETHEUS_FILE = os.environ.get('METRICS_PROMETHEUS_FILE', '')  # 留空不写
+METRICS = RunMetrics()
+
 # Nitter 实例列表（优先使用支持视频的实例）
 NITTER_INSTANCES = [
     'https://xcancel.com',  # 支持视频 (source tag)
@@ -50,6 +202,23 @@ NITTER_INSTANCES = [
     "https://nitter.space"
 ]
 
+# 浏览器验证页面的特征文本
+CHALLENGE_KEYWORDS = ["Verifying your browser", "Just a moment", "Checking your browser"]
+
+# 页面已加载完成的标志: 除推文内容外，Nitter 的空时间线 (含受保护账号) / 错误面板 (如推文已删除) 也算
+PAGE_DONE_CLASSES = ('timeline-none', 'error-panel')
+_CLASS_ATTR = re.compile(r'''class\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+
+# 在页面内判断验证是否结束: 出现内容选择器，或页面已加载且不再包含验证文字 (如跳转到了错误页)
+# 返回真值时 wait_for_function 结束；验证页跳转时 Playwright 会在新页面上继续执行
+CHALLENGE_WAIT_JS = """([ready, keywords]) => {
+    if (document.querySelector(ready)) return 'ready';
+    if (document.readyState === 'loading' || !document.body) return false;
+    const text = document.title + ' ' + document.body.textContent;
+    if (!document.body.textContent.trim()) return false;
+    return keywords.some(kw => text.includes(kw)) ? false : 'cleared';
+}"""
+
 def get_random_user_agent():
     """获取随机 User-Agent"""
     ua_list = [
@@ -76,97 +245,113 @@ def load_instances():
     print("[系统] 缓存不存在或损坏，采用内置兜底实例列表")
     return NITTER_INSTANCES
 
-def upload_to_imgbb(image_path_or_url):
-    """
-    上传图片到 ImgBB 图床
-    支持本地文件路径或网络 URL
-    需要配置环境变量: IMGBB_API_KEY
-    """
-    api_key = os.environ.get('IMGBB_API_KEY', '').strip()
-    if not api_key:
-        print("[图床] ImgBB 未配置 API Key, 无法上传")
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+def get_image_cache():
+    """获取图床上传去重缓存 (首次使用时创建)，未启用时返回 None"""
+    global _image_cache
+    if not IMAGE_CACHE_ENABLED:
         return None
-    
-    try:
-        # 准备图片数据
-        img_base64 = None
-        
-        # 判断是本地文件还是 URL
-        if os.path.exists(image_path_or_url):
-            print(f"[图床] 正在上传本地文件: {image_path_or_url}")
-            with open(image_path_or_url, "rb") as image_file:
-                img_base64 = base64.b64encode(image_file.read()).decode('utf-8')
-        else:
-            print(f"[图床] 正在从 {image_path_or_url} 下载图片...")
-            img_response = requests.get(image_path_or_url, timeout=30, headers={
-                'User-Agent': get_random_user_agent(),
-                'Referer': 'https://twitter.com/'
-            })
-            img_response.raise_for_status()
-            img_base64 = base64.b64encode(img_response.content).decode('utf-8')
-        
-        # 上传到 ImgBB
-        print("[图床] 正在上传到 ImgBB...")
-        upload_response = requests.post(
+    with _image_cache_lock:
+        if _image_cache is None:
+            _image_cache = ImageUploadCache(
+                IMAGE_CACHE_FILE,
+                db_lookup=lookup_image_uploads_in_db if DATABASE_URL else None,
+                db_store=save_image_uploads_to_db if DATABASE_URL else None
+            )
+        return _image_cache
+
+def lookup_image_uploads_in_db(keys):
+    """按指纹查找数据库中已上传的图床 URL，返回 {键: URL}"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT hash, url FROM image_uploads WHERE hash = ANY(%s)", (list(keys),))
+        rows = cursor.fetchall()
+        cursor.close()
+    return dict(rows)
+
+def save_image_uploads_to_db(entries):
+    """记录 [(键, 图床 URL), ...] 到数据库"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO image_uploads (hash, url) VALUES %s
+            ON CONFLICT (hash) DO UPDATE SET url = EXCLUDED.url
+        """, entries)
+        conn.commit()
+        cursor.close()
+
+def _post_to_imgbb(api_key, image):
+    """调用 ImgBB 上传接口，image 为 base64 编码的图片，返回图床 URL 或 None"""
+    with METRICS.timer('image_upload'):
+        upload_response = get_http_session().post(
             'https://api.imgbb.com/1/upload',
             data={
                 'key': api_key,
-                'image': img_base64
+                'image': image
             },
             timeout=30
         )
         result = upload_response.json()
-        
-        if result.get('success'):
-            url = result['data']['url']
-            print(f"[图床] ImgBB 上传成功: {url}")
-            return url
-        else:
-            print(f"[图床] ImgBB 上传失败: {result}")
-            return None
-    except Exception as e:
-        print(f"[图床] ImgBB 上传异常: {e}")
-        return None
+    
+    if result.get('success'):
+        url = result['data']['url']
+        print(f"[图床] ImgBB 上传成功: {url}")
+        return url
+    print(f"[图床] ImgBB 上传失败: {result}")
+    return None
 
-def extract_video_frame(video_url):
+def upload_image_bytes(data, cache_keys=()):
     """
-    提取视频中间帧并上传到图床
-    返回: 图床 URL 或 None
+    上传内存中的图片到 ImgBB 图床
+    cache_keys: 额外的去重键 (例如视频 URL、同一推文内帧的感知哈希)，内容哈希总会参与去重
     """
-    if not video_url:
+    api_key = os.environ.get('IMGBB_API_KEY', '').strip()
+    if not api_key:
+        print("[图床] ImgBB 未配置 API Key, 无法上传")
         return None
-        
-    temp_video = None
-    temp_image = None
+    
+    cache = get_image_cache()
+    keys = list(cache_keys) + [content_key(data)]
+    if cache:
+        cached = cache.get(keys)
+        if cached:
+            print(f"[图床] 命中上传缓存，跳过上传: {cached}")
+            METRICS.count('image_cache_hits')
+            return cached
     
     try:
-        # 1. 判断是否为 M3U8 流媒体
-        is_m3u8 = '.m3u8' in video_url.lower()
-        
-        if is_m3u8:
-            print(f"[视频] 检测到 M3U8 流媒体，尝试直接在线读取: {video_url[:60]}...")
-            # 对于 M3U8，直接将 URL 传给 OpenCV (需要 FFmpeg 支持)
-            cap = cv2.VideoCapture(video_url)
-        else:
-            print(f"[视频] 正在下载视频以提取封面: {video_url[:60]}...")
-            # 1. 下载视频到临时文件
-            headers = {
-                "User-Agent": get_random_user_agent()
-            }
-            response = requests.get(video_url, stream=True, timeout=60, headers=headers)
+        print(f"[图床] 正在上传到 ImgBB ({len(data) // 1024} KB)...")
+        url = _post_to_imgbb(api_key, base64.b64encode(data).decode('utf-8'))
+    except Exception as e:
+        print(f"[图床] ImgBB 上传异常: {e}")
+        return None
+    
+    if url and cache:
+        cache.put(keys, url)
+    return url
+
+def _download_video_frame(video_url):
+    """下载整个视频到临时文件后取中间帧 (流式读取失败时的兜底)"""
+    temp_video = None
+    try:
+        print(f"[视频] 正在下载视频以提取封面: {video_url[:60]}...")
+        headers = {
+            "User-Agent": get_random_user_agent()
+        }
+        with requests.get(video_url, stream=True, timeout=60, headers=headers) as response:
             if response.status_code != 200:
                 print(f"[视频] 下载失败，状态码: {response.status_code}")
                 return None
                 
             fd, temp_video = tempfile.mkstemp(suffix='.mp4')
             with os.fdopen(fd, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+                for chunk in response.iter_content(chunk_size=65536):
                     f.write(chunk)
-            
-            # 打开临时文件
-            cap = cv2.VideoCapture(temp_video)
-
-        # 2. 使用 OpenCV 提取中间帧
+                    METRICS.count('bytes_downloaded', len(chunk))
+        
+        cap = cv2.VideoCapture(temp_video)
         if not cap.isOpened():
             print(f"[视频] 无法打开视频文件")
             return None
@@ -182,75 +367,91 @@ def extract_video_frame(video_url):
 
         ret, frame = cap.read()
         cap.release()
-        
-        if not ret:
-            print(f"[视频] 读取视频帧失败")
-            return None
-            
-        # 3. 保存帧到临时图片
-        fd_img, temp_image = tempfile.mkstemp(suffix='.jpg')
-        os.close(fd_img) # mkstemp 返回的 fd 需要关闭，因为 cv2.imwrite 使用路径
-        
-        cv2.imwrite(temp_image, frame)
-        print(f"[视频] 成功提取帧到: {temp_image}")
-        
-        # 4. 上传到图床
-        img_url = upload_to_imgbb(temp_image)
-        return img_url
-        
-    except Exception as e:
-        print(f"[视频] 提取封面异常: {e}")
-        return None
+        return frame if ret else None
     finally:
-        # 清理临时文件
         if temp_video and os.path.exists(temp_video):
             try:
                 os.remove(temp_video)
             except:
                 pass
-        if temp_image and os.path.exists(temp_image):
-            try:
-                os.remove(temp_image)
-            except:
-                pass
 
-def get_original_image_url(nitter_url):
-    """尝试从 Nitter 的代理 URL 中还原出 Twitter/X 的原始图片地址"""
-    import urllib.parse
-    import re
+def extract_video_frame(video_url, tweet_id=None):
+    """
+    提取视频封面帧并上传到图床
+    默认流式读取 (只读 moov 和目标帧附近的数据)，失败时才下载整个视频
+    tweet_id: 给出时按 "推文 + 帧感知哈希" 去重 (同一推文经不同实例代理、视频 URL 不同时复用封面)，
+    感知哈希只在同一条推文内复用，不会把相似画面的其他视频的封面拿来用
+    返回: 图床 URL 或 None
+    """
+    if not video_url:
+        return None
+    if not os.environ.get('IMGBB_API_KEY', '').strip():
+        print("[图床] ImgBB 未配置 API Key, 跳过封面生成")
+        return None
+    
+    # 同一视频、同一取帧方式之前上传过就直接复用，不再读取视频
+    video_key = source_key('video', f"{video_url}#{'early' if VIDEO_COVER_EARLY_KEYFRAME else 'middle'}")
+    cache = get_image_cache()
+    if cache:
+        cached = cache.get([video_key])
+        if cached:
+            print(f"[视频] 命中封面缓存，跳过取帧: {cached}")
+            METRICS.count('image_cache_hits')
+            return cached
+    
     try:
-        if 'pbs.twimg.com' in nitter_url:
-            return nitter_url
+        # 1. 判断是否为 M3U8 流媒体 (取帧耗时记为 video_frame，上传单独计时)
+        frame_start = time.perf_counter()
+        is_m3u8 = '.m3u8' in video_url.lower()
+        frame = None
+        
+        if is_m3u8:
+            print(f"[视频] 检测到 M3U8 流媒体，尝试直接在线读取: {video_url[:60]}...")
+            # 对于 M3U8，直接将 URL 传给 OpenCV (需要 FFmpeg 支持)，请求带上正常的 User-Agent
+            cap = open_capture(video_url, get_random_user_agent())
+            if not cap.isOpened():
+                print(f"[视频] 无法打开视频文件")
+                return None
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if frame_count > 1:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count // 2)
+            ret, frame = cap.read()
+            cap.release()
+        else:
+            if VIDEO_COVER_STREAMING:
+                print(f"[视频] 正在流式读取视频封面帧: {video_url[:60]}...")
+                frame = grab_frame(
+                    video_url,
+                    early_keyframe=VIDEO_COVER_EARLY_KEYFRAME,
+                    early_offset=VIDEO_COVER_EARLY_OFFSET,
+                    user_agent=get_random_user_agent(),
+                    session=get_http_session()
+                )
+                if frame is None:
+                    print(f"[视频] 流式读取失败，改为下载整个视频")
+            if frame is None:
+                frame = _download_video_frame(video_url)
+        METRICS.observe('video_frame', time.perf_counter() - frame_start)
+        
+        if frame is None:
+            print(f"[视频] 读取视频帧失败")
+            return None
             
-        # 处理 hex 编码
-        if '/pic/enc/' in nitter_url:
-            enc_part = nitter_url.split('/pic/enc/')[-1].split('?')[0]
-            try:
-                decoded = bytes.fromhex(enc_part).decode('utf-8')
-                if 'pbs.twimg.com' in decoded:
-                    return decoded
-            except:
-                pass
-
-        # 处理标准 Nitter 路径
-        path = urllib.parse.unquote(nitter_url)
+        # 2. 在内存中编码为 JPEG 并直接上传 (按视频 URL、同一推文内的帧感知哈希和内容哈希去重)
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            print(f"[视频] 编码封面失败")
+            return None
+        print(f"[视频] 成功提取封面帧 ({frame.shape[1]}x{frame.shape[0]})")
         
-        if '/media/' in path:
-            media_part = path.split('/media/')[-1].split('?')[0]
-            if '.' in media_part:
-                media_id, ext = media_part.rsplit('.', 1)
-                ext = ext.split('&')[0].split('?')[0]
-                return f"https://pbs.twimg.com/media/{media_id}?format={ext}&name=large"
-
-        if 'pbs.twimg.com' in path:
-            match = re.search(r'(pbs\.twimg\.com/media/[^?&]+)', path)
-            if match:
-                return "https://" + match.group(1)
-
-    except Exception as e:
-        print(f"[图片解析] 还原 URL 失败 {nitter_url}: {e}")
+        keys = [video_key]
+        if tweet_id:
+            keys.append(source_key('dhash', f"{tweet_id}#{frame_dhash(frame)}"))
+        return upload_image_bytes(encoded.tobytes(), keys)
         
-    return nitter_url
+    except Exception as e:
+        print(f"[视频] 提取封面异常: {e}")
+        return None
 
 def check_url_accessibility(url):
     """
@@ -275,390 +476,838 @@ def check_url_accessibility(url):
         headers = {
             "User-Agent": get_random_user_agent()
         }
-        # 设置较短的超时时间 (5秒)，使用 stream=True 只读取响应头
-        response = requests.get(url, stream=True, timeout=10, headers=headers)
+        # 设置较短的超时时间 (10秒)，使用 stream=True 只读取响应头，读完立即释放连接
+        with METRICS.timer('url_check'), get_http_session().get(url, stream=True, timeout=10, headers=headers) as response:
+            status_code = response.status_code
+            content_type = response.headers.get('Content-Type', '').lower()
         
-        if response.status_code == 200:
+        if status_code == 200:
             # 规则2: 检查 Content-Type
-            content_type = response.headers.get('Content-Type', '').lower()
             if not content_type.startswith('image/'):
                 print(f"[访问检查] ⚠️ URL 返回非图片类型 ({content_type}): {url[:60]}...")
                 return False
                 
             return True
         else:
-            print(f"[访问检查] URL 返回非 200 状态码: {response.status_code} - {url[:60]}...")
+            print(f"[访问检查] URL 返回非 200 状态码: {status_code} - {url[:60]}...")
             return False
     except Exception as e:
         print(f"[访问检查] 访问失败: {url[:60]}... 错误: {e}")
         return False
 
-def scrape_nitter_with_playwright(target, dynamic_instances=None):
-    """使用 Playwright 模拟浏览器访问 Nitter 并抓取最新推文"""
-    is_search = target.startswith('search:')
-    keyword = target[7:] if is_search else target
-    
-    instances = dynamic_instances if dynamic_instances else NITTER_INSTANCES.copy()
-    
-    # 随机打乱实例顺序
-    if len(instances) > 5:
-        top_5 = instances[:5]
-        random.shuffle(top_5)
-        others = instances[5:]
-        random.shuffle(others)
-        instances = top_5 + others
-    else:
-        random.shuffle(instances)
-    
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        
-        for instance in instances:
-            try:
-                context = browser.new_context(
-                    user_agent=get_random_user_agent(),
-                    viewport={'width': 1280, 'height': 720}
-                )
-                page = context.new_page()
-                stealth_sync(page)
-                
-                if is_search:
-                    url = f"{instance.rstrip('/')}/search?f=tweets&q={requests.utils.quote(keyword)}"
-                else:
-                    url = f"{instance.rstrip('/')}/{keyword}"
-                
-                print(f"[{target}] 正在加载: {url}")
-                
-                try:
-                    response = page.goto(url, wait_until="networkidle", timeout=45000)
-                    if response and response.status == 403:
-                        print(f"[{target}] 访问 {instance} 被拒 (403 Forbidden)")
-                        context.close()
-                        continue
-                except Exception as e:
-                    print(f"[{target}] 加载 {instance} 超时或失败: {e}")
-                    context.close()
-                    continue
-                
-                # 智能等待浏览器验证
-                challenge_keywords = ["Verifying your browser", "Just a moment", "Checking your browser"]
-                for i in range(5):
-                    content = page.content()
-                    if any(kw in content for kw in challenge_keywords):
-                        print(f"[{target}] 检测到浏览器验证 ({i+1}/5)，尝试等待...")
-                        page.wait_for_timeout(5000)
-                    else:
-                        break
-                
-                soup = BeautifulSoup(page.content(), 'html.parser')
-                items = soup.select('.timeline-item')
-                
-                if not items:
-                    print(f"[{target}] 在实例 {instance} 上未发现推文内容")
-                    context.close()
-                    continue
-                
-                # 扫描前 8 条推文
-                valid_tweets = []
-                for item in items[:8]:
-                    # 检查是否是置顶推文
-                    is_pinned = item.select_one('.pinned') is not None
-                    if is_pinned:
-                        print(f"[{target}] 发现置顶推文，跳过")
-                        continue
-                    
-                    # 检查是否是转发
-                    is_retweet = item.select_one('.retweet-header') is not None
-
-                    # 提取图片
-                    images = []
-                    img_els = item.select('.attachment.image img, .tweet-image img, .still-image img, .attachments img')
-                    for img in img_els:
-                        if any(c in str(img.parent.get('class', [])) for c in ['avatar', 'profile']):
-                            continue
-                            
-                        src = img.get('src', '')
-                        if src:
-                            if src.startswith('//'):
-                                full_src = 'https:' + src
-                            elif src.startswith('/'):
-                                full_src = instance.rstrip('/') + src
-                            else:
-                                full_src = src
-                            
-                            full_src = get_original_image_url(full_src)
-                            
-                            if 'emoji' in src.lower() or 'hashtag_click' in src:
-                                continue
-                                
-                            images.append(full_src)
-
-                    # 提取视频
-                    video_url = None
-                    try:
-                        video_tag = item.select_one('video')
-                        
-                        if video_tag:
-                            # 方法1: 检查 data-url 属性（Nitter 的主要方式）
-                            data_url = video_tag.get('data-url', '')
-                            if data_url:
-                                # data-url 可能是相对路径或包含编码的 URL
-                                if data_url.startswith('/video/'):
-                                    # 格式: /video/ID/https%3A%2F%2F...
-                                    # 提取实际的视频 URL
-                                    parts = data_url.split('/', 3)
-                                    if len(parts) > 3:
-                                        from urllib.parse import unquote
-                                        encoded_url = parts[3]
-                                        video_url = unquote(encoded_url)
-                                        print(f"[{target}] 找到视频 (data-url): {video_url[:80]}...")
-                                elif data_url.startswith('//'):
-                                    video_url = 'https:' + data_url
-                                    print(f"[{target}] 找到视频 (data-url): {video_url[:80]}...")
-                                elif data_url.startswith('/'):
-                                    video_url = instance.rstrip('/') + data_url
-                                    print(f"[{target}] 找到视频 (data-url): {video_url[:80]}...")
-                                else:
-                                    video_url = data_url
-                                    print(f"[{target}] 找到视频 (data-url): {video_url[:80]}...")
-                            
-                            # 方法2: 检查 src 属性
-                            if not video_url:
-                                v_src = video_tag.get('src', '')
-                                if v_src:
-                                    if v_src.startswith('//'):
-                                        video_url = 'https:' + v_src
-                                    elif v_src.startswith('/'):
-                                        video_url = instance.rstrip('/') + v_src
-                                    else:
-                                        video_url = v_src
-                                    print(f"[{target}] 找到视频 (src): {video_url[:80]}...")
-                            
-                            # 提取封面图
-                            poster = video_tag.get('poster', '')
-                            if poster:
-                                if poster.startswith('//'):
-                                    full_poster = 'https:' + poster
-                                elif poster.startswith('/'):
-                                    full_poster = instance.rstrip('/') + poster
-                                else:
-                                    full_poster = poster
-                                full_poster = get_original_image_url(full_poster)
-                                
-                                # 验证封面图是否可访问
-                                if check_url_accessibility(full_poster):
-                                    if full_poster not in images:
-                                        images.append(full_poster)
-                                        poster_added = True
-                                else:
-                                    print(f"[{target}] ⚠️ 封面图无法访问，跳过: {full_poster}")
-                        
-                        # 方法3: 检查 video source 标签
-                        if not video_url:
-                            video_source = item.select_one('video source')
-                            if video_source:
-                                v_src = video_source.get('src', '')
-                                if v_src:
-                                    if v_src.startswith('//'):
-                                        video_url = 'https:' + v_src
-                                    elif v_src.startswith('/'):
-                                        video_url = instance.rstrip('/') + v_src
-                                    else:
-                                        video_url = v_src
-                                    print(f"[{target}] 找到视频 (source): {video_url[:80]}...")
-                        
-                        # 方法4: 查找视频链接
-                        if not video_url:
-                            video_links = item.select('a[href*=".mp4"], a[href*=".m3u8"]')
-                            for link in video_links:
-                                href = link.get('href', '')
-                                if href and ('.mp4' in href or '.m3u8' in href):
-                                    if href.startswith('//'):
-                                        video_url = 'https:' + href
-                                    elif href.startswith('/'):
-                                        video_url = instance.rstrip('/') + href
-                                    else:
-                                        video_url = href
-                                    print(f"[{target}] 找到视频 (link): {video_url[:80]}...")
-                                    break
-                        
-                        # [通用逻辑] 如果没有封面图(或它是空的)，且有视频链接，尝试生成
-                        # 此时 poster_added 变量可能未定义(如果没进方法1)，需要重新判断
-                        has_poster = False
-                        # 简单检查 images 列表里是否已有图片，且视频存在
-                        # 注意：推文可能有多张图，这里假定如果 images 为空或者只有头像（已过滤），且有视频，则需要封面
-                        # 更严谨的做法是：如果 poster_added 为 True，或者 images 不为空
-                        
-                        # 重新计算 poster_added 状态
-                        if 'poster_added' not in locals():
-                            poster_added = False
-                            
-                        if not poster_added and video_url:
-                            # 再次检查 images 列表，防止重复添加
-                            if not images: 
-                                print(f"[{target}] ⚠️ 视频没有封面图，尝试生成...")
-                                generated_poster = extract_video_frame(video_url)
-                                if generated_poster:
-                                    if generated_poster not in images:
-                                        images.append(generated_poster)
-                                    print(f"[{target}] ✅ 视频封面生成成功: {generated_poster}")
-                        
-                        # 如果仍未找到，记录调试信息
-                        if not video_url:
-                            has_video_indicator = item.select_one('.video-container, .video-overlay, video')
-                            if has_video_indicator:
-                                print(f"[{target}] 检测到视频但未能提取 URL")
-                                
-                    except Exception as e:
-                        print(f"[{target}] 视频提取异常: {e}")
-
-                    # 提取关键信息
-                    content_el = item.select_one('.tweet-content')
-                    link_el = item.select_one('.tweet-link')
-                    date_el = item.select_one('.tweet-date a')
-                    author_el = item.select_one('.username')
+def build_pending_media(video_url, poster, images):
+    """
+    解析页面时不做网络请求，只生成待处理媒体标记:
+    有候选封面需要检查可访问性，或视频没有任何图片需要生成封面
+    """
+    if not video_url or (not poster and images):
+        return None
+    return {'video_url': video_url, 'poster': poster}
 
-                    if not content_el or not link_el:
-                        continue
+def resolve_tweet_media(video_url, poster, images, tweet_id=None):
+    """
+    处理待定媒体，返回新的图片列表:
+    候选封面可访问时加入，否则在没有任何图片时从视频提取封面
+    """
+    images = list(images or [])
+    poster_added = False
+    if poster:
+        if check_url_accessibility(poster):
+            if poster not in images:
+                images.append(poster)
+                poster_added = True
+        else:
+            print(f"[媒体] ⚠️ 封面图无法访问，跳过: {poster}")
+    
+    if not poster_added and video_url and not images:
+        print(f"[媒体] ⚠️ 视频没有封面图，尝试生成...")
+        generated_poster = extract_video_frame(video_url, tweet_id)
+        if generated_poster:
+            images.append(generated_poster)
+            print(f"[媒体] ✅ 视频封面生成成功: {generated_poster}")
+    return images
 
-                    # 提取推文 ID
-                    link_href = link_el.get('href', '')
-                    tweet_id = link_href.split('/status/')[-1].split('#')[0] if '/status/' in link_href else link_href
-
-                    tweet_data = {
-                        'content': content_el.get_text(strip=True),
-                        'link': instance.rstrip('/') + link_href,
-                        'published': date_el.get('title', '') if date_el else 'Unknown Time',
-                        'author': author_el.get_text(strip=True) if author_el else keyword,
-                        'guid': tweet_id,
-                        'is_retweet': is_retweet,
-                        'images': images,
-                        'video_url': video_url
-                    }
-                    valid_tweets.append(tweet_data)
-                    
-                    if len(valid_tweets) >= 1:
-                        break
+def resolve_pending_media_inline(tweet):
+    """没有媒体工作线程时在保存前同步处理待定媒体"""
+    pending = tweet.pop('pending_media', None)
+    if pending:
+        tweet['images'] = resolve_tweet_media(pending['video_url'], pending.get('poster'), tweet.get('images'), tweet.get('guid'))
 
-                if valid_tweets:
-                    tweet = valid_tweets[0]
-                    retweet_tag = " [转发]" if tweet['is_retweet'] else ""
-                    print(f"[{target}] 成功从 {instance} 抓取{retweet_tag}推文: {tweet['guid']}")
-                    context.close()
-                    browser.close()
-                    return tweet
+def build_tweet_data(record, label, link, fallback_author):
+    """把提取引擎返回的记录转换为推文数据，并记录视频提取结果"""
+    video_url = record['video_url']
+    if video_url:
+        print(f"[{label}] 找到视频 ({record['video_method']}): {video_url[:80]}...")
+    elif record['has_video_indicator']:
+        print(f"[{label}] 检测到视频但未能提取 URL")
+    
+    tweet_data = {
+        'content': record['content'],
+        'link': link,
+        'published': record['published'],
+        'author': record['author'] if record['author'] is not None else fallback_author,
+        'guid': record['tweet_id'],
+        'is_retweet': record['is_retweet'],
+        'images': record['images'],
+        'video_url': video_url
+    }
+    # 封面是否可访问、是否需要生成封面交给媒体处理，这里只记录候选封面
+    pending_media = build_pending_media(video_url, record['poster'], record['images'])
+    if pending_media:
+        tweet_data['pending_media'] = pending_media
+    return tweet_data
 
-                print(f"[{target}] {instance} 页面上未找到符合条件的非置顶推文")
-                context.close()
+def parse_timeline_page(html, instance, target, keyword):
+    """
+    解析 Nitter 时间线页面，返回符合条件的推文列表 (跳过置顶推文)
+    与浏览器无关，同步/异步抓取共用
+    """
+    return scan_timeline_page(html, instance, target, keyword)[0]
 
-            except Exception as e:
-                print(f"[{target}] 访问 {instance} 出错: {e}")
+def scan_timeline_page(html, instance, target, keyword, scan=8, limit=1, known_ids_lookup=None):
+    """
+    扫描 Nitter 时间线页面
+    scan: 最多扫描多少个条目 (None 表示整页)
+    limit: 最多返回多少条推文 (None 表示不限)
+    known_ids_lookup: 可选回调，传入本页推文 ID 列表，返回其中已入库的 ID 集合；
+                      遇到第一条已入库的非转发推文即视为到达高水位，停止扫描
+    返回: (推文列表, 是否到达高水位, "Load more" 链接 或 None)
+    """
+    with METRICS.timer('parse', target, instance):
+        records, next_href = extract_timeline(html, instance, scan=scan)
+    
+    if not records:
+        print(f"[{target}] 在实例 {instance} 上未发现推文内容")
+        return [], False, next_href
+    
+    # 先批量查询哪些推文已入库
+    known_ids = set()
+    if known_ids_lookup:
+        page_ids = [record['tweet_id'] for record in records if record['tweet_id']]
+        known_ids = known_ids_lookup(page_ids) if page_ids else set()
+    
+    valid_tweets = []
+    reached_known = False
+    for record in records:
+        # 检查是否是置顶推文
+        if record['is_pinned']:
+            print(f"[{target}] 发现置顶推文，跳过")
+            continue
+        
+        # 高水位: 转发的可能是很久以前的推文，只跳过不停止
+        if record['tweet_id'] and record['tweet_id'] in known_ids:
+            if record['is_retweet']:
                 continue
+            print(f"[{target}] 到达已入库推文 {record['tweet_id']}，停止扫描")
+            reached_known = True
+            break
         
-        browser.close()
-    return None
+        if record['content'] is None or record['link_href'] is None:
+            continue
+        
+        valid_tweets.append(build_tweet_data(record, target, instance.rstrip('/') + record['link_href'], keyword))
+        
+        if limit and len(valid_tweets) >= limit:
+            break
 
-def translate_with_deepseek(text):
-    """使用 DeepSeek API 翻译文本为中文"""
-    if not text or not text.strip():
-        return ""
+    return valid_tweets, reached_known, next_href
+
+def parse_status_page(html, instance, username, tweet_id, url):
+    """
+    解析 Nitter 单条推文页面 (.main-tweet)，返回推文数据或 None
+    与浏览器无关，同步/异步抓取共用
+    """
+    label = f"{username}/{tweet_id}"
+    with METRICS.timer('parse', label, instance):
+        record = extract_status(html, instance)
+    if record is None:
+        print(f"[{label}] 在 {instance} 上未找到推文")
+        return None
     
-    if not DEEPSEEK_API_KEY:
-        print("[翻译] DeepSeek API Key 未配置，跳过翻译")
+    print(f"[{label}] ✅ 使用实例: {instance}")
+    
+    if record['content'] is None:
+        print(f"[{label}] 推文内容为空")
         return None
     
+    # 单条推文页的链接和 ID 以请求的 URL 为准
+    record = dict(record, tweet_id=tweet_id, is_retweet=False)
+    tweet_data = build_tweet_data(record, label, url, username)
+    images = tweet_data['images']
+    video_url = tweet_data['video_url']
+    
+    # 输出提取摘要
+    print(f"[{label}] " + "=" * 60)
+    print(f"[{label}] 📊 提取摘要:")
+    print(f"[{label}]   - 内容: {tweet_data['content'][:50]}...")
+    print(f"[{label}]   - 图片: {len(images)} 张")
+    if video_url:
+        print(f"[{label}]   - 视频: ✅ {video_url[:80]}...")
+    else:
+        print(f"[{label}]   - 视频: ❌ 未找到")
+    print(f"[{label}] " + "=" * 60)
+    
+    return tweet_data
+
+def order_instances(instances=None, top=None):
+    """
+    按健康得分加权随机排序实例，熔断中的实例排在最后兜底
+    top: 前 top 个实例 (优先实例) 在没有历史记录时获得更高的初始分
+    """
+    instances = list(instances) if instances else NITTER_INSTANCES.copy()
+    return INSTANCE_HEALTH.order(instances, preferred=top or 0)
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """获取共享的 requests.Session (keep-alive 连接池)"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=max(16, SCRAPE_CONCURRENCY * 2))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({
+                'User-Agent': get_random_user_agent(),
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9'
+            })
+            _http_session = session
+        return _http_session
+
+def fetch_nitter_html(url, label, instance, ready_selector):
+    """
+    HTTP 快速通道: 不启动浏览器，直接请求页面 HTML
+    返回 (html, need_browser):
+    - (html, False): 直连成功，页面中已包含 ready_selector 对应的内容，或是空时间线 / 错误面板
+    - (None, True):  需要回退到浏览器 (通道关闭、实例已标记、遇到验证或 403、页面依赖 JS 渲染)
+    - (None, False): 网络错误或超时，跳过该实例
+    只有验证页和 403 会把实例标记为需要浏览器，其余情况只影响本次请求
+    """
+    if not HTTP_FAST_PATH or INSTANCE_HEALTH.needs_browser(instance):
+        return None, True
+    
+    start = time.time()
     try:
-        client = OpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL
-        )
-        
-        print(f"[翻译] 正在翻译文本...")
-        
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一个专业的翻译助手，请将用户提供的文本翻译成简体中文。只返回翻译结果，不要添加任何解释或额外内容。"},
-                {"role": "user", "content": f"请将以下文本翻译成简体中文：\n\n{text}"}
-            ],
-            temperature=1.3,  # 官方推荐翻译场景参数
-            max_tokens=2000
-        )
-        
-        translated = response.choices[0].message.content.strip()
-        print(f"[翻译] 翻译成功")
-        return translated
-        
+        with METRICS.timer('http_fetch', label, instance):
+            response = get_http_session().get(url, timeout=HTTP_FETCH_TIMEOUT)
     except Exception as e:
-        print(f"[翻译] DeepSeek API 调用失败: {e}")
-        return None
+        print(f"[{label}] HTTP 直连 {instance} 失败: {e}")
+        INSTANCE_HEALTH.record_failure(instance, 'timeout')
+        return None, False
+    
+    html = response.text
+    METRICS.count('bytes_downloaded', len(response.content), instance=instance)
+    if response.status_code == 403 or is_challenge_page(html):
+        print(f"[{label}] {instance} 需要浏览器验证 (HTTP {response.status_code})，回退到 Playwright")
+        INSTANCE_HEALTH.mark_needs_browser(instance, BROWSER_REQUIRED_TTL)
+        return None, True
+    
+    if response.status_code != 200:
+        print(f"[{label}] HTTP 直连 {instance} 返回 {response.status_code}")
+        INSTANCE_HEALTH.record_failure(instance, f'http_{response.status_code}')
+        return None, False
+    
+    # 既没有内容也没有空时间线 / 错误面板，可能需要 JS 渲染，本次交给浏览器处理
+    if not html_has_class(html, (ready_selector.lstrip('.'),) + PAGE_DONE_CLASSES):
+        print(f"[{label}] {instance} HTTP 页面中没有 {ready_selector}，本次回退到 Playwright")
+        return None, True
+    
+    INSTANCE_HEALTH.record_latency(instance, time.time() - start)
+    METRICS.count('http_fast_path_hits', target=label, instance=instance)
+    print(f"[{label}] ⚡ HTTP 直连 {instance} 成功 ({time.time() - start:.1f}s)")
+    return html, False
 
-def get_db_connection():
-    """获取数据库连接"""
-    if not DATABASE_URL:
-        raise ValueError("DATABASE_URL 环境变量未配置")
+def use_lean_load(instance):
+    """该实例是否使用精简加载 (拦截资源、不等待 networkidle)"""
+    return (
+        LEAN_PAGE_LOAD
+        and instance.rstrip('/') not in FULL_RENDER_INSTANCES
+        and not INSTANCE_HEALTH.needs_full_render(instance)
+    )
+
+def page_ready_selector(ready_selector):
+    """精简加载等待的选择器: 推文内容，或 Nitter 的空时间线 / 错误面板"""
+    return ', '.join([ready_selector] + ['.' + name for name in PAGE_DONE_CLASSES])
+
+def html_has_class(html, names):
+    """HTML 中是否有元素的 class 包含 names 中的任一类名"""
+    names = set(names)
+    return any(names.intersection(match.group(1).split()) for match in _CLASS_ATTR.finditer(html))
+
+def is_challenge_page(html):
+    """页面是否为浏览器验证页 (Cloudflare 等)"""
+    return any(kw in html for kw in CHALLENGE_KEYWORDS)
+
+def begin_challenge_wait(label, instance):
+    """记录一次浏览器验证，返回本实例的等待时限 (秒，按历史通过耗时推算)"""
+    INSTANCE_HEALTH.record_challenge(instance)
+    budget = INSTANCE_HEALTH.challenge_budget(
+        instance, default=CHALLENGE_TIMEOUT, minimum=CHALLENGE_MIN_WAIT, maximum=CHALLENGE_TIMEOUT
+    )
+    print(f"[{label}] 检测到浏览器验证，最多等待 {budget:.0f}s...")
+    return budget
+
+def finish_challenge_wait(label, instance, content, elapsed, lean):
+    """根据等待后的页面判断验证是否通过并记录耗时；未通过时记为失败，精简加载的实例之后改用完整渲染"""
+    METRICS.observe('challenge_wait', elapsed, label, instance)
+    if not is_challenge_page(content):
+        print(f"[{label}] ✅ 浏览器验证通过 ({elapsed:.1f}s)")
+        INSTANCE_HEALTH.record_challenge_clear(instance, elapsed)
+        return True
     
-    return psycopg2.connect(DATABASE_URL)
+    print(f"[{label}] {instance} 浏览器验证未通过 (等待 {elapsed:.1f}s)")
+    forget_browser_state(instance)
+    INSTANCE_HEALTH.record_challenge_timeout(instance)
+    INSTANCE_HEALTH.record_failure(instance, 'challenge')
+    if lean:
+        print(f"[{label}] {instance} 之后改用完整渲染")
+        INSTANCE_HEALTH.mark_needs_full_render(instance, FULL_RENDER_TTL)
+    return False
 
-def save_tweet_to_db(tweet):
-    """保存推文到数据库"""
+def saved_browser_state(instance):
+    """实例保存的浏览器状态 {'user_agent', 'storage_state'}，没有或已过期时返回 None"""
+    return STORAGE_STATE.get(instance) if STORAGE_STATE else None
+
+def remember_browser_state(label, instance, storage_state, user_agent):
+    """页面加载成功后保存该实例的 cookie"""
+    if STORAGE_STATE and STORAGE_STATE.put(instance, storage_state, user_agent):
+        print(f"[{label}] 🍪 已保存 {instance} 的 cookie")
+
+def forget_browser_state(instance):
+    """带着保存的 cookie 仍未通过验证时丢弃，下次重新验证"""
+    if STORAGE_STATE and STORAGE_STATE.forget(instance):
+        print(f"[浏览器状态] 已丢弃 {instance} 的 cookie")
+
+def acquire_slot(pool, label, instance):
+    """
+    为实例借出浏览器槽位
+    有保存的 cookie 时使用同一 UA 的上下文并加入 cookie，已通过的验证不必重做
+    """
+    state = saved_browser_state(instance)
+    if not state:
+        return pool.acquire()
+    slot = pool.acquire(user_agent=state['user_agent'])
+    slot.context.add_cookies(state['storage_state']['cookies'])
+    METRICS.count('cookie_reuse', target=label, instance=instance)
+    print(f"[{label}] 🍪 复用 {instance} 保存的 cookie")
+    return slot
+
+def load_nitter_page(slot, url, label, instance, ready_selector):
+    """
+    加载 Nitter 页面并等待浏览器验证，同时记录实例健康状态
+    精简加载时拦截图片/视频/字体/样式，DOM 就绪后等待 ready_selector 出现即读取
+    返回 (html, page_ok):
+    - html 为 None 表示该实例本次不可用
+    - page_ok 为 False 表示页面状态不可信，应丢弃对应的浏览器槽位
+    """
+    page = slot.page
+    lean = use_lean_load(instance)
+    slot.block_resources = lean
+    print(f"[{label}] 正在加载{'' if lean else ' (完整渲染)'}: {url}")
+    
+    start = time.time()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 翻译推文内容
-        content_zh = translate_with_deepseek(tweet['content'])
-        
-        # 解析发布时间
-        published_at = None
-        if tweet.get('published') and tweet['published'] != 'Unknown Time':
-            try:
-                # 尝试解析时间格式
-                published_at = datetime.strptime(tweet['published'], '%b %d, %Y · %I:%M %p %Z')
-            except:
-                try:
-                    published_at = datetime.fromisoformat(tweet['published'])
-                except:
-                    print(f"[数据库] 无法解析时间格式: {tweet['published']}")
-        
-        # 记录视频 URL 信息
-        video_url = tweet.get('video_url')
-        if video_url:
-            print(f"[数据库] 📹 准备保存视频 URL: {video_url[:100]}...")
-        else:
-            print(f"[数据库] ⚠️  推文没有视频 URL")
-        
-        # 插入或更新推文
-        cursor.execute("""
-            INSERT INTO tweets (tweet_id, author, content, content_zh, published_at, is_retweet, images, video_url, source_url)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (tweet_id) 
-            DO UPDATE SET
-                content = EXCLUDED.content,
-                content_zh = EXCLUDED.content_zh,
-                images = EXCLUDED.images,
-                video_url = EXCLUDED.video_url,
-                source_url = EXCLUDED.source_url,
-                updated_at = CURRENT_TIMESTAMP
-            RETURNING id;
-        """, (
-            tweet['guid'],
-            tweet['author'],
-            tweet['content'],
-            content_zh,
-            published_at,
-            tweet.get('is_retweet', False),
-            Json(tweet.get('images', [])),
-            video_url,
-            tweet.get('link')
-        ))
-        
-        tweet_db_id = cursor.fetchone()[0]
-        conn.commit()
+        with METRICS.timer('page_goto', label, instance):
+            response = page.goto(url, wait_until="domcontentloaded" if lean else "networkidle", timeout=45000)
+        if response and response.status == 403:
+            print(f"[{label}] 访问 {instance} 被拒 (403 Forbidden)")
+            INSTANCE_HEALTH.record_failure(instance, 'forbidden')
+            return None, True
+    except Exception as e:
+        print(f"[{label}] 加载 {instance} 超时或失败: {e}")
+        INSTANCE_HEALTH.record_failure(instance, 'timeout')
+        return None, False
+    
+    content = page.content()
+    cleared = True
+    if is_challenge_page(content):
+        # 等待浏览器验证: 内容出现 / 验证文字消失 / 跳转后的新页面，任一满足即结束
+        budget = begin_challenge_wait(label, instance)
+        waited = time.time()
+        try:
+            page.wait_for_function(
+                CHALLENGE_WAIT_JS, arg=[page_ready_selector(ready_selector), CHALLENGE_KEYWORDS],
+                timeout=budget * 1000, polling=CHALLENGE_POLL_MS
+            )
+        except Exception:
+            pass
+        content = page.content()
+        cleared = finish_challenge_wait(label, instance, content, time.time() - waited, lean)
+    elif lean:
+        try:
+            with METRICS.timer('page_ready', label, instance):
+                page.wait_for_selector(page_ready_selector(ready_selector), timeout=PAGE_READY_TIMEOUT * 1000)
+        except Exception:
+            print(f"[{label}] {instance} 页面未出现 {ready_selector}")
+        content = page.content()
+    
+    INSTANCE_HEALTH.record_latency(instance, time.time() - start)
+    if not cleared:
+        return None, True
+    
+    if STORAGE_STATE:
+        remember_browser_state(label, instance, slot.context.storage_state(), slot.user_agent)
+    return content, True
+
+def create_browser_pool():
+    """按配置创建浏览器池 (Chromium 在首次使用时才启动)"""
+    return BrowserPool(
+        get_random_user_agent,
+        warm_size=BROWSER_POOL_SIZE,
+        max_context_uses=BROWSER_CONTEXT_MAX_USES,
+        blocked_resource_types=LEAN_BLOCKED_RESOURCES if LEAN_PAGE_LOAD else (),
+        timer=METRICS.timer
+    )
+
+def scrape_nitter_with_playwright(target, dynamic_instances=None, pool=None):
+    """
+    使用 Playwright 模拟浏览器访问 Nitter 并抓取最新推文
+    pool: 共享的 BrowserPool；未提供时为本次调用临时创建
+    """
+    if pool is None:
+        with create_browser_pool() as own_pool:
+            return scrape_nitter_with_playwright(target, dynamic_instances, own_pool)
+
+    is_search = target.startswith('search:')
+    keyword = target[7:] if is_search else target
+    
+    instances = order_instances(dynamic_instances, top=5)
+    
+    for attempt, instance in enumerate(instances):
+        if attempt:
+            METRICS.count('instance_retries', target=target)
+        slot = None
+        discard = False
+        try:
+            if is_search:
+                url = f"{instance.rstrip('/')}/search?f=tweets&q={requests.utils.quote(keyword)}"
+            else:
+                url = f"{instance.rstrip('/')}/{keyword}"
+            
+            html, need_browser = fetch_nitter_html(url, target, instance, '.timeline-item')
+            if need_browser:
+                slot = acquire_slot(pool, target, instance)
+                html, page_ok = load_nitter_page(slot, url, target, instance, '.timeline-item')
+                discard = not page_ok
+            if html is None:
+                continue
+            
+            valid_tweets = parse_timeline_page(html, instance, target, keyword)
+
+            if valid_tweets:
+                INSTANCE_HEALTH.record_success(instance)
+                tweet = valid_tweets[0]
+                retweet_tag = " [转发]" if tweet['is_retweet'] else ""
+                print(f"[{target}] 成功从 {instance} 抓取{retweet_tag}推文: {tweet['guid']}")
+                return tweet
+
+            INSTANCE_HEALTH.record_failure(instance, 'empty')
+            print(f"[{target}] {instance} 页面上未找到符合条件的非置顶推文")
+
+        except Exception as e:
+            print(f"[{target}] 访问 {instance} 出错: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'error')
+            discard = True
+            continue
+        finally:
+            if slot:
+                pool.release(slot, discard=discard)
+    
+    return None
+
+def scrape_timeline_with_playwright(target, dynamic_instances=None, pool=None, max_items=None, max_pages=None):
+    """
+    多推文时间线抓取 (TIMELINE_MODE=all)
+    提取页面上所有新推文，直到遇到已入库的推文 (高水位)，可选跟随 "Load more" 翻页
+    返回: 新推文列表 (没有新推文时为空列表)；所有实例都失败时返回 None
+    """
+    if pool is None:
+        with create_browser_pool() as own_pool:
+            return scrape_timeline_with_playwright(target, dynamic_instances, own_pool, max_items, max_pages)
+    
+    is_search = target.startswith('search:')
+    keyword = target[7:] if is_search else target
+    max_items = max_items or TIMELINE_MAX_ITEMS
+    max_pages = max(1, max_pages or TIMELINE_MAX_PAGES)
+    
+    instances = order_instances(dynamic_instances, top=5)
+    
+    for attempt, instance in enumerate(instances):
+        if attempt:
+            METRICS.count('instance_retries', target=target)
+        slot = None
+        discard = False
+        try:
+            if is_search:
+                url = f"{instance.rstrip('/')}/search?f=tweets&q={requests.utils.quote(keyword)}"
+            else:
+                url = f"{instance.rstrip('/')}/{keyword}"
+            
+            collected = {}
+            loaded = False
+            for page_no in range(max_pages):
+                html, need_browser = fetch_nitter_html(url, target, instance, '.timeline-item')
+                if need_browser:
+                    slot = slot or acquire_slot(pool, target, instance)
+                    html, page_ok = load_nitter_page(slot, url, target, instance, '.timeline-item')
+                    discard = not page_ok
+                if html is None:
+                    break
+                
+                tweets, reached_known, next_href = scan_timeline_page(
+                    html, instance, target, keyword,
+                    scan=None,
+                    limit=max_items - len(collected),
+                    known_ids_lookup=get_existing_tweet_ids
+                )
+                loaded = loaded or bool(tweets) or reached_known
+                for tweet in tweets:
+                    collected.setdefault(tweet['guid'], tweet)
+                
+                if reached_known or not next_href or len(collected) >= max_items:
+                    break
+                url = urllib.parse.urljoin(url, next_href)
+                print(f"[{target}] 跟随 Load more 翻页 ({page_no + 2}/{max_pages})")
+            
+            if loaded:
+                INSTANCE_HEALTH.record_success(instance)
+                print(f"[{target}] 成功从 {instance} 抓取 {len(collected)} 条新推文")
+                return list(collected.values())
+            
+            if html is not None:
+                INSTANCE_HEALTH.record_failure(instance, 'empty')
+                print(f"[{target}] {instance} 页面上未找到符合条件的非置顶推文")
+        
+        except Exception as e:
+            print(f"[{target}] 访问 {instance} 出错: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'error')
+            discard = True
+            continue
+        finally:
+            if slot:
+                pool.release(slot, discard=discard)
+    
+    return None
+
+_deepseek_client = None
+_deepseek_client_lock = threading.Lock()
+
+def get_deepseek_client():
+    """获取复用的 DeepSeek (OpenAI 兼容) 客户端"""
+    global _deepseek_client
+    with _deepseek_client_lock:
+        if _deepseek_client is None:
+            _deepseek_client = OpenAI(
+                api_key=DEEPSEEK_API_KEY,
+                base_url=DEEPSEEK_BASE_URL
+            )
+        return _deepseek_client
+
+_translation_cache = None
+_translation_cache_lock = threading.Lock()
+
+def get_translation_cache():
+    """获取翻译缓存 (首次使用时创建)，未启用时返回 None"""
+    global _translation_cache
+    if not TRANSLATION_CACHE_ENABLED:
+        return None
+    with _translation_cache_lock:
+        if _translation_cache is None:
+            _translation_cache = TranslationCache(
+                TRANSLATION_CACHE_FILE,
+                DEEPSEEK_MODEL,
+                TRANSLATION_PROMPT_VERSION,
+                db_lookup=lookup_translations_in_db
+            )
+        return _translation_cache
+
+def lookup_translations_in_db(texts):
+    """按原文 md5 查找数据库中已有的翻译，返回 {原文: 译文}"""
+    if not DATABASE_URL or not texts:
+        return {}
+    
+    by_hash = {hashlib.md5(text.encode('utf-8')).hexdigest(): text for text in texts}
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT ON (md5(content)) md5(content), content_zh
+            FROM tweets
+            WHERE md5(content) = ANY(%s) AND content_zh IS NOT NULL AND content_zh != ''
+        """, (list(by_hash),))
+        rows = cursor.fetchall()
+        cursor.close()
+    
+    return {by_hash[digest]: content_zh for digest, content_zh in rows if digest in by_hash}
+
+def translate_with_deepseek(text, use_cache=True):
+    """
+    使用 DeepSeek API 翻译文本为中文
+    use_cache: 是否查询/写入翻译缓存 (批量翻译已自行处理缓存时传 False)
+    """
+    if not text or not text.strip():
+        return ""
+    
+    cache = get_translation_cache() if use_cache else None
+    if cache:
+        cached = cache.get(text)
+        if cached:
+            print(f"[翻译] 命中翻译缓存，跳过 API 调用")
+            METRICS.count('translation_cache_hits')
+            return cached
+    
+    if not DEEPSEEK_API_KEY:
+        print("[翻译] DeepSeek API Key 未配置，跳过翻译")
+        return None
+    
+    try:
+        client = get_deepseek_client()
+        
+        print(f"[翻译] 正在翻译文本...")
+        
+        with METRICS.timer('translate'):
+            response = client.chat.completions.create(
+                model=DEEPSEEK_MODEL,
+                messages=[
+                    {"role": "system", "content": "你是一个专业的翻译助手，请将用户提供的文本翻译成简体中文。只返回翻译结果，不要添加任何解释或额外内容。"},
+                    {"role": "user", "content": f"请将以下文本翻译成简体中文：\n\n{text}"}
+                ],
+                temperature=1.3,  # 官方推荐翻译场景参数
+                max_tokens=2000
+            )
+        
+        translated = response.choices[0].message.content.strip()
+        print(f"[翻译] 翻译成功")
+        if cache:
+            cache.put(text, translated)
+        return translated
+        
+    except Exception as e:
+        print(f"[翻译] DeepSeek API 调用失败: {e}")
+        return None
+
+def _chunk_texts(indexed_texts, max_chars):
+    """按原文总字符数把 [(序号, 原文)] 切成多批"""
+    chunk, size = [], 0
+    for index, text in indexed_texts:
+        if chunk and size + len(text) > max_chars:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append((index, text))
+        size += len(text)
+    if chunk:
+        yield chunk
+
+def translate_batch_with_deepseek(texts):
+    """
+    批量翻译: 把多条原文连同稳定 ID 打包进一次请求，按 ID 取回译文
+    返回与 texts 等长的列表；批量结果缺失的条目回退为逐条翻译
+    """
+    results = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = ""
+        else:
+            pending.append((i, text))
+    
+    # 先查翻译缓存，只把未命中的原文发给 API
+    cache = get_translation_cache()
+    if cache and pending:
+        cached = cache.get_many([text for _, text in pending])
+        if cached:
+            hits = sum(1 for _, text in pending if text in cached)
+            print(f"[翻译] 命中翻译缓存 {hits} 条")
+            METRICS.count('translation_cache_hits', hits)
+        for index, text in pending:
+            if text in cached:
+                results[index] = cached[text]
+        pending = [(index, text) for index, text in pending if results[index] is None]
+    
+    if not pending:
+        return results
+    
+    if not DEEPSEEK_API_KEY:
+        print("[翻译] DeepSeek API Key 未配置，跳过翻译")
+        return results
+    
+    client = get_deepseek_client()
+    for chunk in _chunk_texts(pending, TRANSLATION_BATCH_MAX_CHARS):
+        if len(chunk) == 1:
+            index, text = chunk[0]
+            results[index] = translate_with_deepseek(text, use_cache=False)
+            if cache:
+                cache.put(text, results[index])
+            continue
         
-        # 验证保存的数据
-        cursor.execute("SELECT video_url FROM tweets WHERE id = %s;", (tweet_db_id,))
-        saved_video_url = cursor.fetchone()[0]
+        payload = [{"id": str(index), "text": text} for index, text in chunk]
+        try:
+            print(f"[翻译] 正在批量翻译 {len(chunk)} 条文本...")
+            with METRICS.timer('translate_batch'):
+                response = client.chat.completions.create(
+                    model=DEEPSEEK_MODEL,
+                    messages=[
+                        {"role": "system", "content": "你是一个专业的翻译助手。用户会提供一个 JSON 数组，每项包含 id 和 text，请将每项的 text 翻译成简体中文。"
+                                                      "只返回 JSON 对象，格式为 {\"translations\": [{\"id\": \"原 id\", \"text\": \"译文\"}]}，不要添加任何解释或额外内容。"},
+                        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=1.3,  # 官方推荐翻译场景参数
+                    max_tokens=8000
+                )
+            data = json.loads(response.choices[0].message.content)
+            chunk_ids = {str(index) for index, _ in chunk}
+            for entry in data.get('translations', []):
+                entry_id = str(entry.get('id', ''))
+                if entry_id in chunk_ids and entry.get('text'):
+                    results[int(entry_id)] = entry['text'].strip()
+            print(f"[翻译] 批量翻译成功")
+        except Exception as e:
+            print(f"[翻译] 批量翻译失败，回退为逐条翻译: {e}")
+        
+        # 批量结果中缺失的条目逐条补译
+        for index, text in chunk:
+            if results[index] is None:
+                results[index] = translate_with_deepseek(text, use_cache=False)
+            if cache:
+                cache.put(text, results[index])
+    
+    return results
+
+def get_db_connection():
+    """获取独立的数据库连接 (调用方负责关闭)"""
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL 环境变量未配置")
+    
+    return psycopg2.connect(DATABASE_URL)
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+_db_last_used = {}
+# ThreadedConnectionPool 耗尽时直接抛错，用信号量让多余的线程排队等待
+_db_pool_slots = threading.BoundedSemaphore(max(1, DB_POOL_MAX))
+
+def get_db_pool():
+    """获取共享的线程安全连接池 (首次使用时创建)"""
+    global _db_pool
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL 环境变量未配置")
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ThreadedConnectionPool(1, max(1, DB_POOL_MAX), DATABASE_URL)
+        return _db_pool
+
+@contextmanager
+def db_connection():
+    """
+    从连接池借出连接，用完自动归还
+    Neon 会断开长时间空闲的连接，借出前对空闲过久的连接做一次探活
+    """
+    pool = get_db_pool()
+    _db_pool_slots.acquire()
+    try:
+        conn = pool.getconn()
+    except Exception:
+        _db_pool_slots.release()
+        raise
+    if conn.closed or time.time() - _db_last_used.get(id(conn), time.time()) > DB_IDLE_CHECK:
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.close()
+            conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            pool.putconn(conn, close=True)
+            try:
+                conn = pool.getconn()
+            except Exception:
+                _db_pool_slots.release()
+                raise
+    
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        broken = broken or conn.closed
+        if not broken:
+            try:
+                # 回滚未提交的事务，保证归还的连接是干净的
+                conn.rollback()
+            except Exception:
+                broken = True
+        _db_last_used[id(conn)] = time.time()
+        pool.putconn(conn, close=broken)
+        _db_pool_slots.release()
+
+def close_db_pool():
+    """关闭连接池中的所有连接"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.closeall()
+            _db_pool = None
+
+def build_tweet_row(tweet, content_zh):
+    """把推文转换为 TWEET_COLUMNS 顺序的数据库行"""
+    # 解析发布时间
+    published_at = None
+    if tweet.get('published') and tweet['published'] != 'Unknown Time':
+        try:
+            # 尝试解析时间格式
+            published_at = datetime.strptime(tweet['published'], '%b %d, %Y · %I:%M %p %Z')
+        except:
+            try:
+                published_at = datetime.fromisoformat(tweet['published'])
+            except:
+                print(f"[数据库] 无法解析时间格式: {tweet['published']}")
+    
+    return (
+        tweet['guid'],
+        tweet['author'],
+        tweet['content'],
+        content_zh,
+        published_at,
+        tweet.get('is_retweet', False),
+        Json(tweet.get('images', [])),
+        tweet.get('video_url'),
+        tweet.get('link'),
+        tweet.get('media_pending', False)
+    )
+
+def _translated_content(tweet):
+    """取推文译文: 已带 content_zh 字段 (例如来自翻译流水线) 时不再重复翻译"""
+    if 'content_zh' in tweet:
+        return tweet['content_zh']
+    return translate_with_deepseek(tweet['content'])
+
+def save_tweet_to_db(tweet):
+    """
+    保存推文到数据库
+    推文已带 content_zh 字段 (例如来自翻译流水线) 时不再重复翻译
+    """
+    try:
+        resolve_pending_media_inline(tweet)
+        # 翻译推文内容 (在连接数据库之前完成，避免 LLM 调用期间占用连接)
+        content_zh = _translated_content(tweet)
+        row = build_tweet_row(tweet, content_zh)
+        
+        # 记录视频 URL 信息
+        video_url = tweet.get('video_url')
+        if video_url:
+            print(f"[数据库] 📹 准备保存视频 URL: {video_url[:100]}...")
+        else:
+            print(f"[数据库] ⚠️  推文没有视频 URL")
+        
+        # 插入或更新推文 (RETURNING 带回已保存的视频 URL，无需额外查询)
+        with METRICS.timer('db_upsert'), db_connection() as conn:
+            tweet_db_id, _, saved_video_url = upsert_tweet_rows(conn, [row])[0]
         
         if saved_video_url:
             print(f"[数据库] ✅ 推文已保存，视频 URL 已存储: {saved_video_url[:100]}...")
@@ -667,9 +1316,6 @@ def save_tweet_to_db(tweet):
             if video_url:
                 print(f"[数据库] ⚠️  警告: 视频 URL 未能保存到数据库！")
         
-        cursor.close()
-        conn.close()
-        
         return True
         
     except Exception as e:
@@ -678,6 +1324,71 @@ def save_tweet_to_db(tweet):
         traceback.print_exc()
         return False
 
+def make_buffered_save(writer):
+    """返回把推文 (翻译后) 交给批量写入器的保存函数，与 save_tweet_to_db 签名一致"""
+    def save(tweet):
+        try:
+            resolve_pending_media_inline(tweet)
+            return writer.add(build_tweet_row(tweet, _translated_content(tweet)))
+        except Exception as e:
+            print(f"[数据库] ❌ 推文 {tweet.get('guid')} 加入写入队列失败: {e}")
+            return False
+    return save
+
+def make_media_save(media_pool, save):
+    """
+    返回把待定媒体交给媒体工作线程的保存函数:
+    推文先带 media_pending 标记入库，工作线程处理完封面后再更新 images
+    """
+    def media_save(tweet):
+        pending = tweet.pop('pending_media', None)
+        if pending:
+            tweet['media_pending'] = True
+        result = save(tweet)
+        if pending:
+            media_pool.submit({
+                'tweet_id': tweet['guid'],
+                'video_url': pending['video_url'],
+                'poster': pending.get('poster'),
+                'images': list(tweet.get('images') or [])
+            })
+        return result
+    return media_save
+
+def update_tweet_media(tweet_id, images):
+    """媒体处理完成后更新推文图片并清除待定标记，返回更新的行数 (0 表示推文尚未入库)"""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE tweets SET images = %s, media_pending = FALSE
+            WHERE tweet_id = %s;
+        """, (Json(images), tweet_id))
+        updated = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    return updated
+
+def requeue_pending_media(media_pool):
+    """把上次运行遗留的待定媒体重新加入队列"""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT tweet_id, video_url, images FROM tweets
+                WHERE media_pending AND video_url IS NOT NULL AND video_url != '';
+            """)
+            rows = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        print(f"[媒体] 查询遗留的待定媒体失败: {e}")
+        return 0
+    
+    for tweet_id, video_url, images in rows:
+        media_pool.submit({'tweet_id': tweet_id, 'video_url': video_url, 'poster': None, 'images': images or []})
+    if rows:
+        print(f"[媒体] 重新排队 {len(rows)} 条遗留的待定媒体")
+    return len(rows)
+
 def parse_tweet_url(url):
     """
     解析推文 URL 提取用户名和推文 ID
@@ -685,7 +1396,6 @@ def parse_tweet_url(url):
     - https://x.com/user/status/123456
     - https://twitter.com/user/status/123456
     """
-    import re
     pattern = r'(?:x\.com|twitter\.com)/([^/]+)/status/(\d+)'
     match = re.search(pattern, url)
     if match:
@@ -717,6 +1427,21 @@ def load_tweet_urls_from_file(filepath='tweets.txt'):
         print(f"[读取配置] 读取文件失败: {e}")
         return []
 
+def get_existing_tweet_ids(tweet_ids):
+    """返回 tweet_ids 中已存在于数据库的 ID 集合，查询失败时返回空集合"""
+    if not tweet_ids:
+        return set()
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT tweet_id FROM tweets WHERE tweet_id = ANY(%s);", (list(tweet_ids),))
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.close()
+        return existing
+    except Exception as e:
+        print(f"[状态检查] 查询已入库推文失败: {e}")
+        return set()
+
 def check_tweet_status(tweet_urls):
     """
     检查推文列表的抓取状态
@@ -737,19 +1462,19 @@ def check_tweet_status(tweet_urls):
         return [], []
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         tweet_ids = [t['tweet_id'] for t in parsed_tweets]
         placeholders = ','.join(['%s'] * len(tweet_ids))
         
-        cursor.execute(f"""
-            SELECT tweet_id, author, created_at, content_zh IS NOT NULL as has_translation
-            FROM tweets
-            WHERE tweet_id IN ({placeholders})
-        """, tweet_ids)
-        
-        scraped_dict = {row[0]: {'author': row[1], 'scraped_at': row[2], 'has_translation': row[3]} for row in cursor.fetchall()}
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT tweet_id, author, created_at, content_zh IS NOT NULL as has_translation
+                FROM tweets
+                WHERE tweet_id IN ({placeholders})
+            """, tweet_ids)
+            
+            scraped_dict = {row[0]: {'author': row[1], 'scraped_at': row[2], 'has_translation': row[3]} for row in cursor.fetchall()}
+            cursor.close()
         
         scraped = []
         pending = []
@@ -765,9 +1490,6 @@ def check_tweet_status(tweet_urls):
             else:
                 pending.append(tweet)
         
-        cursor.close()
-        conn.close()
-        
         return scraped, pending
         
     except Exception as e:
@@ -798,233 +1520,444 @@ def print_status_report(scraped, pending):
     
     print(f"\n{'='*60}\n")
 
-def scrape_tweet_by_id(username, tweet_id, dynamic_instances=None):
-    """根据用户名和推文 ID 抓取指定推文"""
-    instances = dynamic_instances if dynamic_instances else NITTER_INSTANCES.copy()
-    random.shuffle(instances)
+def scrape_tweet_by_id(username, tweet_id, dynamic_instances=None, pool=None):
+    """
+    根据用户名和推文 ID 抓取指定推文
+    pool: 共享的 BrowserPool；未提供时为本次调用临时创建
+    """
+    if pool is None:
+        with create_browser_pool() as own_pool:
+            return scrape_tweet_by_id(username, tweet_id, dynamic_instances, own_pool)
+
+    instances = order_instances(dynamic_instances)
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+    for attempt, instance in enumerate(instances):
+        if attempt:
+            METRICS.count('instance_retries', target=f"{username}/{tweet_id}")
+        slot = None
+        discard = False
+        try:
+            # 构造推文 URL: instance/username/status/tweet_id
+            url = f"{instance.rstrip('/')}/{username}/status/{tweet_id}"
+            label = f"{username}/{tweet_id}"
+            
+            html, need_browser = fetch_nitter_html(url, label, instance, '.main-tweet')
+            if need_browser:
+                slot = acquire_slot(pool, label, instance)
+                html, page_ok = load_nitter_page(slot, url, label, instance, '.main-tweet')
+                discard = not page_ok
+            if html is None:
+                continue
+            
+            tweet_data = parse_status_page(html, instance, username, tweet_id, url)
+            if not tweet_data:
+                INSTANCE_HEALTH.record_failure(instance, 'empty')
+                continue
+            
+            INSTANCE_HEALTH.record_success(instance)
+            return tweet_data
+            
+        except Exception as e:
+            print(f"[{username}/{tweet_id}] 访问 {instance} 出错: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'error')
+            discard = True
+            continue
+        finally:
+            if slot:
+                pool.release(slot, discard=discard)
+    
+    return None
+
+# ==================== 并发抓取 (async Playwright) ====================
+
+async def _async_block_resources(route):
+    if route.request.resource_type in LEAN_BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+async def _async_load_page(browser, url, label, instance, ready_selector):
+    """
+    使用独立的浏览器上下文异步加载页面，并等待浏览器验证结束 (精简加载规则同 load_nitter_page)
+    返回页面 HTML；403 或加载失败时返回 None
+    """
+    lean = use_lean_load(instance)
+    state = saved_browser_state(instance)
+    user_agent = state['user_agent'] if state else get_random_user_agent()
+    with METRICS.timer('browser_context'):
+        context = await browser.new_context(
+            user_agent=user_agent,
+            viewport={'width': 1280, 'height': 720},
+            storage_state=state['storage_state'] if state else None
+        )
+    if state:
+        METRICS.count('cookie_reuse', target=label, instance=instance)
+        print(f"[{label}] 🍪 复用 {instance} 保存的 cookie")
+    try:
+        if lean and LEAN_BLOCKED_RESOURCES:
+            await context.route('**/*', _async_block_resources)
+        page = await context.new_page()
+        await stealth_async(page)
         
-        for instance in instances:
+        print(f"[{label}] 正在加载{'' if lean else ' (完整渲染)'}: {url}")
+        
+        start = time.time()
+        try:
+            with METRICS.timer('page_goto', label, instance):
+                response = await page.goto(url, wait_until="domcontentloaded" if lean else "networkidle", timeout=45000)
+            if response and response.status == 403:
+                print(f"[{label}] 访问 {instance} 被拒 (403 Forbidden)")
+                INSTANCE_HEALTH.record_failure(instance, 'forbidden')
+                return None
+        except Exception as e:
+            print(f"[{label}] 加载 {instance} 超时或失败: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'timeout')
+            return None
+        
+        content = await page.content()
+        cleared = True
+        if is_challenge_page(content):
+            budget = begin_challenge_wait(label, instance)
+            waited = time.time()
             try:
-                context = browser.new_context(
-                    user_agent=get_random_user_agent(),
-                    viewport={'width': 1280, 'height': 720}
+                await page.wait_for_function(
+                    CHALLENGE_WAIT_JS, arg=[page_ready_selector(ready_selector), CHALLENGE_KEYWORDS],
+                    timeout=budget * 1000, polling=CHALLENGE_POLL_MS
                 )
-                page = context.new_page()
-                stealth_sync(page)
-                
-                # 构造推文 URL: instance/username/status/tweet_id
-                url = f"{instance.rstrip('/')}/{username}/status/{tweet_id}"
+            except Exception:
+                pass
+            content = await page.content()
+            cleared = finish_challenge_wait(label, instance, content, time.time() - waited, lean)
+        elif lean:
+            try:
+                with METRICS.timer('page_ready', label, instance):
+                    await page.wait_for_selector(page_ready_selector(ready_selector), timeout=PAGE_READY_TIMEOUT * 1000)
+            except Exception:
+                print(f"[{label}] {instance} 页面未出现 {ready_selector}")
+            content = await page.content()
+        
+        INSTANCE_HEALTH.record_latency(instance, time.time() - start)
+        if not cleared:
+            return None
+        
+        if STORAGE_STATE:
+            remember_browser_state(label, instance, await context.storage_state(), user_agent)
+        return content
+    finally:
+        await context.close()
+
+async def _async_scrape_job(browser, job, instances, instance_limits):
+    """
+    异步抓取单个任务，返回值与同步版本一致:
+    - status 任务: 同 scrape_tweet_by_id
+    - timeline 任务: 同 scrape_nitter_with_playwright (TIMELINE_MODE=all 时同 scrape_timeline_with_playwright)
+    """
+    if job['kind'] == 'timeline' and TIMELINE_MODE == 'all':
+        return await _async_scrape_timeline_all(browser, job['target'], instances, instance_limits)
+    
+    if job['kind'] == 'status':
+        username, tweet_id = job['username'], job['tweet_id']
+        label = f"{username}/{tweet_id}"
+        ordered = order_instances(instances)
+    else:
+        target = job['target']
+        is_search = target.startswith('search:')
+        keyword = target[7:] if is_search else target
+        label = target
+        ordered = order_instances(instances, top=5)
+    
+    for attempt, instance in enumerate(ordered):
+        if attempt:
+            METRICS.count('instance_retries', target=label)
+        if job['kind'] == 'status':
+            url = f"{instance.rstrip('/')}/{username}/status/{tweet_id}"
+        elif is_search:
+            url = f"{instance.rstrip('/')}/search?f=tweets&q={requests.utils.quote(keyword)}"
+        else:
+            url = f"{instance.rstrip('/')}/{keyword}"
+        
+        ready_selector = '.main-tweet' if job['kind'] == 'status' else '.timeline-item'
+        
+        # 限制单个实例同时在途的请求数，避免把同一个实例打挂
+        async with instance_limits[instance]:
+            try:
+                html, need_browser = await asyncio.to_thread(fetch_nitter_html, url, label, instance, ready_selector)
+                if need_browser:
+                    html = await _async_load_page(browser, url, label, instance, ready_selector)
+            except Exception as e:
+                print(f"[{label}] 访问 {instance} 出错: {e}")
+                INSTANCE_HEALTH.record_failure(instance, 'error')
+                continue
+        
+        if not html:
+            continue
+        
+        # 解析 (lxml 遍历、链接解析、时间换算) 是 CPU 操作，放到线程中执行，不阻塞其他抓取协程；
+        # 封面检查和视频抽帧不在这里做，由媒体工作线程 / media 任务在入库后处理
+        try:
+            if job['kind'] == 'status':
+                tweet = await asyncio.to_thread(parse_status_page, html, instance, username, tweet_id, url)
+                if tweet:
+                    INSTANCE_HEALTH.record_success(instance)
+                    return tweet
+            else:
+                valid_tweets = await asyncio.to_thread(parse_timeline_page, html, instance, target, keyword)
+                if valid_tweets:
+                    INSTANCE_HEALTH.record_success(instance)
+                    tweet = valid_tweets[0]
+                    retweet_tag = " [转发]" if tweet['is_retweet'] else ""
+                    print(f"[{target}] 成功从 {instance} 抓取{retweet_tag}推文: {tweet['guid']}")
+                    return tweet
+                print(f"[{target}] {instance} 页面上未找到符合条件的非置顶推文")
+            INSTANCE_HEALTH.record_failure(instance, 'empty')
+        except Exception as e:
+            print(f"[{label}] 解析 {instance} 页面出错: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'error')
+    
+    return None
+
+async def _async_scrape_timeline_all(browser, target, instances, instance_limits):
+    """scrape_timeline_with_playwright 的异步版本"""
+    is_search = target.startswith('search:')
+    keyword = target[7:] if is_search else target
+    
+    for attempt, instance in enumerate(order_instances(instances, top=5)):
+        if attempt:
+            METRICS.count('instance_retries', target=target)
+        if is_search:
+            url = f"{instance.rstrip('/')}/search?f=tweets&q={requests.utils.quote(keyword)}"
+        else:
+            url = f"{instance.rstrip('/')}/{keyword}"
+        
+        collected = {}
+        loaded = False
+        html = None
+        try:
+            for page_no in range(max(1, TIMELINE_MAX_PAGES)):
+                async with instance_limits[instance]:
+                    html, need_browser = await asyncio.to_thread(fetch_nitter_html, url, target, instance, '.timeline-item')
+                    if need_browser:
+                        html = await _async_load_page(browser, url, target, instance, '.timeline-item')
+                if html is None:
+                    break
                 
-                print(f"[{username}/{tweet_id}] 正在加载: {url}")
+                tweets, reached_known, next_href = await asyncio.to_thread(
+                    scan_timeline_page, html, instance, target, keyword,
+                    None, TIMELINE_MAX_ITEMS - len(collected), get_existing_tweet_ids
+                )
+                loaded = loaded or bool(tweets) or reached_known
+                for tweet in tweets:
+                    collected.setdefault(tweet['guid'], tweet)
                 
+                if reached_known or not next_href or len(collected) >= TIMELINE_MAX_ITEMS:
+                    break
+                url = urllib.parse.urljoin(url, next_href)
+                print(f"[{target}] 跟随 Load more 翻页 ({page_no + 2}/{TIMELINE_MAX_PAGES})")
+        except Exception as e:
+            print(f"[{target}] 访问 {instance} 出错: {e}")
+            INSTANCE_HEALTH.record_failure(instance, 'error')
+            continue
+        
+        if loaded:
+            INSTANCE_HEALTH.record_success(instance)
+            print(f"[{target}] 成功从 {instance} 抓取 {len(collected)} 条新推文")
+            return list(collected.values())
+        
+        if html is not None:
+            INSTANCE_HEALTH.record_failure(instance, 'empty')
+            print(f"[{target}] {instance} 页面上未找到符合条件的非置顶推文")
+    
+    return None
+
+async def _scrape_concurrently(jobs, instances, concurrency, per_instance):
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    
+    results = []
+    instance_limits = defaultdict(lambda: asyncio.Semaphore(per_instance))
+    
+    async with async_playwright() as p:
+        with METRICS.timer('browser_launch'):
+            browser = await p.chromium.launch(headless=True)
+        
+        async def worker():
+            while True:
                 try:
-                    response = page.goto(url, wait_until="networkidle", timeout=45000)
-                    if response and response.status == 403:
-                        print(f"[{username}/{tweet_id}] 访问 {instance} 被拒 (403 Forbidden)")
-                        context.close()
-                        continue
-                except Exception as e:
-                    print(f"[{username}/{tweet_id}] 加载 {instance} 超时或失败: {e}")
-                    context.close()
-                    continue
-                
-                # 智能等待浏览器验证
-                challenge_keywords = ["Verifying your browser", "Just a moment", "Checking your browser"]
-                for i in range(5):
-                    content = page.content()
-                    if any(kw in content for kw in challenge_keywords):
-                        print(f"[{username}/{tweet_id}] 检测到浏览器验证 ({i+1}/5)，尝试等待...")
-                        page.wait_for_timeout(5000)
-                    else:
-                        break
-                
-                soup = BeautifulSoup(page.content(), 'html.parser')
-                
-                # 查找主推文内容
-                main_tweet = soup.select_one('.main-tweet')
-                if not main_tweet:
-                    print(f"[{username}/{tweet_id}] 在 {instance} 上未找到推文")
-                    context.close()
-                    continue
-                
-                print(f"[{username}/{tweet_id}] ✅ 使用实例: {instance}")
-                
-                # 提取推文信息（复用原有逻辑）
-                content_el = main_tweet.select_one('.tweet-content')
-                date_el = main_tweet.select_one('.tweet-date a')
-                author_el = main_tweet.select_one('.username')
-                
-                if not content_el:
-                    print(f"[{username}/{tweet_id}] 推文内容为空")
-                    context.close()
-                    continue
-                
-                # 提取图片
-                images = []
-                img_els = main_tweet.select('.attachment.image img, .tweet-image img, .still-image img, .attachments img')
-                for img in img_els:
-                    if any(c in str(img.parent.get('class', [])) for c in ['avatar', 'profile']):
-                        continue
-                    src = img.get('src', '')
-                    if src:
-                        if src.startswith('//'):
-                            full_src = 'https:' + src
-                        elif src.startswith('/'):
-                            full_src = instance.rstrip('/') + src
-                        else:
-                            full_src = src
-                        full_src = get_original_image_url(full_src)
-                        if 'emoji' not in src.lower():
-                            images.append(full_src)
-                
-                # 提取视频
-                video_url = None
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
                 try:
-                    video_tag = main_tweet.select_one('video')
-                    
-                    if video_tag:
-                        # 方法1: 检查 data-url 属性（Nitter 的主要方式）
-                        data_url = video_tag.get('data-url', '')
-                        if data_url:
-                            # data-url 可能是相对路径或包含编码的 URL
-                            if data_url.startswith('/video/'):
-                                # 格式: /video/ID/https%3A%2F%2F...
-                                # 提取实际的视频 URL
-                                parts = data_url.split('/', 3)
-                                if len(parts) > 3:
-                                    from urllib.parse import unquote
-                                    encoded_url = parts[3]
-                                    video_url = unquote(encoded_url)
-                                    print(f"[{username}/{tweet_id}] 找到视频 (data-url): {video_url[:80]}...")
-                            elif data_url.startswith('//'):
-                                video_url = 'https:' + data_url
-                                print(f"[{username}/{tweet_id}] 找到视频 (data-url): {video_url[:80]}...")
-                            elif data_url.startswith('/'):
-                                video_url = instance.rstrip('/') + data_url
-                                print(f"[{username}/{tweet_id}] 找到视频 (data-url): {video_url[:80]}...")
-                            else:
-                                video_url = data_url
-                                print(f"[{username}/{tweet_id}] 找到视频 (data-url): {video_url[:80]}...")
-                        
-                        # 方法2: 检查 src 属性
-                        if not video_url:
-                            v_src = video_tag.get('src', '')
-                            if v_src:
-                                if v_src.startswith('//'):
-                                    video_url = 'https:' + v_src
-                                elif v_src.startswith('/'):
-                                    video_url = instance.rstrip('/') + v_src
-                                else:
-                                    video_url = v_src
-                                print(f"[{username}/{tweet_id}] 找到视频 (src): {video_url[:80]}...")
-                        
-                        # 提取封面图
-                        poster = video_tag.get('poster', '')
-                        if poster:
-                            if poster.startswith('//'):
-                                full_poster = 'https:' + poster
-                            elif poster.startswith('/'):
-                                full_poster = instance.rstrip('/') + poster
-                            else:
-                                full_poster = poster
-                            full_poster = get_original_image_url(full_poster)
-                            
-                            # 验证封面图是否可访问
-                            if check_url_accessibility(full_poster):
-                                if full_poster not in images:
-                                    images.append(full_poster)
-                                    poster_added = True
-                            else:
-                                print(f"[{username}/{tweet_id}] ⚠️ 封面图无法访问，跳过: {full_poster}")
-                    
-                    # 方法3: 检查 video source 标签
-                    if not video_url:
-                        video_source = main_tweet.select_one('video source')
-                        if video_source:
-                            v_src = video_source.get('src', '')
-                            if v_src:
-                                if v_src.startswith('//'):
-                                    video_url = 'https:' + v_src
-                                elif v_src.startswith('/'):
-                                    video_url = instance.rstrip('/') + v_src
-                                else:
-                                    video_url = v_src
-                                print(f"[{username}/{tweet_id}] 找到视频 (source): {video_url[:80]}...")
-                    
-                    # 方法4: 查找视频链接
-                    if not video_url:
-                        video_links = main_tweet.select('a[href*=".mp4"], a[href*=".m3u8"]')
-                        for link in video_links:
-                            href = link.get('href', '')
-                            if href and ('.mp4' in href or '.m3u8' in href):
-                                if href.startswith('//'):
-                                    video_url = 'https:' + href
-                                elif href.startswith('/'):
-                                    video_url = instance.rstrip('/') + href
-                                else:
-                                    video_url = href
-                                print(f"[{username}/{tweet_id}] 找到视频 (link): {video_url[:80]}...")
-                                break
-                    
-                    # [通用逻辑] 如果没有封面图，且有视频链接，尝试生成
-                    if 'poster_added' not in locals():
-                        poster_added = False
-                        
-                    if not poster_added and video_url:
-                         # 再次检查 images 列表
-                        if not images:
-                            print(f"[{username}/{tweet_id}] ⚠️ 视频没有封面图，尝试生成...")
-                            generated_poster = extract_video_frame(video_url)
-                            if generated_poster:
-                                if generated_poster not in images:
-                                    images.append(generated_poster)
-                                print(f"[{username}/{tweet_id}] ✅ 视频封面生成成功: {generated_poster}")
-                    
-                    if not video_url:
-                        # 检查是否有视频指示器
-                        has_video = main_tweet.select_one('.video-container, .video-overlay, video')
-                        if has_video:
-                            print(f"[{username}/{tweet_id}] 检测到视频但未能提取 URL")
-                            
+                    tweet = await _async_scrape_job(browser, job, instances, instance_limits)
                 except Exception as e:
-                    print(f"[{username}/{tweet_id}] 视频提取异常: {e}")
-                
-                tweet_data = {
-                    'content': content_el.get_text(strip=True),
-                    'link': url,
-                    'published': date_el.get('title', '') if date_el else 'Unknown Time',
-                    'author': author_el.get_text(strip=True) if author_el else username,
-                    'guid': tweet_id,
-                    'is_retweet': False,
-                    'images': images,
-                    'video_url': video_url
-                }
-                
-                # 输出提取摘要
-                print(f"[{username}/{tweet_id}] " + "=" * 60)
-                print(f"[{username}/{tweet_id}] 📊 提取摘要:")
-                print(f"[{username}/{tweet_id}]   - 内容: {tweet_data['content'][:50]}...")
-                print(f"[{username}/{tweet_id}]   - 图片: {len(images)} 张")
-                if video_url:
-                    print(f"[{username}/{tweet_id}]   - 视频: ✅ {video_url[:80]}...")
-                else:
-                    print(f"[{username}/{tweet_id}]   - 视频: ❌ 未找到")
-                print(f"[{username}/{tweet_id}] " + "=" * 60)
-                
-                context.close()
-                browser.close()
-                return tweet_data
-                
+                    print(f"[并发] 任务 {job} 处理异常: {e}")
+                    tweet = None
+                results.append((job, tweet))
+        
+        workers = max(1, min(concurrency, len(jobs)))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        await browser.close()
+    
+    return results
+
+def scrape_concurrently(jobs, dynamic_instances=None, concurrency=None, per_instance=None):
+    """
+    使用有界工作池并发抓取多个任务
+    jobs: [{'kind': 'status', 'username': ..., 'tweet_id': ...} 或 {'kind': 'timeline', 'target': ...}]
+    返回: [(job, tweet 或 None), ...]，顺序按完成先后
+    """
+    if not jobs:
+        return []
+    
+    concurrency = concurrency or SCRAPE_CONCURRENCY
+    per_instance = per_instance or PER_INSTANCE_CONCURRENCY
+    print(f"[并发] 开始并发抓取 {len(jobs)} 个任务 (并发数 {concurrency}，单实例上限 {per_instance})")
+    
+    return asyncio.run(_scrape_concurrently(jobs, dynamic_instances, concurrency, per_instance))
+
+def run_concurrent_jobs(jobs, instances, save=save_tweet_to_db):
+    """并发抓取并保存结果"""
+    for job, result in scrape_concurrently(jobs, instances):
+        label = job.get('target') or f"{job['username']}/{job['tweet_id']}"
+        if result is None:
+            print(f"[{label}] 未能抓取到推文")
+            continue
+        
+        # TIMELINE_MODE=all 时时间线任务返回推文列表
+        tweets = result if isinstance(result, list) else [result]
+        if not tweets:
+            print(f"[{label}] 没有新推文")
+        for tweet in tweets:
+            try:
+                save(tweet)
             except Exception as e:
-                print(f"[{username}/{tweet_id}] 访问 {instance} 出错: {e}")
-                continue
+                print(f"[{label}] 处理异常: {e}")
+
+def scrape_job(job, instances, pool):
+    """顺序模式下执行单个抓取任务，返回推文、推文列表或 None"""
+    if job['kind'] == 'status':
+        return scrape_tweet_by_id(job['username'], job['tweet_id'], instances, pool)
+    if TIMELINE_MODE == 'all':
+        return scrape_timeline_with_playwright(job['target'], instances, pool)
+    return scrape_nitter_with_playwright(job['target'], instances, pool)
+
+def make_queue_save(queue, store):
+    """
+    任务队列模式下的保存函数: 推文先不翻译、不处理封面直接入库，
+    翻译和封面分别作为 translate / media 任务入队
+    """
+    def queue_save(tweet):
+        needs_translation = 'content_zh' not in tweet
+        if needs_translation:
+            tweet['content_zh'] = None
+        pending = tweet.pop('pending_media', None)
+        if pending:
+            tweet['media_pending'] = True
         
-        browser.close()
+        result = store(tweet)
+        if not result:
+            return result
+        
+        tweet_id = tweet['guid']
+        if needs_translation:
+            queue.enqueue('translate', [(tweet_id, {'tweet_id': tweet_id})])
+        if pending:
+            queue.enqueue('media', [(tweet_id, {
+                'tweet_id': tweet_id,
+                'video_url': pending['video_url'],
+                'poster': pending.get('poster'),
+                'images': list(tweet.get('images') or [])
+            })])
+        return result
+    return queue_save
+
+def handle_scrape_jobs(jobs, instances, pool, save):
+    """处理一批 scrape_status / scrape_timeline 任务，返回等长的错误列表 (None 表示成功)"""
+    errors = [None] * len(jobs)
+    scrape_jobs = []
+    for index, job in enumerate(jobs):
+        kind = 'status' if job['kind'] == 'scrape_status' else 'timeline'
+        scrape_jobs.append({**job['payload'], 'kind': kind, 'job_index': index})
+    
+    if CONCURRENT_MODE:
+        results = scrape_concurrently(scrape_jobs, instances)
+    else:
+        results = []
+        for scrape in scrape_jobs:
+            try:
+                results.append((scrape, scrape_job(scrape, instances, pool)))
+            except Exception as e:
+                errors[scrape['job_index']] = e
+    
+    for scrape, result in results:
+        label = scrape.get('target') or f"{scrape['username']}/{scrape['tweet_id']}"
+        if result is None:
+            errors[scrape['job_index']] = '未能抓取到推文'
+            continue
+        tweets = result if isinstance(result, list) else [result]
+        if not tweets:
+            print(f"[{label}] 没有新推文")
+        for tweet in tweets:
+            try:
+                if not save(tweet):
+                    errors[scrape['job_index']] = f"推文 {tweet.get('guid')} 保存失败"
+            except Exception as e:
+                errors[scrape['job_index']] = e
+    return errors
+
+def handle_translate_jobs(jobs):
+    """批量翻译已入库的推文并写回 content_zh"""
+    tweet_ids = [job['payload']['tweet_id'] for job in jobs]
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT tweet_id, content FROM tweets WHERE tweet_id = ANY(%s);", (tweet_ids,))
+        contents = dict(cursor.fetchall())
+        cursor.close()
+    
+    found = [tweet_id for tweet_id in dict.fromkeys(tweet_ids) if tweet_id in contents]
+    translations = dict(zip(found, translate_batch_with_deepseek([contents[tweet_id] for tweet_id in found])))
+    
+    updates = [(translations[tweet_id], tweet_id) for tweet_id in found if translations[tweet_id] is not None]
+    if updates:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, """
+                UPDATE tweets SET content_zh = data.content_zh
+                FROM (VALUES %s) AS data (content_zh, tweet_id)
+                WHERE tweets.tweet_id = data.tweet_id;
+            """, updates)
+            conn.commit()
+            cursor.close()
+    
+    errors = []
+    for tweet_id in tweet_ids:
+        if tweet_id not in contents:
+            errors.append('推文尚未入库')
+        elif translations[tweet_id] is None:
+            errors.append('翻译失败')
+        else:
+            errors.append(None)
+    return errors
+
+def _run_media_job(job):
+    payload = job['payload']
+    images = resolve_tweet_media(payload['video_url'], payload.get('poster'), payload.get('images'), payload['tweet_id'])
+    if not update_tweet_media(payload['tweet_id'], images):
+        return '推文尚未入库'
     return None
 
+def handle_media_jobs(jobs):
+    """并行处理一批封面检查/生成任务"""
+    with ThreadPoolExecutor(max_workers=max(1, min(MEDIA_WORKERS, len(jobs)))) as executor:
+        futures = [executor.submit(_run_media_job, job) for job in jobs]
+    errors = []
+    for future in futures:
+        try:
+            errors.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    return errors
+
 def get_tweets_needing_repair():
     """
     查询数据库中需要修复封面的推文:
@@ -1033,59 +1966,50 @@ def get_tweets_needing_repair():
     """
     print("[修复] 正在扫描数据库中所有视频推文的封面健康状态 (这可能需要一点时间)...")
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 获取所有带视频的推文
-        cursor.execute("""
-            SELECT tweet_id, author, images 
-            FROM tweets 
-            WHERE video_url IS NOT NULL AND video_url != '';
-        """)
-        
-        all_video_tweets = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # 获取所有带视频的推文
+            cursor.execute("""
+                SELECT tweet_id, author, images 
+                FROM tweets 
+                WHERE video_url IS NOT NULL AND video_url != '';
+            """)
+            
+            all_video_tweets = cursor.fetchall()
+            cursor.close()
         
-        print(f"[修复] 数据库中共有 {len(all_video_tweets)} 条视频推文，开始逐个检查...")
+        print(f"[修复] 数据库中共有 {len(all_video_tweets)} 条视频推文，开始并发检查...")
         
+        # 先在本地过滤掉明显需要修复的 (无封面 / name=small)，剩下的第一张图 (通常是封面) 再做网络检查
         results = []
-        for i, row in enumerate(all_video_tweets):
-            tweet_id = row[0]
-            author = row[1]
-            images = row[2] # 这是一个列表
-            
-            needs_repair = False
-            
-            # 如果没有图片，肯定要修
-            if not images or len(images) == 0:
+        to_check = []
+        for tweet_id, author, images in all_video_tweets:
+            if not images:
                 print(f"[检查] ❌ {author}/{tweet_id}: 没有封面图 -> 加入修复列表")
-                needs_repair = True
+                results.append({'tweet_id': tweet_id, 'username': author, 'images': images})
+            elif 'name=small' in images[0]:
+                print(f"[检查] ⚠️ {author}/{tweet_id}: 发现低清缩略图 -> 加入修复列表")
+                results.append({'tweet_id': tweet_id, 'username': author, 'images': images})
             else:
-                # 检查第一张图 (通常是封面)
-                cover_url = images[0]
-                
-                # 使用 check_url_accessibility 进行全面检查 (包含 name=small, 404, Content-Type 等)
-                # 注意: 为了加快扫描，我们可以先快速过滤 name=small，再做网络请求
-                if 'name=small' in cover_url:
-                     print(f"[检查] ⚠️ {author}/{tweet_id}: 发现低清缩略图 -> 加入修复列表")
-                     needs_repair = True
-                else:
-                    # 只有看起来正常的 URL 才进行网络检查
-                    # 打印进度 (每10个打印一次，避免刷屏)
-                    if i % 10 == 0:
-                        print(f"[扫描进度] {i}/{len(all_video_tweets)}...")
-                        
-                    if not check_url_accessibility(cover_url):
-                        print(f"[检查] ❌ {author}/{tweet_id}: 封面无法访问 -> 加入修复列表")
-                        needs_repair = True
-            
-            if needs_repair:
-                results.append({
-                    'tweet_id': tweet_id,
-                    'username': author,
-                    'images': images
-                })
+                to_check.append((tweet_id, author, images))
+        
+        scanner = CoverScanner(
+            get_random_user_agent,
+            workers=COVER_SCAN_WORKERS,
+            per_host=COVER_SCAN_PER_HOST,
+            recheck_after=COVER_SCAN_RECHECK_AFTER,
+            state_path=shard_file(COVER_SCAN_FILE)
+        )
+        try:
+            accessible = scanner.scan([images[0] for _, _, images in to_check])
+        finally:
+            scanner.close()
+        
+        for tweet_id, author, images in to_check:
+            if not accessible.get(images[0]):
+                print(f"[检查] ❌ {author}/{tweet_id}: 封面无法访问 -> 加入修复列表")
+                results.append({'tweet_id': tweet_id, 'username': author, 'images': images})
         
         return results
     except Exception as e:
@@ -1096,15 +2020,352 @@ def get_tweets_needing_repair():
 
 def main():
     print(f"[{datetime.now()}] 启动 Colorful State 监控系统...")
+    if SHARD_COUNT > 1:
+        print(f"[分片] 当前进程为分片 {SHARD_INDEX + 1}/{SHARD_COUNT}")
     
     # 从本地缓存加载可用实例
     instances = load_instances()
 
+    # 浏览器池由 main() 持有，整轮 (LOOP_MODE 下跨多轮) 复用同一个 Chromium
+    # 批量写入器: 缓冲推文后用一次多行 upsert 写入
+    writer = None
+    store = save_tweet_to_db
+    if DB_BATCH_SIZE > 1 and DATABASE_URL:
+        writer = TweetWriter(
+            db_connection,
+            batch_size=DB_BATCH_SIZE,
+            flush_interval=DB_FLUSH_INTERVAL,
+            verify=DB_VERIFY_WRITES,
+            timer=METRICS.timer
+        )
+        store = make_buffered_save(writer)
+    
+    # 持久化任务队列: 翻译和封面作为独立任务由 jobs 表调度，不再使用进程内的流水线和工作线程
+    jobs = None
+    if JOB_QUEUE_ENABLED and DATABASE_URL:
+        jobs = JobQueue(
+            db_connection,
+            lease_seconds=JOB_LEASE_SECONDS,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            backoff_base=JOB_RETRY_BASE
+        )
+        pruned = jobs.prune(JOB_RETENTION_DAYS)
+        if pruned:
+            print(f"[任务] 清理 {pruned} 个已完成的旧任务")
+        print(f"[任务] 任务队列已启用 (进程标识 {jobs.owner})")
+    
+    # 翻译流水线: 抓取结果入队后立即返回，后台线程批量翻译并保存
+    pipeline = None
+    if TRANSLATION_BATCH_SIZE > 1 and not jobs:
+        pipeline = TranslationPipeline(
+            translate_batch_with_deepseek,
+            store,
+            batch_size=TRANSLATION_BATCH_SIZE,
+            max_wait=TRANSLATION_BATCH_WAIT
+        )
+    save = pipeline.submit if pipeline else store
+    
+    # 媒体工作线程: 封面检查/生成不占用抓取流程，处理完再更新数据库
+    media_pool = None
+    if jobs:
+        save = make_queue_save(jobs, save)
+    elif MEDIA_WORKERS > 0 and DATABASE_URL:
+        media_pool = MediaWorkerPool(
+            lambda job: resolve_tweet_media(job['video_url'], job.get('poster'), job.get('images'), job['tweet_id']),
+            update_tweet_media,
+            workers=MEDIA_WORKERS,
+            retry_delay=MEDIA_RETRY_DELAY
+        )
+        requeue_pending_media(media_pool)
+        save = make_media_save(media_pool, save)
+    
+    pool = create_browser_pool()
+    try:
+        if not CONCURRENT_MODE:
+            # 逐个抓取时复用同步浏览器池，提前创建 BROWSER_POOL_SIZE 个上下文，第一个目标不用等冷启动
+            # (并发模式使用异步浏览器，不需要预热这个池)
+            try:
+                pool.warm_up()
+                print(f"[浏览器池] 已预热 {pool.warm_size} 个页面")
+            except Exception as e:
+                print(f"[浏览器池] ⚠️ 预热失败，改为按需创建: {e}")
+        run_monitor(instances, pool, save, jobs, writer.flush if writer else None)
+    finally:
+        pool.close()
+        if pipeline:
+            pipeline.close()
+        if writer:
+            writer.close()
+        if media_pool:
+            media_pool.close()
+        if _translation_cache:
+            _translation_cache.close()
+        if _image_cache:
+            _image_cache.close()
+        close_db_pool()
+        INSTANCE_HEALTH.save()
+        if STORAGE_STATE:
+            STORAGE_STATE.save()
+        INSTANCE_HEALTH.print_summary()
+        emit_run_report()
+
+def emit_run_report():
+    """输出本轮的运行报告 (JSON / Prometheus 文件 + 控制台直方图摘要)，然后开始新一轮统计"""
+    report = METRICS.report()
+    METRICS.print_summary(report)
+    if METRICS_REPORT_FILE:
+        METRICS.write_report(shard_file(METRICS_REPORT_FILE), report)
+    if METRICS_PROMETHEUS_FILE:
+        METRICS.write_prometheus(shard_file(METRICS_PROMETHEUS_FILE))
+    METRICS.reset()
+
+def shard_users():
+    """当前分片负责的监控用户"""
+    if SHARD_COUNT == 1:
+        return USERS
+    users = SHARD_RING.select(USERS, SHARD_INDEX)
+    print(f"[分片] 分片 {SHARD_INDEX + 1}/{SHARD_COUNT} 负责 {len(users)}/{len(USERS)} 个用户")
+    return users
+
+def shard_tweets(tweets):
+    """当前分片负责的推文 (按 tweet_id 分配)"""
+    if SHARD_COUNT == 1:
+        return tweets
+    selected = SHARD_RING.select(tweets, SHARD_INDEX, key=lambda t: t['tweet_id'])
+    print(f"[分片] 分片 {SHARD_INDEX + 1}/{SHARD_COUNT} 负责 {len(selected)}/{len(tweets)} 条推文")
+    return selected
+
+def collect_pending_tweets():
+    """
+    读取 tweets.txt，返回 (是否配置了推文 URL, 待抓取列表)
+    FORCE_RESCRAPE=true 时不检查数据库，全部视为待抓取
+    """
+    # 优先处理文件中的推文 URL
+    tweet_urls = load_tweet_urls_from_file('tweets.txt')
+    if not tweet_urls:
+        return False, []
+    
+    print(f"\n[模式] 单条推文抓取模式")
+    
+    # 检查是否强制重新抓取
+    force_rescrape = os.environ.get('FORCE_RESCRAPE', 'false').lower() == 'true'
+    
+    if force_rescrape:
+        print(f"[系统] ⚠️  强制重新抓取模式开启: 将重新处理所有 {len(tweet_urls)} 条推文")
+        # 解析所有 URL 但不检查数据库状态，直接视为待处理
+        pending_urls = tweet_urls
+        parsed_tweets = []
+        for url in pending_urls:
+            parsed = parse_tweet_url(url)
+            if parsed:
+                parsed_tweets.append(parsed)
+        pending = parsed_tweets
+        scraped = [] # 假装没有已抓取的
+    else:
+        # 正常检查状态
+        scraped, pending = check_tweet_status(tweet_urls)
+    
+    # 打印报告
+    print_status_report(scraped, pending)
+    return True, shard_tweets(pending)
+
+def run_cycle(instances, pool, save=save_tweet_to_db, users=None, check_urls=True):
+    """
+    执行一轮抓取: tweets.txt 中待抓取的推文 + 监控用户的时间线
+    users: 本轮轮询的用户 (默认为当前分片的全部用户)；check_urls=False 时跳过 tweets.txt
+    """
+    concurrent_jobs = []
+    
+    has_urls, pending = collect_pending_tweets() if check_urls else (False, [])
+    if has_urls:
+        # 仅抓取待抓取的推文
+        if pending:
+            print(f"[开始抓取] 抓取 {len(pending)} 条待抓取推文...\n")
+            if CONCURRENT_MODE:
+                concurrent_jobs.extend(
+                    {'kind': 'status', 'username': t['username'], 'tweet_id': t['tweet_id']}
+                    for t in pending
+                )
+            else:
+                for tweet_info in pending:
+                    try:
+                        tweet = scrape_tweet_by_id(
+                            tweet_info['username'],
+                            tweet_info['tweet_id'],
+                            instances,
+                            pool
+                        )
+                        if tweet:
+                            save(tweet)
+                    except Exception as e:
+                        print(f"[{tweet_info['url']}] 处理异常: {e}")
+        else:
+            print("[完成] 所有配置的推文都已抓取，无需重复抓取。")
+    
+    # 处理用户监控模式
+    if users is None:
+        users = shard_users()
+    if users:
+        print(f"\n[模式] 用户监控模式 ({len(users)} 个用户)")
+        if CONCURRENT_MODE:
+            concurrent_jobs.extend({'kind': 'timeline', 'target': target} for target in users)
+        else:
+            for target in users:
+                try:
+                    if TIMELINE_MODE == 'all':
+                        tweets = scrape_timeline_with_playwright(target, instances, pool)
+                        if tweets is None:
+                            print(f"[{target}] 未能抓取到推文")
+                        elif not tweets:
+                            print(f"[{target}] 没有新推文")
+                        for tweet in tweets or []:
+                            save(tweet)
+                        continue
+                    
+                    tweet = scrape_nitter_with_playwright(target, instances, pool)
+                    if tweet:
+                        save(tweet)
+                    else:
+                        print(f"[{target}] 未能抓取到推文")
+                except Exception as e:
+                    print(f"[{target}] 处理异常: {e}")
+    
+    # 并发模式: 单条推文与用户监控任务合并到同一个工作池中执行
+    if concurrent_jobs:
+        run_concurrent_jobs(concurrent_jobs, instances, save)
+
+def run_job_cycle(queue, instances, pool, save, flush=None, users=None, check_urls=True):
+    """
+    任务队列模式的一轮: 把本轮的抓取目标入队，再依次消费抓取、翻译、封面任务
+    之前中断或失败待重试的任务会一并被领取
+    """
+    has_urls, pending = collect_pending_tweets() if check_urls else (False, [])
+    if users is None:
+        users = shard_users()
+    if has_urls and not pending:
+        print("[完成] 所有配置的推文都已抓取，无需重复抓取。")
+    queued = queue.enqueue('scrape_status', [
+        (t['tweet_id'], {'username': t['username'], 'tweet_id': t['tweet_id']}) for t in pending
+    ])
+    queued += queue.enqueue('scrape_timeline', [(target, {'target': target}) for target in users])
+    print(f"[任务] 新入队 {queued} 个抓取任务")
+    
+    batch_size = SCRAPE_CONCURRENCY if CONCURRENT_MODE else 1
+    queue.run(
+        ('scrape_status', 'scrape_timeline'),
+        lambda jobs: handle_scrape_jobs(jobs, instances, pool, save),
+        batch_size
+    )
+    # 翻译和封面任务需要推文已经入库
+    if flush:
+        flush()
+    queue.run(('translate',), handle_translate_jobs, max(1, TRANSLATION_BATCH_SIZE))
+    queue.run(('media',), handle_media_jobs, max(1, MEDIA_WORKERS))
+    
+    for kind, counts in sorted(queue.summary().items()):
+        print(f"[任务] {kind}: " + ", ".join(f"{state} {count}" for state, count in sorted(counts.items())))
+
+def load_posting_stats(users):
+    """
+    从 tweets 表统计账号的发帖情况: {小写用户名: (窗口内发帖数, 历史总数)}
+    author 字段为 "@用户名"，转发的 author 是原作者，不计入转发者
+    """
+    if not users or not DATABASE_URL:
+        return {}
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT lower(ltrim(author, '@')) AS account,
+                       COUNT(*) FILTER (WHERE published_at >= NOW() - make_interval(days => %s)),
+                       COUNT(*)
+                FROM tweets
+                WHERE lower(ltrim(author, '@')) = ANY(%s)
+                GROUP BY account;
+            """, (POLL_RATE_WINDOW_DAYS, [user.lower().lstrip('@') for user in users]))
+            rows = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        print(f"[调度] 查询发帖统计失败，使用默认间隔: {e}")
+        return {}
+    return {account: (recent, total) for account, recent, total in rows}
+
+def account_poll_interval(user, stats):
+    recent, total = stats.get(user.lower().lstrip('@'), (0, 0))
+    return posting_interval(
+        recent, total,
+        window_seconds=POLL_RATE_WINDOW_DAYS * 86400,
+        default=INTERVAL,
+        minimum=POLL_MIN_INTERVAL,
+        maximum=POLL_MAX_INTERVAL
+    )
+
+def run_adaptive_loop(instances, pool, save, jobs=None, flush=None):
+    """
+    自适应轮询 (LOOP_MODE + ADAPTIVE_POLLING): 每个账号按自己的发帖频率到期后才轮询，
+    tweets.txt 仍按 LOOP_INTERVAL 检查
+    """
+    users = shard_users()
+    scheduler = PollScheduler(users, budget_per_hour=POLL_BUDGET_PER_HOUR, jitter=POLL_JITTER)
+    print(f"[调度] 自适应轮询已启用: {len(users)} 个账号，间隔 {POLL_MIN_INTERVAL}s - {POLL_MAX_INTERVAL}s，"
+          f"预算 {POLL_BUDGET_PER_HOUR or '不限'} 次/小时")
+    
+    last_url_check = None
+    while True:
+        now = time.time()
+        check_urls = last_url_check is None or now - last_url_check >= INTERVAL
+        due_users = scheduler.due()
+        
+        if check_urls or due_users:
+            print(f"\n--- 启动新一轮监控轮询 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                  f"({len(due_users)} 个账号到期) ---")
+            if jobs:
+                run_job_cycle(jobs, instances, pool, save, flush, users=due_users, check_urls=check_urls)
+            else:
+                run_cycle(instances, pool, save, users=due_users, check_urls=check_urls)
+            if check_urls:
+                last_url_check = now
+            
+            # 根据最新的发帖记录重新安排刚轮询过的账号
+            if due_users:
+                if flush:
+                    flush()
+                stats = load_posting_stats(due_users)
+                for user in due_users:
+                    interval = account_poll_interval(user, stats)
+                    scheduler.reschedule(user, interval)
+                    print(f"[调度] {user}: 下次轮询约 {interval / 60:.0f} 分钟后")
+            
+            upcoming = scheduler.upcoming()
+            if upcoming:
+                current = scheduler.clock()
+                plan = ', '.join(f"{target} ({max(0, due_at - current) / 60:.0f} 分钟后)" for due_at, target in upcoming[:5])
+                print(f"[调度] 接下来: {plan}" + (f" 等 {len(upcoming)} 个账号" if len(upcoming) > 5 else ""))
+            
+            INSTANCE_HEALTH.save()
+            if STORAGE_STATE:
+                STORAGE_STATE.save()
+            emit_run_report()
+        
+        # 休眠到下一个账号到期或 tweets.txt 需要再次检查
+        wait = INTERVAL - (time.time() - last_url_check)
+        scheduler_wait = scheduler.wait_time()
+        if scheduler_wait is not None:
+            wait = min(wait, scheduler_wait)
+        time.sleep(max(1, wait))
+
+def run_monitor(instances, pool, save=save_tweet_to_db, jobs=None, flush=None):
+    """
+    执行修复模式或监控轮询
+    save: 保存单条推文的函数 (直接入库或提交到翻译流水线)
+    jobs: 持久化任务队列 (JOB_QUEUE=true)，为 None 时直接抓取
+    flush: 抓取阶段结束后把缓冲中的推文写入数据库的函数
+    """
     # 检查修复模式
     repair_mode = os.environ.get('REPAIR_MODE', 'false').lower() == 'true'
     if repair_mode:
         print(f"\n[系统] 🔧 启动修复模式 (REPAIR_MODE)")
-        tweets_to_repair = get_tweets_needing_repair()
+        tweets_to_repair = shard_tweets(get_tweets_needing_repair())
         
         if not tweets_to_repair:
             print("[修复] 没有发现需要修复的推文 (没有包含 name=small 的图片)")
@@ -1116,9 +2377,9 @@ def main():
             print(f"\n--- 正在修复 ({i+1}/{len(tweets_to_repair)}): {info['username']}/{info['tweet_id']} ---")
             try:
                 # 重新抓取并保存（save_tweet_to_db 会处理更新）
-                tweet = scrape_tweet_by_id(info['username'], info['tweet_id'], instances)
+                tweet = scrape_tweet_by_id(info['username'], info['tweet_id'], instances, pool)
                 if tweet:
-                    save_tweet_to_db(tweet)
+                    save(tweet)
                     print(f"[修复] ✅ 修复成功")
                 else:
                     print(f"[修复] ⚠️ 修复失败: 无法重新抓取")
@@ -1128,66 +2389,23 @@ def main():
         print("\n[系统] 修复任务完成，退出。")
         return
 
+    if LOOP_MODE and ADAPTIVE_POLLING:
+        run_adaptive_loop(instances, pool, save, jobs, flush)
+        return
+
     while True:
         cycle_start = time.time()
         print(f"\n--- 启动新一轮监控轮询 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] ---")
         
-        # 优先处理文件中的推文 URL
-        tweet_urls = load_tweet_urls_from_file('tweets.txt')
-        
-        if tweet_urls:
-            print(f"\n[模式] 单条推文抓取模式")
-            
-            # 检查是否强制重新抓取
-            force_rescrape = os.environ.get('FORCE_RESCRAPE', 'false').lower() == 'true'
-            
-            if force_rescrape:
-                print(f"[系统] ⚠️  强制重新抓取模式开启: 将重新处理所有 {len(tweet_urls)} 条推文")
-                # 解析所有 URL 但不检查数据库状态，直接视为待处理
-                pending_urls = tweet_urls
-                parsed_tweets = []
-                for url in pending_urls:
-                    parsed = parse_tweet_url(url)
-                    if parsed:
-                        parsed_tweets.append(parsed)
-                pending = parsed_tweets
-                scraped = [] # 假装没有已抓取的
-            else:
-                # 正常检查状态
-                scraped, pending = check_tweet_status(tweet_urls)
-            
-            # 打印报告
-            print_status_report(scraped, pending)
-            
-            # 仅抓取待抓取的推文
-            if pending:
-                print(f"[开始抓取] 抓取 {len(pending)} 条待抓取推文...\n")
-                for tweet_info in pending:
-                    try:
-                        tweet = scrape_tweet_by_id(
-                            tweet_info['username'],
-                            tweet_info['tweet_id'],
-                            instances
-                        )
-                        if tweet:
-                            save_tweet_to_db(tweet)
-                    except Exception as e:
-                        print(f"[{tweet_info['url']}] 处理异常: {e}")
-            else:
-                print("[完成] 所有配置的推文都已抓取，无需重复抓取。")
+        if jobs:
+            run_job_cycle(jobs, instances, pool, save, flush)
+        else:
+            run_cycle(instances, pool, save)
         
-        # 处理用户监控模式
-        if USERS:
-            print(f"\n[模式] 用户监控模式 ({len(USERS)} 个用户)")
-            for target in USERS:
-                try:
-                    tweet = scrape_nitter_with_playwright(target, instances)
-                    if tweet:
-                        save_tweet_to_db(tweet)
-                    else:
-                        print(f"[{target}] 未能抓取到推文")
-                except Exception as e:
-                    print(f"[{target}] 处理异常: {e}")
+        # 每轮结束持久化实例健康记录和浏览器 cookie，LOOP_MODE 中途被杀也不会全部丢失
+        INSTANCE_HEALTH.save()
+        if STORAGE_STATE:
+            STORAGE_STATE.save()
 
         if not LOOP_MODE:
             print("\n[系统] 非循环模式，任务结束。")
@@ -1196,8 +2414,31 @@ def main():
         # 计算需要 sleep 的时间
         elapsed = time.time() - cycle_start
         sleep_time = max(10, INTERVAL - elapsed)
+        emit_run_report()
         print(f"--- 轮询结束。耗时 {elapsed:.1f}s，准备休眠 {sleep_time:.1f}s ---\n")
         time.sleep(sleep_time)
 
+def run_shard_processes(count):
+    """
+    本机分片进程池: 启动 count 个子进程，各自设置 SHARD_COUNT / SHARD_INDEX 后运行 main()
+    所有子进程写入同一张 tweets 表，有子进程失败时返回 1
+    """
+    print(f"[分片] 启动 {count} 个分片进程...")
+    processes = []
+    for index in range(count):
+        env = dict(os.environ, SHARD_COUNT=str(count), SHARD_INDEX=str(index), SHARD_PROCESSES='0')
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env))
+    
+    exit_code = 0
+    for index, process in enumerate(processes):
+        code = process.wait()
+        if code:
+            print(f"[分片] ⚠️ 分片 {index + 1}/{count} 退出码 {code}")
+            exit_code = 1
+    print(f"[分片] 所有分片进程已结束")
+    return exit_code
+
 if __name__ == "__main__":
+    if SHARD_PROCESSES > 1 and SHARD_COUNT == 1:
+        sys.exit(run_shard_processes(SHARD_PROCESSES))
     main()
@@ -0,0 +1,191 @@
+"""
+封面健康并发扫描 (REPAIR_MODE)
+线程池 + 共享 keep-alive 会话检查封面 URL:
+优先 HEAD，不支持时回退为只取 1 字节的 Range GET；按域名限制并发和请求间隔；
+检查结果持久化，近期检查过的 URL 直接复用结果
+"""
+import os
+import json
+import time
+import threading
+import requests
+from urllib.parse import unquote, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+
+# HEAD 返回这些状态码时改用 Range GET 再试一次 (部分图床/CDN 不支持 HEAD)
+HEAD_FALLBACK_STATUSES = {403, 405, 501}
+
+
+class HostLimiter:
+    """按域名限制同时在途请求数，并保证同一域名两次请求之间的最小间隔"""
+
+    def __init__(self, max_concurrent=4, min_interval=0.05):
+        self.max_concurrent = max_concurrent
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = {
+                    'slots': threading.Semaphore(self.max_concurrent),
+                    'lock': threading.Lock(),
+                    'next_at': 0.0
+                }
+            return self._hosts[host]
+
+    def acquire(self, host):
+        state = self._host_state(host)
+        state['slots'].acquire()
+        with state['lock']:
+            wait = state['next_at'] - time.time()
+            state['next_at'] = max(time.time(), state['next_at']) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+        return state
+
+    def release(self, state):
+        state['slots'].release()
+
+
+class CoverScanner:
+    """
+    封面 URL 并发检查器
+    - workers: 线程数
+    - per_host / host_interval: 单域名并发上限与请求间隔 (秒)
+    - recheck_after: 结果有效期 (秒)，期内同一 URL 不再请求
+    - state_path: 结果持久化文件，None 表示不持久化
+    """
+
+    def __init__(self, user_agent_factory, workers=16, per_host=4, host_interval=0.05,
+                 recheck_after=7 * 86400, timeout=10, state_path=None):
+        self.user_agent_factory = user_agent_factory
+        self.workers = max(1, workers)
+        self.recheck_after = recheck_after
+        self.timeout = timeout
+        self.state_path = state_path
+        self.limiter = HostLimiter(per_host, host_interval)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._results = {}
+        self._lock = threading.Lock()
+        self._load()
+
+        # 统计信息
+        self.cached = 0
+        self.checked = 0
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._results = data
+                print(f"[封面扫描] 已加载 {len(self._results)} 条历史检查结果")
+        except Exception as e:
+            print(f"[封面扫描] 加载历史检查结果失败: {e}")
+
+    def save(self):
+        if not self.state_path:
+            return
+        cutoff = time.time() - self.recheck_after
+        with self._lock:
+            # 只保留仍在有效期内的结果，避免文件无限增长
+            data = {url: r for url, r in self._results.items() if r.get('checked_at', 0) >= cutoff}
+        try:
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            print(f"[封面扫描] 保存检查结果失败: {e}")
+
+    def _cached(self, url):
+        with self._lock:
+            result = self._results.get(url)
+        if result and time.time() - result.get('checked_at', 0) < self.recheck_after:
+            return result
+        return None
+
+    def probe(self, url):
+        """
+        检查单个 URL，返回 (是否可用, 原因)
+        规则与 check_url_accessibility 一致: 拒绝 name=small 缩略图，要求 200/206 且 Content-Type 为 image/*
+        """
+        if 'name=small' in url or 'name=small' in unquote(url):
+            return False, 'thumbnail'
+
+        headers = {'User-Agent': self.user_agent_factory()}
+        state = self.limiter.acquire(urlparse(url).netloc)
+        try:
+            response = self.session.head(url, headers=headers, timeout=self.timeout, allow_redirects=True)
+            response.close()
+            content_type = response.headers.get('Content-Type', '').lower()
+
+            if response.status_code in HEAD_FALLBACK_STATUSES or (response.status_code == 200 and not content_type):
+                with self.session.get(url, headers={**headers, 'Range': 'bytes=0-0'},
+                                      timeout=self.timeout, stream=True) as response:
+                    content_type = response.headers.get('Content-Type', '').lower()
+                    status = response.status_code
+            else:
+                status = response.status_code
+        except Exception as e:
+            return False, f'error: {e}'
+        finally:
+            self.limiter.release(state)
+
+        if status not in (200, 206):
+            return False, f'status {status}'
+        if not content_type.startswith('image/'):
+            return False, f'content-type {content_type or "-"}'
+        return True, 'ok'
+
+    def check(self, url):
+        """检查单个 URL (优先使用有效期内的历史结果)，返回是否可用"""
+        cached = self._cached(url)
+        if cached:
+            with self._lock:
+                self.cached += 1
+            return cached['ok']
+
+        ok, reason = self.probe(url)
+        with self._lock:
+            self.checked += 1
+            # 网络异常可能只是暂时的，不记入历史结果，下次重新检查
+            if not reason.startswith('error'):
+                self._results[url] = {'ok': ok, 'reason': reason, 'checked_at': time.time()}
+        return ok
+
+    def scan(self, urls, progress_every=200):
+        """并发检查多个 URL，返回 {url: 是否可用}"""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        results = {}
+        if not unique:
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.check, url): url for url in unique}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    print(f"[封面扫描] 检查失败: {url[:60]}... 错误: {e}")
+                    results[url] = False
+                if done % progress_every == 0:
+                    print(f"[扫描进度] {done}/{len(unique)}...")
+
+        print(f"[封面扫描] 完成: 共 {len(unique)} 个 URL，实际请求 {self.checked} 个，复用历史结果 {self.cached} 个")
+        self.save()
+        return results
+
+    def close(self):
+        self.session.close()
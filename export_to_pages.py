@@ -1,105 +1,783 @@
 """
 导出推文数据到 GitHub Pages
 从 Neon 数据库读取推文，生成 JSON 文件供前端展示
+
+默认增量导出: 只读取 updated_at 晚于上次导出水位线的推文 (按 (updated_at, tweet_id) 键集分页，
+服务端命名游标流式读取)，通过 id 索引定位它们所在的分片，只读取和重写这些分片、新推文插入位置之后的分片以及受影响的搜索索引分片；
+新推文按发布时间并入 (通常落在末尾分片)，插入位置之前的分片条目原样保留；补录的较早推文需要重写超过
+EXPORT_REORDER_SHARDS 个分片时改为全量导出
+没有已有数据、导出参数变化或 EXPORT_MODE=full 时全量导出: 按发布时间重新排序全部推文并重建所有文件，
+数据库中已删除的推文也只在全量导出时移除
+
+输出格式 (docs/data/):
+- manifest.json: 总数、水位线、分片列表 (可选按作者的分片列表)、统计计数
+- page-NNNNN.<hash>.json: 每个分片 EXPORT_SHARD_SIZE 条推文，按发布时间从旧到新；
+  前端只按当前页需要加载对应分片，首屏加载量不随归档增长
+- search/index-NNN.<hash>.json: 搜索倒排索引分片 (见 search_index.py)，文档编号即推文在分片中的全局位置
+- ids/bucket-NNN.<hash>.json: tweet_id -> [分片序号, 作者分片序号]，按 tweet_id 哈希分桶，供增量导出定位分片
+分片都是压缩空白的 JSON，文件名带内容哈希 (内容不变文件名不变，浏览器缓存持续有效)；
+可选按列存储 (作者名在分片内只存一次) 和预压缩副本 (.gz / .br)
 """
 import os
+import re
+import sys
+import bisect
+import gzip
 import json
+import hashlib
 import psycopg2
-from datetime import datetime
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from search_index import build_index, update_index, fnv1a, TOKENIZER_VERSION
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 load_dotenv()
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
-def export_tweets_to_json():
+# 导出模式: incremental (增量合并) / full (全量重建)
+EXPORT_MODE = os.environ.get('EXPORT_MODE', 'incremental').lower()
+# 每页读取的行数 (键集分页 + 命名游标每次拉取的行数)
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', '500'))
+# 水位线回退秒数: updated_at 取事务开始时间，导出时尚未提交的事务可能落在水位线之前，回退一段重新读取 (合并是幂等的)
+EXPORT_OVERLAP = int(os.environ.get('EXPORT_OVERLAP', '300'))
+
+# 分片格式: 清单 + 固定大小的分片文件 (按 published_at 从旧到新编号，新推文通常只改动最后的分片)
+EXPORT_SHARD_SIZE = int(os.environ.get('EXPORT_SHARD_SIZE', '120'))
+# 增量导出时新推文最多引起多少个分片重写 (补录较早的推文会让插入位置之后的分片整体后移)，超过时改为全量导出
+EXPORT_REORDER_SHARDS = int(os.environ.get('EXPORT_REORDER_SHARDS', '20'))
+# 是否额外按作者生成分片 (前端 ?author=xxx 时只加载该作者的分片)
+EXPORT_AUTHOR_SHARDS = os.environ.get('EXPORT_AUTHOR_SHARDS', 'false').lower() == 'true'
+# 搜索倒排索引 (前端查询索引而不是逐条扫描)
+EXPORT_SEARCH_INDEX = os.environ.get('EXPORT_SEARCH_INDEX', 'true').lower() == 'true'
+EXPORT_SEARCH_SHARDS = int(os.environ.get('EXPORT_SEARCH_SHARDS', '64'))
+
+# 分片布局: rows (每条推文一个对象) / columns (按列存储，作者名用分片内字典编码)
+EXPORT_LAYOUT = os.environ.get('EXPORT_LAYOUT', 'rows').lower()
+# 预压缩副本，逗号分隔: gzip / brotli (需要安装 brotli)，留空不生成
+# GitHub Pages 会自动 gzip 传输；预压缩副本供支持静态预压缩的服务器使用，前端在清单声明 gzip 时也会直接请求 .gz 自行解压
+EXPORT_COMPRESS = [c.strip() for c in os.environ.get('EXPORT_COMPRESS', '').lower().split(',') if c.strip() in ('gzip', 'brotli')]
+
+DOCS_DIR = 'docs'
+SHARD_DIR = os.path.join(DOCS_DIR, 'data')
+MANIFEST_FILE = os.path.join(SHARD_DIR, 'manifest.json')
+STATS_FILE = os.path.join(DOCS_DIR, 'stats.json')
+# 分片格式版本，结构变化时递增，旧版本的导出会被全量重建
+MANIFEST_VERSION = 3
+# id 索引分桶数
+ID_INDEX_BUCKETS = 64
+
+# 预压缩副本的后缀
+COMPRESSED_SUFFIXES = {'gzip': '.gz', 'brotli': '.br'}
+# 按列存储的字段 (author 单独字典编码)
+SHARD_COLUMNS = ('tweet_id', 'content', 'content_zh', 'images', 'video_url', 'published_at', 'source_url', 'created_at')
+
+TWEET_SELECT = """
+    SELECT
+        tweet_id,
+        author,
+        content,
+        content_zh,
+        images,
+        video_url,
+        published_at,
+        source_url,
+        created_at,
+        updated_at
+    FROM tweets
+"""
+
+
+def row_to_tweet(row):
+    """数据库行 -> 前端使用的推文字典"""
+    return {
+        'tweet_id': row[0],
+        'author': row[1],
+        'content': row[2],
+        'content_zh': row[3],
+        'images': row[4] if row[4] else [],
+        'video_url': row[5],
+        'published_at': row[6].isoformat() if row[6] else None,
+        'source_url': row[7],
+        'created_at': row[8].isoformat() if row[8] else None
+    }
+
+
+def iter_all_rows(conn, page_size=EXPORT_PAGE_SIZE):
+    """全量读取: 服务端命名游标流式拉取，不会一次性把整张表读进内存"""
+    cursor = conn.cursor(name='export_all')
+    cursor.itersize = page_size
+    try:
+        cursor.execute(TWEET_SELECT + ";")
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+def iter_changed_rows(conn, since, page_size=EXPORT_PAGE_SIZE):
+    """
+    增量读取 updated_at >= since 的推文
+    按 (updated_at, tweet_id) 键集分页，每页一个命名游标，翻页不依赖 OFFSET
+    """
+    last_key = (since, '')
+    page = 0
+    while True:
+        cursor = conn.cursor(name=f'export_changed_{page}')
+        cursor.itersize = page_size
+        try:
+            cursor.execute(TWEET_SELECT + """
+                WHERE (updated_at, tweet_id) > (%s, %s)
+                ORDER BY updated_at, tweet_id
+                LIMIT %s;
+            """, (last_key[0], last_key[1], page_size))
+            count = 0
+            for row in cursor:
+                count += 1
+                last_key = (row[9], row[0])
+                yield row
+        finally:
+            cursor.close()
+
+        if count < page_size:
+            return
+        page += 1
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def encode_shard(tweets, layout=EXPORT_LAYOUT):
+    """推文列表 -> 分片内容"""
+    if layout != 'columns':
+        return {'tweets': tweets}
+    authors = []
+    author_index = {}
+    for tweet in tweets:
+        if tweet['author'] not in author_index:
+            author_index[tweet['author']] = len(authors)
+            authors.append(tweet['author'])
+    columns = {column: [tweet[column] for tweet in tweets] for column in SHARD_COLUMNS}
+    columns['author'] = [author_index[tweet['author']] for tweet in tweets]
+    return {'authors': authors, 'columns': columns}
+
+
+def decode_shard(data):
+    """分片内容 -> 推文列表 (兼容两种布局)"""
+    if 'tweets' in data:
+        return data['tweets']
+    columns = data['columns']
+    authors = data['authors']
+    tweets = []
+    for i in range(len(columns['tweet_id'])):
+        tweet = {column: columns[column][i] for column in SHARD_COLUMNS}
+        tweet['author'] = authors[columns['author'][i]]
+        tweets.append(tweet)
+    return tweets
+
+
+class ExportMismatch(Exception):
+    """已有导出与 id 索引对不上 (文件被手动改动、缓存不完整等)，改为全量导出"""
+
+
+def load_manifest():
+    """
+    读取上次导出的清单，格式或导出参数与当前配置不一致时返回 None (由调用方改为全量导出)
+    分片内容按需读取，不在这里解码
+    """
+    if not os.path.exists(MANIFEST_FILE):
+        return None
+    try:
+        manifest = _read_json(MANIFEST_FILE)
+    except Exception as e:
+        print(f"⚠️  读取已有清单失败，将全量导出: {e}")
+        return None
+    if not isinstance(manifest, dict):
+        print("⚠️  已有清单格式错误，将全量导出")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        print(f"ℹ️  导出格式版本已变化 ({manifest.get('version')} -> {MANIFEST_VERSION})，将全量导出")
+        return None
+    expected = export_settings()
+    if manifest.get('settings') != expected:
+        print(f"ℹ️  导出参数已变化 ({manifest.get('settings')} -> {expected})，将全量导出")
+        return None
+    problem = manifest_problem(manifest)
+    if problem:
+        print(f"⚠️  已有清单不完整 ({problem})，将全量导出")
+        return None
+    return manifest
+
+
+def _valid_entries(entries):
+    return isinstance(entries, list) and all(
+        isinstance(e, dict) and isinstance(e.get('file'), str) and isinstance(e.get('count'), int) and e['count'] > 0
+        for e in entries
+    )
+
+
+def manifest_problem(manifest):
+    """检查增量导出要用到的清单字段，返回问题描述 (没有问题返回 None)"""
+    watermark = manifest.get('watermark')
+    if watermark is not None:
+        try:
+            datetime.fromisoformat(watermark)
+        except (TypeError, ValueError):
+            return 'watermark'
+    if not _valid_entries(manifest.get('shards')):
+        return 'shards'
+    authors = manifest.get('authors')
+    if not isinstance(authors, dict) or not all(
+            isinstance(a, dict) and isinstance(a.get('count'), int) and _valid_entries(a.get('shards'))
+            for a in authors.values()):
+        return 'authors'
+    id_index = manifest.get('id_index')
+    if not isinstance(id_index, dict) or not isinstance(id_index.get('files'), list) \
+            or len(id_index['files']) != ID_INDEX_BUCKETS:
+        return 'id_index'
+    search = manifest.get('search')
+    if EXPORT_SEARCH_INDEX and (not isinstance(search, dict) or not isinstance(search.get('files'), list)
+                                or len(search['files']) != EXPORT_SEARCH_SHARDS):
+        return 'search'
+    stats = manifest.get('stats')
+    if not isinstance(stats, dict) or not isinstance(stats.get('author_counts'), dict) \
+            or not all(isinstance(stats.get(k), int) for k in ('tweets_with_video', 'tweets_with_images')):
+        return 'stats'
+    return None
+
+
+def export_settings():
+    """影响分片内容和边界的导出参数，任何一项变化都需要全量重建"""
+    return {
+        'shard_size': EXPORT_SHARD_SIZE,
+        'layout': EXPORT_LAYOUT,
+        'author_shards': EXPORT_AUTHOR_SHARDS,
+        'search_shards': EXPORT_SEARCH_SHARDS if EXPORT_SEARCH_INDEX else 0,
+        'tokenizer': TOKENIZER_VERSION if EXPORT_SEARCH_INDEX else 0,
+        'id_buckets': ID_INDEX_BUCKETS,
+        'compression': [m for m in EXPORT_COMPRESS if m != 'brotli' or brotli is not None]
+    }
+
+
+def tweet_sort_key(tweet):
+    return tweet['published_at'] is not None, tweet['published_at'] or '', tweet['created_at'] or ''
+
+
+def sort_tweets(tweets):
+    """
+    按时间从旧到新排序 (published_at 为空的排在最前)，前端倒序展示即与原查询
+    published_at DESC NULLS LAST, created_at DESC 一致
+    """
+    tweets.sort(key=tweet_sort_key)
+    return tweets
+
+
+def _compress(content, method):
+    if method == 'gzip':
+        # mtime=0 保证相同内容得到相同的压缩结果
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    return brotli.compress(content, quality=11)
+
+
+def _same_content(path, content):
+    try:
+        with open(path, 'rb') as f:
+            return f.read() == content
+    except OSError:
+        return False
+
+
+def write_artifact(stem, payload):
+    """
+    写入内容哈希命名的压缩空白 JSON: docs/<stem>.<hash>.json，并按 EXPORT_COMPRESS 生成压缩副本
+    同名文件内容一致时直接复用 (被截断或改动过的文件会重写)；返回 (相对路径, 是否新写入)
+    """
+    content = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    rel_path = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}.json"
+    path = os.path.join(DOCS_DIR, rel_path)
+
+    written = False
+    if not _same_content(path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        written = True
+
+    for method in EXPORT_COMPRESS:
+        if method == 'brotli' and brotli is None:
+            continue
+        compressed_path = path + COMPRESSED_SUFFIXES[method]
+        if written or not os.path.exists(compressed_path):
+            with open(compressed_path, 'wb') as f:
+                f.write(_compress(content, method))
+    return rel_path, written
+
+
+def write_shard(prefix, index, chunk):
+    """写入一个分片 docs/<prefix>page-NNNNN.<hash>.json，返回 (清单条目, 是否新写入)"""
+    rel_path, written = write_artifact(f"{prefix}page-{index:05d}", encode_shard(chunk))
+    entry = {
+        'file': rel_path,
+        'count': len(chunk),
+        'first_published_at': chunk[0]['published_at'],
+        'last_published_at': chunk[-1]['published_at']
+    }
+    return entry, written
+
+
+def _author_dir(author):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', author) or '_'
+
+
+def id_bucket(tweet_id, bucket_count=ID_INDEX_BUCKETS):
+    return fnv1a(tweet_id) % bucket_count
+
+
+def remove_stale_files(referenced):
+    """删除不再被清单引用的分片文件"""
+    removed = 0
+    for root, _, files in os.walk(SHARD_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, DOCS_DIR).replace(os.sep, '/')
+            # 压缩副本跟随原文件
+            for suffix in COMPRESSED_SUFFIXES.values():
+                if rel_path.endswith(suffix):
+                    rel_path = rel_path[:-len(suffix)]
+            if rel_path.endswith('.json') and path != MANIFEST_FILE and rel_path not in referenced:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def referenced_files(manifest):
+    """清单引用的全部文件"""
+    referenced = {shard['file'] for shard in manifest['shards']}
+    for author in manifest['authors'].values():
+        referenced.update(shard['file'] for shard in author['shards'])
+    if manifest['search']:
+        referenced.update(f for f in manifest['search']['files'] if f)
+    referenced.update(f for f in manifest['id_index']['files'] if f)
+    return referenced
+
+
+class ShardList:
+    """
+    一组分片 (全部推文或某个作者) 的按需读写，分片内外都按发布时间从旧到新
+    - 已有推文原地更新
+    - 新推文按发布时间并入: 从末尾往前找到插入位置，只重新切分插入位置之后的分片，前面的分片条目原样保留
+    除最后一个分片外每个分片都是满的，重新切分不会移动插入位置之前的边界
+    """
+
+    def __init__(self, prefix, entries, shard_size=EXPORT_SHARD_SIZE):
+        self.prefix = prefix
+        self.entries = entries
+        self.shard_size = shard_size
+        self.loaded = {}
+        # 读取时的原始内容，用来算出哪些位置的推文变了 (更新搜索索引和 id 索引)
+        self.original = {}
+        self.original_offsets = []
+        total = 0
+        for entry in entries:
+            self.original_offsets.append(total)
+            total += entry['count']
+        self.original_total = total
+        self.dirty = set()
+
+    @property
+    def total(self):
+        return sum(entry['count'] for entry in self.entries)
+
+    def offset(self, index):
+        return sum(entry['count'] for entry in self.entries[:index])
+
+    def load(self, index):
+        if index not in self.loaded:
+            tweets = decode_shard(_read_json(os.path.join(DOCS_DIR, self.entries[index]['file'])))
+            if len(tweets) != self.entries[index]['count']:
+                raise ExportMismatch(f"{self.prefix}page-{index:05d} 的条数与清单不符")
+            self.original[index] = list(tweets)
+            self.loaded[index] = tweets
+        return self.loaded[index]
+
+    def replace(self, index, tweet):
+        """原地替换分片中的推文，返回旧推文"""
+        tweets = self.load(index)
+        for position, old in enumerate(tweets):
+            if old['tweet_id'] == tweet['tweet_id']:
+                if tweet_sort_key(old) != tweet_sort_key(tweet):
+                    raise ExportMismatch(f"推文 {tweet['tweet_id']} 的发布时间变化，需要重新排序")
+                if old != tweet:
+                    tweets[position] = tweet
+                    self.dirty.add(index)
+                return old
+        raise ExportMismatch(f"{self.prefix}page-{index:05d} 中没有推文 {tweet['tweet_id']}")
+
+    def insert(self, new_tweets, max_rewrite):
+        """
+        按发布时间并入已排序的新推文
+        需要重写的分片超过 max_rewrite 个 (补录了较早的推文) 时抛出 ExportMismatch，由调用方全量导出
+        """
+        if not new_tweets:
+            return
+        earliest = tweet_sort_key(new_tweets[0])
+        start = len(self.entries)
+        while start > 0 and tweet_sort_key(self.load(start - 1)[-1]) > earliest:
+            start -= 1
+            if len(self.entries) - start > max_rewrite:
+                raise ExportMismatch(f"{self.prefix} 补录的推文需要重写超过 {max_rewrite} 个分片")
+        # 未满的末尾分片一并重新切分
+        if start == len(self.entries) and start > 0 and self.entries[-1]['count'] < self.shard_size:
+            start -= 1
+            self.load(start)
+
+        merged = []
+        for index in range(start, len(self.entries)):
+            merged.extend(self.loaded[index])
+        merged = sort_tweets(merged + list(new_tweets))
+
+        del self.entries[start:]
+        for index, begin in enumerate(range(0, len(merged), self.shard_size), start):
+            chunk = merged[begin:begin + self.shard_size]
+            self.entries.append({'file': None, 'count': len(chunk)})
+            self.loaded[index] = chunk
+            self.dirty.add(index)
+
+    def _original_at(self, position):
+        if position >= self.original_total:
+            return None
+        index = bisect.bisect_right(self.original_offsets, position) - 1
+        return self.original[index][position - self.original_offsets[index]]
+
+    def changes(self):
+        """改动过的位置: [(位置, 原推文 或 None, 新推文), ...]"""
+        changes = []
+        for index in sorted(self.dirty):
+            base = self.offset(index)
+            for i, tweet in enumerate(self.loaded[index]):
+                old = self._original_at(base + i)
+                if old != tweet:
+                    changes.append((base + i, old, tweet))
+        return changes
+
+    def moved(self):
+        """所在分片变化 (含新增) 的推文: [(tweet_id, 新分片序号), ...]"""
+        previous = {t['tweet_id']: index for index, tweets in self.original.items() for t in tweets}
+        return [
+            (tweet['tweet_id'], index)
+            for index in sorted(self.dirty)
+            for tweet in self.loaded[index]
+            if previous.get(tweet['tweet_id']) != index
+        ]
+
+    def flush(self):
+        """写出改动过的分片，返回新写入的文件数"""
+        written = 0
+        for index in sorted(self.dirty):
+            self.entries[index], new_file = write_shard(self.prefix, index, self.loaded[index])
+            written += new_file
+        self.dirty.clear()
+        return written
+
+
+def count_stats(tweets):
+    """统计信息的可增量维护部分"""
+    author_counts = {}
+    for tweet in tweets:
+        author_counts[tweet['author']] = author_counts.get(tweet['author'], 0) + 1
+    return {
+        'tweets_with_video': sum(1 for t in tweets if t['video_url']),
+        'tweets_with_images': sum(1 for t in tweets if t['images']),
+        'author_counts': author_counts
+    }
+
+
+def update_stats(stats, old, new):
+    """按一条推文的新旧版本调整统计 (old 为 None 表示新增)"""
+    if old:
+        stats['tweets_with_video'] -= bool(old['video_url'])
+        stats['tweets_with_images'] -= bool(old['images'])
+    else:
+        stats['author_counts'][new['author']] = stats['author_counts'].get(new['author'], 0) + 1
+    stats['tweets_with_video'] += bool(new['video_url'])
+    stats['tweets_with_images'] += bool(new['images'])
+
+
+def build_full(tweets):
+    """
+    全量重建: 按发布时间排序后切片，重写全部分片、作者分片、搜索索引和 id 索引
+    数据库中已删除的推文只在这里被移除
+    返回 (清单, 本次写入的文件数)
+    """
+    tweets = sort_tweets(tweets)
+    written = 0
+
+    shards = []
+    locations = {}
+    for index, start in enumerate(range(0, len(tweets), EXPORT_SHARD_SIZE)):
+        chunk = tweets[start:start + EXPORT_SHARD_SIZE]
+        entry, new_file = write_shard('data/', index, chunk)
+        shards.append(entry)
+        written += new_file
+        for tweet in chunk:
+            locations[tweet['tweet_id']] = [index, None]
+
+    # 按作者的分片 (可选)
+    authors = {}
+    if EXPORT_AUTHOR_SHARDS:
+        by_author = {}
+        for tweet in tweets:
+            by_author.setdefault(tweet['author'], []).append(tweet)
+        for author, author_tweets in by_author.items():
+            prefix = f"data/authors/{_author_dir(author)}/"
+            author_shards = []
+            for index, start in enumerate(range(0, len(author_tweets), EXPORT_SHARD_SIZE)):
+                chunk = author_tweets[start:start + EXPORT_SHARD_SIZE]
+                entry, new_file = write_shard(prefix, index, chunk)
+                author_shards.append(entry)
+                written += new_file
+                for tweet in chunk:
+                    locations[tweet['tweet_id']][1] = index
+            authors[author] = {'count': len(author_tweets), 'shards': author_shards}
+
+    # 搜索索引
+    search = None
+    if EXPORT_SEARCH_INDEX:
+        search = {'shard_count': EXPORT_SEARCH_SHARDS, 'files': []}
+        for index, terms in enumerate(build_index(tweets, EXPORT_SEARCH_SHARDS)):
+            rel_path = None
+            if terms:
+                rel_path, new_file = write_artifact(f"data/search/index-{index:03d}", {'terms': terms})
+                written += new_file
+            search['files'].append(rel_path)
+
+    # tweet_id -> [分片序号, 作者分片序号]，增量导出据此只读取受影响的分片
+    buckets = [{} for _ in range(ID_INDEX_BUCKETS)]
+    for tweet_id, location in locations.items():
+        buckets[id_bucket(tweet_id)][tweet_id] = location
+    id_files = []
+    for index, bucket in enumerate(buckets):
+        rel_path = None
+        if bucket:
+            rel_path, new_file = write_artifact(f"data/ids/bucket-{index:03d}", dict(sorted(bucket.items())))
+            written += new_file
+        id_files.append(rel_path)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': export_settings(),
+        'total_count': len(tweets),
+        'shard_size': EXPORT_SHARD_SIZE,
+        'shards': shards,
+        'authors': authors,
+        'search': search,
+        'id_index': {'bucket_count': ID_INDEX_BUCKETS, 'files': id_files},
+        'stats': count_stats(tweets),
+        'layout': EXPORT_LAYOUT,
+        'compression': export_settings()['compression']
+    }
+    return manifest, written
+
+
+def apply_changes(manifest, changed):
+    """
+    增量合并: 只读取变化推文所在的分片 (由 id 索引定位)、插入位置之后的分片和受影响的搜索索引分片
+    已有推文原地更新，新推文按发布时间并入；没有改动的分片条目原样保留
+    返回本次写入的文件数
+    """
+    id_files = manifest['id_index']['files']
+    buckets = {}
+
+    def load_bucket(index):
+        if index not in buckets:
+            path = id_files[index]
+            buckets[index] = _read_json(os.path.join(DOCS_DIR, path)) if path else {}
+        return buckets[index]
+
+    shards = ShardList('data/', manifest['shards'])
+    author_lists = {}
+
+    def author_list(author):
+        if author not in author_lists:
+            entry = manifest['authors'].setdefault(author, {'count': 0, 'shards': []})
+            author_lists[author] = ShardList(f"data/authors/{_author_dir(author)}/", entry['shards'])
+        return author_lists[author]
+
+    stats = manifest['stats']
+    updated = 0
+    new_tweets = []
+    for tweet_id, tweet in changed.items():
+        location = load_bucket(id_bucket(tweet_id)).get(tweet_id)
+        if location is None:
+            new_tweets.append(tweet)
+            continue
+        old = shards.replace(location[0], tweet)
+        if old['author'] != tweet['author']:
+            raise ExportMismatch(f"推文 {tweet_id} 的作者变化 ({old['author']} -> {tweet['author']})")
+        if old == tweet:
+            continue
+        if EXPORT_AUTHOR_SHARDS:
+            if location[1] is None:
+                raise ExportMismatch(f"id 索引中缺少推文 {tweet_id} 的作者分片")
+            author_list(tweet['author']).replace(location[1], tweet)
+        update_stats(stats, old, tweet)
+        updated += 1
+
+    new_tweets = sort_tweets(new_tweets)
+    shards.insert(new_tweets, EXPORT_REORDER_SHARDS)
+    if EXPORT_AUTHOR_SHARDS:
+        by_author = {}
+        for tweet in new_tweets:
+            by_author.setdefault(tweet['author'], []).append(tweet)
+        for author, author_tweets in by_author.items():
+            author_list(author).insert(author_tweets, EXPORT_REORDER_SHARDS)
+            manifest['authors'][author]['count'] += len(author_tweets)
+    for tweet in new_tweets:
+        update_stats(stats, None, tweet)
+
+    # id 索引: 只改写所在分片变化的推文
+    for tweet_id, index in shards.moved():
+        load_bucket(id_bucket(tweet_id)).setdefault(tweet_id, [None, None])[0] = index
+    for shard_list in author_lists.values():
+        for tweet_id, index in shard_list.moved():
+            load_bucket(id_bucket(tweet_id)).setdefault(tweet_id, [None, None])[1] = index
+
+    # 搜索索引的文档编号即全局位置，按位置比较前后内容
+    search_changes = shards.changes()
+    loaded_shards = len(shards.loaded)
+    written = shards.flush()
+    for shard_list in author_lists.values():
+        written += shard_list.flush()
+
+    if manifest['search'] and search_changes:
+        search_files = manifest['search']['files']
+
+        def load_search_shard(index):
+            path = search_files[index]
+            return _read_json(os.path.join(DOCS_DIR, path))['terms'] if path else {}
+
+        for index, terms in update_index(search_changes, load_search_shard, EXPORT_SEARCH_SHARDS).items():
+            rel_path = None
+            if terms:
+                rel_path, new_file = write_artifact(f"data/search/index-{index:03d}", {'terms': terms})
+                written += new_file
+            search_files[index] = rel_path
+
+    for index, bucket in buckets.items():
+        if bucket:
+            id_files[index], new_file = write_artifact(f"data/ids/bucket-{index:03d}", dict(sorted(bucket.items())))
+            written += new_file
+
+    manifest['total_count'] = shards.total
+    print(f"   更新 {updated} 条、新增 {len(new_tweets)} 条，"
+          f"读取 {loaded_shards} 个分片、{len(buckets)} 个 id 索引分片")
+    return written
+
+
+def export_tweets_to_json(mode=EXPORT_MODE):
     """从数据库导出推文为 JSON"""
     try:
         print("=" * 80)
         print("开始导出推文数据到 GitHub Pages")
         print("=" * 80)
         print()
-        
+
+        if 'brotli' in EXPORT_COMPRESS and brotli is None:
+            print("⚠️  未安装 brotli，跳过 .br 压缩副本 (pip install brotli)")
+
+        manifest = load_manifest() if mode != 'full' else None
+        watermark = manifest.get('watermark') if manifest else None
+        incremental = bool(watermark)
+        if mode != 'full' and not incremental:
+            print("ℹ️  没有可用的上次导出数据或水位线，本次全量导出")
+
         conn = psycopg2.connect(DATABASE_URL)
-        cursor = conn.cursor()
-        
-        # 获取总数
-        cursor.execute("SELECT COUNT(*) FROM tweets;")
-        total_count = cursor.fetchone()[0]
-        print(f"数据库中共有 {total_count} 条推文")
-        
-        # 导出所有推文（按时间倒序）
-        cursor.execute("""
-            SELECT 
-                tweet_id,
-                author,
-                content,
-                content_zh,
-                images,
-                video_url,
-                published_at,
-                source_url,
-                created_at
-            FROM tweets
-            ORDER BY published_at DESC NULLS LAST, created_at DESC;
-        """)
-        
-        tweets = []
-        for row in cursor.fetchall():
-            tweet = {
-                'tweet_id': row[0],
-                'author': row[1],
-                'content': row[2],
-                'content_zh': row[3],
-                'images': row[4] if row[4] else [],
-                'video_url': row[5],
-                'published_at': row[6].isoformat() if row[6] else None,
-                'source_url': row[7],
-                'created_at': row[8].isoformat() if row[8] else None
-            }
-            tweets.append(tweet)
-        
-        # 创建 docs 目录
-        os.makedirs('docs', exist_ok=True)
-        
-        # 保存完整数据
-        data = {
-            'updated_at': datetime.now().isoformat(),
-            'total_count': len(tweets),
-            'tweets': tweets
-        }
-        
-        with open('docs/data.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        print(f"✅ 成功导出 {len(tweets)} 条推文到 docs/data.json")
-        
-        # 生成统计信息
+
+        if incremental:
+            since = datetime.fromisoformat(watermark) - timedelta(seconds=EXPORT_OVERLAP)
+            print(f"增量导出: 读取 {since.isoformat()} 之后更新的推文")
+            rows = iter_changed_rows(conn, since)
+        else:
+            print("全量导出: 读取所有推文")
+            rows = iter_all_rows(conn)
+
+        tweets_by_id = {}
+        new_watermark = datetime.fromisoformat(watermark) if watermark else None
+        for row in rows:
+            tweets_by_id[row[0]] = row_to_tweet(row)
+            if row[9] and (new_watermark is None or row[9] > new_watermark):
+                new_watermark = row[9]
+
+        print(f"读取到 {len(tweets_by_id)} 条{'新增或更新的' if incremental else ''}推文")
+
+        if incremental and not tweets_by_id:
+            conn.rollback()
+            conn.close()
+            print("✅ 没有需要更新的推文，保留现有导出文件")
+            return
+
+        written = None
+        if incremental:
+            try:
+                written = apply_changes(manifest, tweets_by_id)
+            except (ExportMismatch, OSError, ValueError, LookupError, TypeError, AttributeError) as e:
+                # 分片、id 索引或搜索索引文件损坏 (截断、结构不对) 时同样改为全量导出
+                print(f"⚠️  已有导出文件不一致或已损坏，改为全量导出: {e}")
+                tweets_by_id = {}
+                new_watermark = None
+                for row in iter_all_rows(conn):
+                    tweets_by_id[row[0]] = row_to_tweet(row)
+                    if row[9] and (new_watermark is None or row[9] > new_watermark):
+                        new_watermark = row[9]
+
+        conn.rollback()
+        conn.close()
+
+        if written is None:
+            manifest, written = build_full(list(tweets_by_id.values()))
+
+        os.makedirs(SHARD_DIR, exist_ok=True)
+        manifest['updated_at'] = datetime.now().isoformat()
+        manifest['watermark'] = new_watermark.isoformat() if new_watermark else None
+        with open(MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+        referenced = referenced_files(manifest)
+        removed = remove_stale_files(referenced)
+
+        print(f"✅ 成功导出 {manifest['total_count']} 条推文到 {SHARD_DIR}/ "
+              f"({len(referenced)} 个文件，本次写入 {written} 个，删除 {removed} 个过期文件)")
+
+        # 生成统计信息 (由清单中维护的计数得出，增量导出不需要读取全部推文)
+        counts = manifest['stats']
         stats = {
-            'total_tweets': len(tweets),
-            'tweets_with_video': sum(1 for t in tweets if t['video_url']),
-            'tweets_with_images': sum(1 for t in tweets if t['images']),
-            'unique_authors': len(set(t['author'] for t in tweets)),
+            'total_tweets': manifest['total_count'],
+            'tweets_with_video': counts['tweets_with_video'],
+            'tweets_with_images': counts['tweets_with_images'],
+            'unique_authors': sum(1 for n in counts['author_counts'].values() if n),
             'updated_at': datetime.now().isoformat()
         }
-        
-        with open('docs/stats.json', 'w', encoding='utf-8') as f:
+
+        with open(STATS_FILE, 'w', encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
-        
+
         print(f"✅ 统计信息:")
         print(f"   - 总推文数: {stats['total_tweets']}")
         print(f"   - 包含视频: {stats['tweets_with_video']}")
         print(f"   - 包含图片: {stats['tweets_with_images']}")
         print(f"   - 作者数量: {stats['unique_authors']}")
-        
-        cursor.close()
-        conn.close()
-        
+
         print()
         print("=" * 80)
         print("导出完成！")
         print("=" * 80)
-        
+
     except Exception as e:
         print(f"❌ 导出失败: {e}")
         import traceback
@@ -107,4 +785,5 @@ def export_tweets_to_json():
         exit(1)
 
 if __name__ == "__main__":
-    export_tweets_to_json()
+    # python export_to_pages.py --full 强制全量重建
+    export_tweets_to_json('full' if '--full' in sys.argv[1:] else EXPORT_MODE)
@@ -0,0 +1,131 @@
+"""
+图床上传去重缓存
+以图片指纹为键记录已上传的 ImgBB URL，三级查找:
+内存 -> 本地 SQLite -> 数据库 image_uploads 表 (可选回调)
+一张图可以有多个键 (视频 URL、帧的感知哈希、内容哈希)，命中任意一个即跳过上传
+感知哈希键只表示 "画面相似"，必须由调用方限定范围 (例如同一条推文)，否则不同视频的相似画面会共用封面
+"""
+import hashlib
+import sqlite3
+import threading
+
+
+def content_key(data):
+    """图片字节的内容哈希键"""
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+def source_key(kind, value):
+    """按来源 (视频 URL、推文内的帧感知哈希等) 生成的键"""
+    return f'{kind}:' + hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+class ImageUploadCache:
+    """
+    上传去重缓存
+    - path: SQLite 文件路径
+    - db_lookup: 可选回调，传入键列表，返回 {键: URL}
+    - db_store: 可选回调，传入 [(键, URL), ...] 写入数据库
+    """
+
+    def __init__(self, path, db_lookup=None, db_store=None):
+        self.path = path
+        self.db_lookup = db_lookup
+        self.db_store = db_store
+
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self._conn.commit()
+        except Exception as e:
+            print(f"[图床缓存] 本地缓存不可用，仅使用内存缓存: {e}")
+            self._conn = None
+
+    def _local_get(self, key):
+        if key in self._memory:
+            return self._memory[key]
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT url FROM uploads WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._memory[key] = row[0]
+            return row[0]
+        return None
+
+    def _local_put(self, keys, url):
+        for key in keys:
+            self._memory[key] = url
+        if self._conn is None:
+            return
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO uploads (key, url) VALUES (?, ?)",
+                [(key, url) for key in keys]
+            )
+            self._conn.commit()
+        except Exception as e:
+            print(f"[图床缓存] 写入本地缓存失败: {e}")
+
+    def get(self, keys):
+        """按顺序查找任意一个键，命中时返回 URL 并把其余键也指向它"""
+        keys = [key for key in keys if key]
+        if not keys:
+            return None
+
+        url = None
+        with self._lock:
+            for key in keys:
+                url = self._local_get(key)
+                if url:
+                    break
+
+        if not url and self.db_lookup:
+            try:
+                found = self.db_lookup(keys) or {}
+            except Exception as e:
+                print(f"[图床缓存] 查询数据库失败: {e}")
+                found = {}
+            url = next((found[key] for key in keys if found.get(key)), None)
+
+        if url:
+            self.hits += 1
+            with self._lock:
+                self._local_put(keys, url)
+        else:
+            self.misses += 1
+        return url
+
+    def put(self, keys, url):
+        """记录一次上传结果"""
+        keys = [key for key in keys if key]
+        if not keys or not url:
+            return
+        with self._lock:
+            self._local_put(keys, url)
+        if self.db_store:
+            try:
+                self.db_store([(key, url) for key in keys])
+            except Exception as e:
+                print(f"[图床缓存] 写入数据库失败: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if self.hits or self.misses:
+            print(f"[图床缓存] 命中 {self.hits} 次，未命中 {self.misses} 次")
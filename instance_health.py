@@ -0,0 +1,293 @@
+"""
+Nitter 实例健康记分板
+按实例 URL 持久化记录成功率、页面加载延迟 (p50/p95)、浏览器验证次数和最近一次失败，
+计数随时间指数衰减；按加权分数选择实例，并对连续失败的实例熔断一段时间
+同时记录每个实例浏览器验证的通过耗时，用来给之后的验证等待设定按实例的时限
+"""
+import os
+import json
+import math
+import time
+import random
+import threading
+
+# 每个实例保留的最近延迟样本数
+LATENCY_SAMPLES = 50
+# 每个实例保留的最近验证通过耗时样本数
+CHALLENGE_SAMPLES = 20
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class InstanceHealth:
+    """
+    实例健康记分板
+    - half_life: 计数衰减半衰期 (秒)，旧的成功/失败逐渐失去权重
+    - failure_threshold: 连续失败多少次后熔断
+    - cooldown / max_cooldown: 熔断时长，连续失败越多时间越长 (指数退避)
+    """
+
+    def __init__(self, path, half_life=6 * 3600, failure_threshold=3, cooldown=600, max_cooldown=86400):
+        self.path = path
+        self.half_life = half_life
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._records = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """从文件加载历史记录，文件不存在或损坏时从空白开始"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._records = data
+                print(f"[实例健康] 已加载 {len(self._records)} 个实例的历史记录")
+        except Exception as e:
+            print(f"[实例健康] 加载记录失败: {e}")
+
+    def save(self):
+        """写回文件 (先写临时文件再替换，避免中途崩溃留下半个文件)"""
+        with self._lock:
+            data = json.dumps(self._records, ensure_ascii=False, indent=2)
+        try:
+            # 临时文件名带进程号，分片模式下多个进程同时保存时互不覆盖
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[实例健康] 保存记录失败: {e}")
+
+    def _key(self, instance):
+        return instance.rstrip('/')
+
+    def _record(self, instance, now):
+        """取出实例记录，并把衰减计数推进到当前时间"""
+        key = self._key(instance)
+        record = self._records.get(key)
+        if record is None:
+            record = {
+                'success': 0.0,
+                'failure': 0.0,
+                'challenges': 0.0,
+                'latencies': [],
+                'challenge_clear': [],
+                'challenge_timed_out': False,
+                'consecutive_failures': 0,
+                'open_until': 0,
+                'last_success': None,
+                'last_failure': None,
+                'last_error': None,
+                'needs_browser_until': 0,
+                'full_render_until': 0,
+                'updated_at': now
+            }
+            self._records[key] = record
+
+        elapsed = max(0, now - record.get('updated_at', now))
+        if elapsed and self.half_life:
+            factor = 0.5 ** (elapsed / self.half_life)
+            for field in ('success', 'failure', 'challenges'):
+                record[field] = record.get(field, 0.0) * factor
+        record['updated_at'] = now
+        return record
+
+    def record_latency(self, instance, seconds):
+        """记录一次页面加载耗时"""
+        with self._lock:
+            record = self._record(instance, time.time())
+            record['latencies'] = (record.get('latencies', []) + [round(seconds, 3)])[-LATENCY_SAMPLES:]
+
+    def record_challenge(self, instance):
+        """记录一次浏览器验证 (Cloudflare 等)"""
+        with self._lock:
+            record = self._record(instance, time.time())
+            record['challenges'] = record.get('challenges', 0.0) + 1
+
+    def record_challenge_clear(self, instance, seconds):
+        """记录一次验证通过及其耗时 (从检测到验证到页面可用)"""
+        with self._lock:
+            record = self._record(instance, time.time())
+            record['challenge_clear'] = (record.get('challenge_clear', []) + [round(seconds, 3)])[-CHALLENGE_SAMPLES:]
+            record['challenge_timed_out'] = False
+
+    def record_challenge_timeout(self, instance):
+        """记录一次验证在时限内未通过，下次按最长时限等待"""
+        with self._lock:
+            record = self._record(instance, time.time())
+            record['challenge_timed_out'] = True
+
+    def challenge_budget(self, instance, default, minimum, maximum, margin=1.5):
+        """
+        该实例等待验证的时限 (秒)
+        - 没有验证记录: default
+        - 上次验证超时: maximum (时限可能设得太短，重新探测)
+        - 其余: 验证通过耗时的 p95 x margin，限制在 [minimum, maximum] 之间
+        """
+        record = self._records.get(self._key(instance))
+        if not record:
+            return default
+        if record.get('challenge_timed_out'):
+            return maximum
+        p95 = _percentile(record.get('challenge_clear', []), 95)
+        if p95 is None:
+            return default
+        return max(minimum, min(maximum, p95 * margin))
+
+    def record_success(self, instance):
+        """记录一次成功抓取，同时关闭熔断"""
+        with self._lock:
+            now = time.time()
+            record = self._record(instance, now)
+            record['success'] = record.get('success', 0.0) + 1
+            record['consecutive_failures'] = 0
+            record['open_until'] = 0
+            record['last_success'] = now
+
+    def record_failure(self, instance, reason):
+        """
+        记录一次失败
+        reason: forbidden / timeout / challenge / empty / error 等简短原因
+        """
+        with self._lock:
+            now = time.time()
+            record = self._record(instance, now)
+            record['failure'] = record.get('failure', 0.0) + 1
+            record['consecutive_failures'] = record.get('consecutive_failures', 0) + 1
+            record['last_failure'] = now
+            record['last_error'] = reason
+
+            over = record['consecutive_failures'] - self.failure_threshold
+            if over >= 0:
+                duration = min(self.cooldown * (2 ** over), self.max_cooldown)
+                record['open_until'] = now + duration
+                print(f"[实例健康] ⛔ {self._key(instance)} 连续失败 {record['consecutive_failures']} 次，熔断 {duration / 60:.0f} 分钟")
+
+    def mark_needs_browser(self, instance, ttl):
+        """标记实例需要浏览器渲染 (HTTP 直连遇到验证或 403)，ttl 秒后重新尝试 HTTP"""
+        with self._lock:
+            now = time.time()
+            record = self._record(instance, now)
+            record['needs_browser_until'] = now + ttl
+
+    def needs_browser(self, instance, now=None):
+        """实例是否需要走浏览器 (标记未过期)"""
+        record = self._records.get(self._key(instance))
+        if not record:
+            return False
+        return record.get('needs_browser_until', 0) > (now or time.time())
+
+    def mark_needs_full_render(self, instance, ttl):
+        """标记实例需要完整渲染 (精简加载时验证未通过)，ttl 秒后重新尝试精简加载"""
+        with self._lock:
+            now = time.time()
+            record = self._record(instance, now)
+            record['full_render_until'] = now + ttl
+
+    def needs_full_render(self, instance, now=None):
+        """实例是否需要完整渲染 (不拦截图片/样式等资源)"""
+        record = self._records.get(self._key(instance))
+        if not record:
+            return False
+        return record.get('full_render_until', 0) > (now or time.time())
+
+    def is_open(self, instance, now=None):
+        """实例是否处于熔断状态"""
+        record = self._records.get(self._key(instance))
+        if not record:
+            return False
+        return record.get('open_until', 0) > (now or time.time())
+
+    def score(self, instance, prior=1.0):
+        """
+        实例得分 (越高越好)
+        成功率 (带平滑) x 延迟系数 x 验证惩罚；没有记录的实例按 50% 成功率乘以 prior 计
+        """
+        with self._lock:
+            record = self._records.get(self._key(instance))
+            if not record:
+                return 0.5 * prior
+            record = self._record(instance, time.time())
+            success = record['success']
+            failure = record['failure']
+            challenges = record['challenges']
+            p50 = _percentile(record.get('latencies', []), 50)
+
+        # 拉普拉斯平滑，少量样本时不至于大起大落
+        success_rate = (success + 1.0) / (success + failure + 2.0)
+        latency_factor = 1.0 / (1.0 + (p50 or 0) / 10.0)
+        challenge_factor = 1.0 / (1.0 + challenges / max(1.0, success + failure))
+        return max(1e-3, success_rate * latency_factor * challenge_factor)
+
+    def order(self, instances, preferred=0):
+        """
+        按加权分数对实例做随机排序 (分数越高越可能排在前面)，熔断中的实例放到最后兜底
+        preferred: 列表前 preferred 个实例在没有历史记录时获得更高的初始分
+        """
+        now = time.time()
+        available = []
+        tripped = []
+        for i, instance in enumerate(instances):
+            if self.is_open(instance, now):
+                tripped.append(instance)
+                continue
+            prior = 1.0 if i < preferred or not preferred else 0.5
+            weight = self.score(instance, prior=prior)
+            # Efraimidis-Spirakis 加权无放回抽样
+            available.append((random.random() ** (1.0 / weight), instance))
+
+        available.sort(reverse=True)
+        return [instance for _, instance in available] + tripped
+
+    def summary(self):
+        """返回每个实例的可读统计，按得分降序"""
+        now = time.time()
+        rows = []
+        for key in list(self._records):
+            record = self._records[key]
+            latencies = record.get('latencies', [])
+            clear_times = record.get('challenge_clear', [])
+            rows.append({
+                'instance': key,
+                'score': round(self.score(key), 3),
+                'success': round(record.get('success', 0.0), 2),
+                'failure': round(record.get('failure', 0.0), 2),
+                'challenges': round(record.get('challenges', 0.0), 2),
+                'p50': _percentile(latencies, 50),
+                'p95': _percentile(latencies, 95),
+                'challenge_p95': _percentile(clear_times, 95),
+                'open': self.is_open(key, now),
+                'needs_browser': self.needs_browser(key, now),
+                'full_render': self.needs_full_render(key, now),
+                'last_error': record.get('last_error')
+            })
+        rows.sort(key=lambda r: r['score'], reverse=True)
+        return rows
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print("[实例健康] 实例得分:")
+        for r in rows:
+            p50 = f"{r['p50']:.1f}s" if r['p50'] is not None else '-'
+            p95 = f"{r['p95']:.1f}s" if r['p95'] is not None else '-'
+            challenge_p95 = f" 验证耗时 p95 {r['challenge_p95']:.1f}s" if r['challenge_p95'] is not None else ''
+            state = "⛔ 熔断" if r['open'] else "✅"
+            if r['needs_browser']:
+                state += " 🌐"
+            if r['full_render']:
+                state += " 🖼"
+            print(f"   {state} {r['instance']} | 得分 {r['score']} | 成功 {r['success']} 失败 {r['failure']} "
+                  f"验证 {r['challenges']}{challenge_p95} | p50 {p50} p95 {p95} | 最近错误 {r['last_error'] or '-'}")
@@ -0,0 +1,226 @@
+"""
+持久化任务队列
+任务保存在 Postgres 的 jobs 表中，用 SELECT ... FOR UPDATE SKIP LOCKED 领取:
+- 多个运行进程 (或多个 CI 任务) 可以同时从同一张表取任务，互不重复
+- 领取时写入租约 (lease_owner / lease_expires_at)，处理期间后台线程定期续约；进程中途崩溃后租约过期，任务会被其他进程重新领取
+- 失败的任务按指数退避推迟 next_run_at，超过 max_attempts 次后标记为 failed
+- 同一 kind + dedupe_key 同时只有一个未完成的任务 (pending / running)，重复入队会被忽略
+"""
+import os
+import random
+import socket
+import threading
+from psycopg2.extras import Json, execute_values
+
+
+def default_owner():
+    """租约持有者标识: 主机名 + 进程号"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class JobQueue:
+    """
+    Postgres 任务队列
+    - connection: 借出数据库连接的上下文管理器 (db_connection)
+    - owner: 租约持有者标识
+    - lease_seconds: 多久没有续约视为进程已崩溃，任务可被重新领取 (处理期间每 lease_seconds / 3 续约一次)
+    - max_attempts: 最多尝试次数
+    - backoff_base / backoff_max: 第 n 次失败后推迟 min(backoff_max, backoff_base * 2^(n-1)) 秒 (带随机抖动)
+    """
+
+    def __init__(self, connection, owner=None, lease_seconds=600, max_attempts=5, backoff_base=60, backoff_max=3600):
+        self.connection = connection
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # 统计信息
+        self.completed = 0
+        self.failed = 0
+
+    def enqueue(self, kind, items):
+        """
+        批量入队，items 为 [(dedupe_key, payload), ...]
+        已有相同 kind + dedupe_key 的未完成任务时跳过，返回实际新增的任务数
+        """
+        items = list(items)
+        if not items:
+            return 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            inserted = execute_values(cursor, """
+                INSERT INTO jobs (kind, dedupe_key, payload, max_attempts)
+                VALUES %s
+                ON CONFLICT (kind, dedupe_key) WHERE state IN ('pending', 'running') DO NOTHING
+                RETURNING id;
+            """, [(kind, key, Json(payload), self.max_attempts) for key, payload in items], fetch=True)
+            conn.commit()
+            cursor.close()
+        return len(inserted)
+
+    def claim(self, kinds, limit=1):
+        """
+        领取最多 limit 个到期的任务 (包括租约已过期的 running 任务)
+        返回 [{'id', 'kind', 'payload', 'attempts', 'max_attempts'}, ...]
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE jobs SET
+                    state = 'running',
+                    attempts = attempts + 1,
+                    lease_owner = %s,
+                    lease_expires_at = NOW() + make_interval(secs => %s),
+                    updated_at = NOW()
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE kind = ANY(%s)
+                      AND ((state = 'pending' AND next_run_at <= NOW())
+                           OR (state = 'running' AND lease_expires_at < NOW()))
+                    ORDER BY next_run_at, id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, kind, payload, attempts, max_attempts;
+            """, (self.owner, self.lease_seconds, list(kinds), limit))
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+        rows.sort(key=lambda row: row[0])
+        return [
+            {'id': row[0], 'kind': row[1], 'payload': row[2] or {}, 'attempts': row[3], 'max_attempts': row[4]}
+            for row in rows
+        ]
+
+    def complete(self, jobs):
+        """标记任务完成 (只处理自己持有租约的任务)"""
+        ids = [job['id'] for job in jobs]
+        if not ids:
+            return
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE jobs SET state = 'done', last_error = NULL, lease_owner = NULL,
+                    lease_expires_at = NULL, updated_at = NOW()
+                WHERE id = ANY(%s) AND lease_owner = %s;
+            """, (ids, self.owner))
+            updated = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        # 租约已被其他进程接手的任务不计入
+        self.completed += updated
+        if updated < len(ids):
+            print(f"[任务] ⚠️ {len(ids) - updated} 个任务的租约已不在本进程，完成状态未写入")
+
+    def extend(self, jobs):
+        """续约仍由本进程持有的任务，返回续约成功的任务数"""
+        ids = [job['id'] for job in jobs]
+        if not ids:
+            return 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE jobs SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                WHERE id = ANY(%s) AND lease_owner = %s AND state = 'running';
+            """, (self.lease_seconds, ids, self.owner))
+            extended = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        return extended
+
+    def _heartbeat(self, jobs, stop):
+        """处理期间定期续约，直到 stop 被设置"""
+        interval = max(1, self.lease_seconds / 3)
+        while not stop.wait(interval):
+            try:
+                extended = self.extend(jobs)
+                if extended < len(jobs):
+                    print(f"[任务] ⚠️ {len(jobs) - extended} 个任务的租约已失效，可能被其他进程重新领取")
+            except Exception as e:
+                print(f"[任务] ⚠️ 续约失败: {e}")
+
+    def backoff(self, attempts):
+        delay = self.backoff_base * (2 ** max(0, attempts - 1))
+        return min(self.backoff_max, delay * random.uniform(0.8, 1.2))
+
+    def fail(self, job, error):
+        """任务失败: 未到最大次数时按退避时间重新排队，否则标记为 failed"""
+        final = job['attempts'] >= job['max_attempts']
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE jobs SET
+                    state = %s,
+                    next_run_at = NOW() + make_interval(secs => %s),
+                    last_error = %s,
+                    lease_owner = NULL,
+                    lease_expires_at = NULL,
+                    updated_at = NOW()
+                WHERE id = %s AND lease_owner = %s;
+            """, ('failed' if final else 'pending', 0 if final else self.backoff(job['attempts']),
+                  str(error)[:1000], job['id'], self.owner))
+            updated = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        if not updated:
+            print(f"[任务] ⚠️ {job['kind']} #{job['id']} 的租约已不在本进程，失败状态未写入: {error}")
+        elif final:
+            self.failed += 1
+            print(f"[任务] ❌ {job['kind']} #{job['id']} 已失败 {job['attempts']} 次，不再重试: {error}")
+        else:
+            print(f"[任务] ⚠️ {job['kind']} #{job['id']} 第 {job['attempts']} 次失败，稍后重试: {error}")
+
+    def run(self, kinds, handler, batch_size=1):
+        """
+        反复领取并处理任务，直到没有到期的任务
+        handler: 传入任务列表，返回等长的错误列表 (None 表示成功)；抛出异常时整批视为失败
+        handler 运行期间由后台线程续约，处理时间超过 lease_seconds 的任务不会被其他进程重复领取
+        返回处理的任务数
+        """
+        processed = 0
+        while True:
+            jobs = self.claim(kinds, batch_size)
+            if not jobs:
+                return processed
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(jobs, stop), daemon=True)
+            heartbeat.start()
+            try:
+                errors = list(handler(jobs))
+            except Exception as e:
+                errors = [e] * len(jobs)
+            finally:
+                stop.set()
+                heartbeat.join()
+            self.complete([job for job, error in zip(jobs, errors) if error is None])
+            for job, error in zip(jobs, errors):
+                if error is not None:
+                    self.fail(job, error)
+            processed += len(jobs)
+
+    def prune(self, retention_days):
+        """删除完成超过 retention_days 天的任务，返回删除数"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM jobs
+                WHERE state = 'done' AND updated_at < NOW() - make_interval(days => %s);
+            """, (int(retention_days),))
+            deleted = cursor.rowcount
+            conn.commit()
+            cursor.close()
+        return deleted
+
+    def summary(self):
+        """按 kind / state 统计任务数: {kind: {state: count}}"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT kind, state, COUNT(*) FROM jobs GROUP BY kind, state;")
+            rows = cursor.fetchall()
+            cursor.close()
+        counts = {}
+        for kind, state, count in rows:
+            counts.setdefault(kind, {})[state] = count
+        return counts
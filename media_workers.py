@@ -0,0 +1,78 @@
+"""
+媒体工作线程池
+封面可访问性检查和视频封面生成 (取帧 + 上传图床) 都是较慢的网络操作，
+抓取流程只记录待处理的媒体任务，由后台线程并行处理后再更新数据库中的推文
+"""
+import time
+import queue
+import threading
+
+# 队列结束标记
+_STOP = object()
+
+
+class MediaWorkerPool:
+    """
+    媒体处理线程池
+    - resolve: 传入任务字典，返回推文最终的图片列表
+    - update: 传入 (tweet_id, 图片列表) 更新数据库，返回更新的行数
+    - workers: 后台线程数
+    - retry_delay / max_attempts: 推文还在写入缓冲中尚未入库时 (更新 0 行)，等待后重试更新
+    """
+
+    def __init__(self, resolve, update, workers=2, retry_delay=5.0, max_attempts=6):
+        self.resolve = resolve
+        self.update = update
+        self.retry_delay = retry_delay
+        self.max_attempts = max(1, max_attempts)
+
+        self._queue = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'media-worker-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        # 统计信息
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, job):
+        """提交一个媒体任务 (立即返回)，任务需包含 tweet_id"""
+        self._queue.put(job)
+
+    def close(self):
+        """处理完队列中剩余的任务后停止所有后台线程"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self.processed or self.failed:
+            print(f"[媒体] 工作线程已关闭 (完成 {self.processed} 条，失败 {self.failed} 条)")
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            try:
+                self._process(job)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"[媒体] 处理推文 {job.get('tweet_id')} 的媒体失败: {e}")
+
+    def _process(self, job):
+        images = self.resolve(job)
+        for attempt in range(self.max_attempts):
+            if self.update(job['tweet_id'], images):
+                with self._lock:
+                    self.processed += 1
+                return
+            if attempt + 1 < self.max_attempts:
+                time.sleep(self.retry_delay)
+        with self._lock:
+            self.failed += 1
+        print(f"[媒体] ⚠️ 推文 {job['tweet_id']} 一直未入库，放弃更新媒体")
@@ -0,0 +1,98 @@
+"""
+自适应轮询调度
+按每个账号的发帖频率决定下次轮询时间: 发帖频繁的账号轮询得勤，长期不发帖的账号很少轮询
+- 轮询间隔由最近一段时间的发帖数估算 (平均发帖间隔的 1/polls_per_post)，限制在 [minimum, maximum] 之间
+- 用最小堆按到期时间排序，每次只取出已到期的账号
+- 间隔加随机抖动，避免账号扎堆在同一时刻到期
+- 全局预算 (每小时最多轮询次数) 用令牌桶限制，超出预算的账号顺延到有令牌时
+"""
+import time
+import heapq
+import random
+
+
+def posting_interval(recent_posts, total_posts, window_seconds, default, minimum, maximum, polls_per_post=2):
+    """
+    根据发帖统计估算轮询间隔 (秒)
+    - 没有任何历史记录 (新账号或关键词): 使用 default
+    - 有历史但窗口内没有发帖 (休眠账号): 使用 maximum
+    - 其余: 平均发帖间隔 / polls_per_post
+    """
+    if not total_posts:
+        interval = default
+    elif not recent_posts:
+        interval = maximum
+    else:
+        interval = window_seconds / recent_posts / polls_per_post
+    return max(minimum, min(maximum, interval))
+
+
+class PollScheduler:
+    """
+    轮询调度器
+    - targets: 初始账号列表，全部立即到期
+    - budget_per_hour: 每小时最多轮询次数，0 表示不限
+    - jitter: 间隔随机抖动比例 (0.1 表示 ±10%)
+    """
+
+    def __init__(self, targets, budget_per_hour=0, jitter=0.1, clock=time.time):
+        self.budget_per_hour = budget_per_hour
+        self.jitter = jitter
+        self.clock = clock
+
+        now = clock()
+        self._heap = [(now, index, target) for index, target in enumerate(targets)]
+        heapq.heapify(self._heap)
+        self._counter = len(self._heap)
+
+        # 令牌桶: 容量为一小时的预算，按预算匀速补充
+        self._tokens = float(budget_per_hour)
+        self._refilled_at = now
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _refill(self, now):
+        if not self.budget_per_hour:
+            return
+        elapsed = now - self._refilled_at
+        self._tokens = min(float(self.budget_per_hour), self._tokens + elapsed * self.budget_per_hour / 3600)
+        self._refilled_at = now
+
+    def due(self, limit=None):
+        """取出所有已到期的账号 (受预算和 limit 限制)，调用方轮询后需调用 reschedule"""
+        now = self.clock()
+        self._refill(now)
+        targets = []
+        while self._heap and self._heap[0][0] <= now:
+            if limit is not None and len(targets) >= limit:
+                break
+            if self.budget_per_hour and self._tokens < 1:
+                break
+            _, _, target = heapq.heappop(self._heap)
+            targets.append(target)
+            if self.budget_per_hour:
+                self._tokens -= 1
+        return targets
+
+    def reschedule(self, target, interval):
+        """账号轮询完成后，按新的间隔 (加抖动) 重新排入队列"""
+        if self.jitter:
+            interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        heapq.heappush(self._heap, (self.clock() + interval, self._counter, target))
+        self._counter += 1
+
+    def wait_time(self):
+        """距离下一个账号可以轮询还需等待的秒数 (考虑预算)；队列为空时返回 None"""
+        if not self._heap:
+            return None
+        now = self.clock()
+        self._refill(now)
+        wait = max(0.0, self._heap[0][0] - now)
+        if self.budget_per_hour and self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) * 3600 / self.budget_per_hour)
+        return wait
+
+    def upcoming(self):
+        """[(到期时间, 账号), ...]，按到期时间排序，用于打印调度计划"""
+        return [(due_at, target) for due_at, _, target in sorted(self._heap)]
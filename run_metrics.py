@@ -0,0 +1,235 @@
+"""
+运行指标
+按阶段 (浏览器启动、page.goto、验证等待、解析、封面检查、抽帧、图床上传、翻译、入库等) 记录耗时，
+可附带 target (抓取目标) 和 instance (Nitter 实例) 标签；另有计数器 (重试次数、缓存命中、下载字节数等)
+每轮结束时输出:
+- JSON 运行报告: 各阶段次数/总耗时/p50/p95/最大值/直方图，以及按实例、按目标的分解
+- 控制台直方图摘要
+- 可选的 Prometheus 文本格式文件 (node_exporter textfile collector 可直接读取)
+"""
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# 直方图桶上界 (秒)
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _key(stage, target, instance):
+    return stage, target or '', instance.rstrip('/') if instance else ''
+
+
+def _prom_escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prom_labels(**labels):
+    parts = [f'{name}="{_prom_escape(value)}"' for name, value in labels.items() if value != '']
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class RunMetrics:
+    """
+    一次运行 (LOOP_MODE 下为一轮) 的耗时与计数
+    线程安全，同步/异步抓取、媒体工作线程可以同时记录
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空数据，开始新一轮统计"""
+        with self._lock:
+            self._timings = {}
+            self._counters = {}
+            self.started_at = time.time()
+
+    @contextmanager
+    def timer(self, stage, target=None, instance=None):
+        """计时上下文，异常退出时同样记录"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, target, instance)
+
+    def observe(self, stage, seconds, target=None, instance=None):
+        """记录一次阶段耗时 (秒)"""
+        with self._lock:
+            self._timings.setdefault(_key(stage, target, instance), []).append(seconds)
+
+    def count(self, name, value=1, target=None, instance=None):
+        """累加计数器"""
+        with self._lock:
+            key = _key(name, target, instance)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _stage_summary(self, values, histogram=False):
+        summary = {
+            'count': len(values),
+            'total': round(sum(values), 3),
+            'p50': round(_percentile(values, 50), 3),
+            'p95': round(_percentile(values, 95), 3),
+            'max': round(max(values), 3),
+        }
+        if histogram:
+            summary['histogram'] = {str(bound): sum(1 for v in values if v <= bound) for bound in self.buckets}
+            summary['histogram']['+Inf'] = len(values)
+        return summary
+
+    def report(self):
+        """
+        生成运行报告 (可 JSON 序列化)
+        stages: 各阶段汇总 (含累计直方图)；instances / targets: 按实例、按目标分解的阶段汇总和计数
+        """
+        with self._lock:
+            timings = {key: list(values) for key, values in self._timings.items()}
+            counters = dict(self._counters)
+            started_at = self.started_at
+
+        def group(index):
+            grouped = {}
+            for key, values in timings.items():
+                if key[index]:
+                    grouped.setdefault(key[index], {}).setdefault(key[0], []).extend(values)
+            return grouped
+
+        def group_counters(index):
+            grouped = {}
+            for key, value in counters.items():
+                if key[index]:
+                    bucket = grouped.setdefault(key[index], {})
+                    bucket[key[0]] = bucket.get(key[0], 0) + value
+            return grouped
+
+        by_stage = {}
+        for (stage, _, _), values in timings.items():
+            by_stage.setdefault(stage, []).extend(values)
+        totals = {}
+        for (name, _, _), value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+
+        instance_counters = group_counters(2)
+        target_counters = group_counters(1)
+        now = time.time()
+        return {
+            'started_at': datetime.fromtimestamp(started_at, timezone.utc).isoformat(),
+            'finished_at': datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            'duration': round(now - started_at, 3),
+            'stages': {stage: self._stage_summary(values, histogram=True) for stage, values in sorted(by_stage.items())},
+            'counters': dict(sorted(totals.items())),
+            'instances': {
+                instance: {
+                    'stages': {stage: self._stage_summary(values) for stage, values in sorted(stages.items())},
+                    'counters': instance_counters.get(instance, {})
+                }
+                for instance, stages in sorted(group(2).items())
+            },
+            'targets': {
+                target: {
+                    'stages': {stage: self._stage_summary(values) for stage, values in sorted(stages.items())},
+                    'counters': target_counters.get(target, {})
+                }
+                for target, stages in sorted(group(1).items())
+            },
+        }
+
+    def write_report(self, path, report=None):
+        """写出 JSON 运行报告 (先写临时文件再替换)"""
+        report = report or self.report()
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def prometheus_text(self, prefix='colorful_state'):
+        """
+        Prometheus 文本格式:
+        - {prefix}_stage_seconds: 按 stage / instance 的直方图
+        - {prefix}_events_total: 按 name / instance 的计数器
+        - {prefix}_run_duration_seconds / {prefix}_run_timestamp_seconds
+        """
+        with self._lock:
+            timings = {key: list(values) for key, values in self._timings.items()}
+            counters = dict(self._counters)
+            started_at = self.started_at
+
+        by_stage_instance = {}
+        for (stage, _, instance), values in timings.items():
+            by_stage_instance.setdefault((stage, instance), []).extend(values)
+        counter_totals = {}
+        for (name, _, instance), value in counters.items():
+            counter_totals[(name, instance)] = counter_totals.get((name, instance), 0) + value
+
+        lines = [
+            f'# HELP {prefix}_stage_seconds Time spent per pipeline stage.',
+            f'# TYPE {prefix}_stage_seconds histogram',
+        ]
+        for (stage, instance), values in sorted(by_stage_instance.items()):
+            for bound in self.buckets:
+                labels = _prom_labels(stage=stage, instance=instance, le=bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{labels} {sum(1 for v in values if v <= bound)}')
+            lines.append(f'{prefix}_stage_seconds_bucket{_prom_labels(stage=stage, instance=instance, le="+Inf")} {len(values)}')
+            lines.append(f'{prefix}_stage_seconds_sum{_prom_labels(stage=stage, instance=instance)} {sum(values):.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{_prom_labels(stage=stage, instance=instance)} {len(values)}')
+
+        lines += [
+            f'# HELP {prefix}_events_total Run counters (retries, cache hits, bytes downloaded, ...).',
+            f'# TYPE {prefix}_events_total counter',
+        ]
+        for (name, instance), value in sorted(counter_totals.items()):
+            lines.append(f'{prefix}_events_total{_prom_labels(name=name, instance=instance)} {value}')
+
+        now = time.time()
+        lines += [
+            f'# HELP {prefix}_run_duration_seconds Duration of the last run.',
+            f'# TYPE {prefix}_run_duration_seconds gauge',
+            f'{prefix}_run_duration_seconds {now - started_at:.3f}',
+            f'# HELP {prefix}_run_timestamp_seconds Unix time the last run finished.',
+            f'# TYPE {prefix}_run_timestamp_seconds gauge',
+            f'{prefix}_run_timestamp_seconds {now:.0f}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """写出 Prometheus 文本格式文件"""
+        _atomic_write(path, self.prometheus_text())
+
+    def print_summary(self, report=None):
+        """打印各阶段耗时直方图摘要"""
+        report = report or self.report()
+        if not report['stages'] and not report['counters']:
+            return
+        print(f"[统计] 本轮耗时 {report['duration']:.1f}s，各阶段:")
+        for stage, s in report['stages'].items():
+            buckets = []
+            previous = 0
+            for bound, cumulative in s['histogram'].items():
+                if cumulative - previous:
+                    buckets.append(f"≤{bound}s:{cumulative - previous}" if bound != '+Inf' else f">{self.buckets[-1]}s:{cumulative - previous}")
+                previous = cumulative
+            print(f"   {stage:<16} 次数 {s['count']:<5} 合计 {s['total']:8.1f}s  p50 {s['p50']:6.2f}s  "
+                  f"p95 {s['p95']:6.2f}s  最大 {s['max']:6.2f}s | {' '.join(buckets)}")
+        if report['counters']:
+            print("[统计] 计数: " + ', '.join(f"{name}={value}" for name, value in report['counters'].items()))
+
+
+def _atomic_write(path, data):
+    try:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[统计] 写入 {path} 失败: {e}")
@@ -1,4 +1,5 @@
 -- Colorful State Database Schema for Neon PostgreSQL
+-- 所有语句都可重复执行: setup_db.py 在新库和已有库上都会运行本文件，已有库借此补上新增的列、索引和表
 -- 推文数据表
 
 CREATE TABLE IF NOT EXISTS tweets (
@@ -12,15 +13,65 @@ CREATE TABLE IF NOT EXISTS tweets (
     images JSONB,  -- 图片URL数组 (JSON格式)
     video_url TEXT,
     source_url TEXT,
+    media_pending BOOLEAN DEFAULT FALSE,  -- 封面等媒体仍在后台处理
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+-- 旧版本建的表补上后来新增的列
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS media_pending BOOLEAN DEFAULT FALSE;
 
 -- 创建索引以优化查询性能
 CREATE INDEX IF NOT EXISTS idx_tweet_id ON tweets(tweet_id);
 CREATE INDEX IF NOT EXISTS idx_author ON tweets(author);
 CREATE INDEX IF NOT EXISTS idx_published_at ON tweets(published_at DESC);
 CREATE INDEX IF NOT EXISTS idx_created_at ON tweets(created_at DESC);
+-- 按原文哈希查找已有翻译 (翻译缓存复用 content_zh)
+CREATE INDEX IF NOT EXISTS idx_content_md5 ON tweets(md5(content));
+-- 增量导出按 (updated_at, tweet_id) 键集分页
+CREATE INDEX IF NOT EXISTS idx_updated_at ON tweets(updated_at, tweet_id);
+-- 启动时重新排队未处理完的媒体
+CREATE INDEX IF NOT EXISTS idx_media_pending ON tweets(tweet_id) WHERE media_pending;
+
+-- 全文搜索 (search_tweets.py)
+-- 英文原文 + 作者: tsvector (english 词干化)；中文译文: 相邻两字 (bigram) 加末字，
+-- 不用 pg_trgm 是因为它在 C 排序规则下会忽略非 ASCII 字符，中文无法建立三元组
+CREATE OR REPLACE FUNCTION zh_ngrams(input TEXT) RETURNS tsvector AS $$
+    SELECT coalesce(array_to_tsvector(array_agg(DISTINCT substr(t, i, 2))), ''::tsvector)
+    FROM (SELECT regexp_replace(lower(coalesce(input, '')), '\s+', '', 'g') AS t) AS normalized,
+         generate_series(1, char_length(t)) AS i
+$$ LANGUAGE SQL IMMUTABLE;
+
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(content, '')), 'A') || setweight(to_tsvector('simple', coalesce(author, '')), 'B')) STORED;
+ALTER TABLE tweets ADD COLUMN IF NOT EXISTS content_zh_ngrams tsvector GENERATED ALWAYS AS (zh_ngrams(content_zh)) STORED;
+CREATE INDEX IF NOT EXISTS idx_search_vector ON tweets USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_content_zh_ngrams ON tweets USING GIN (content_zh_ngrams);
+
+-- 图床上传去重: 图片指纹 (视频 URL / 推文内的帧感知哈希 / 内容哈希) -> ImgBB URL
+CREATE TABLE IF NOT EXISTS image_uploads (
+    hash VARCHAR(128) PRIMARY KEY,
+    url TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 持久化任务队列 (job_queue.py): 多个进程用 FOR UPDATE SKIP LOCKED 领取任务
+CREATE TABLE IF NOT EXISTS jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,  -- scrape_status / scrape_timeline / translate / media
+    dedupe_key VARCHAR(255),
+    payload JSONB NOT NULL DEFAULT '{}',
+    state VARCHAR(16) NOT NULL DEFAULT 'pending',  -- pending / running / done / failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    next_run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lease_owner VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+-- 同一任务同时只有一个未完成的副本
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key ON jobs(kind, dedupe_key) WHERE state IN ('pending', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs(kind, next_run_at) WHERE state IN ('pending', 'running');
 
 -- 创建更新时间触发器
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -31,6 +82,7 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+DROP TRIGGER IF EXISTS update_tweets_updated_at ON tweets;
 CREATE TRIGGER update_tweets_updated_at BEFORE UPDATE ON tweets
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
@@ -45,3 +97,5 @@ COMMENT ON COLUMN tweets.is_retweet IS '是否为转发';
 COMMENT ON COLUMN tweets.images IS '图片URL数组(JSON格式)';
 COMMENT ON COLUMN tweets.video_url IS '视频URL';
 COMMENT ON COLUMN tweets.source_url IS '推文来源URL';
+COMMENT ON TABLE image_uploads IS '图床上传记录 (去重用)';
+COMMENT ON TABLE jobs IS '持久化任务队列';
@@ -0,0 +1,161 @@
+"""
+静态搜索倒排索引
+导出时为 GitHub Pages 前端生成，按词项前缀哈希分片，前端只加载查询词所在的分片:
+- 英文等: 按单词切分 (小写、NFKC 规范化)，前端按前缀匹配
+- 中日韩文字: 字符二元组 (bigram)，每段连续文字的最后一个字单独成词，保证单字查询也能按前缀找到
+- 作者: 额外收录 "@用户名" 词项，用于按作者过滤
+文档编号即推文在导出顺序 (按发布时间从旧到新) 中的位置，倒排表按编号升序做差分编码
+
+docs/index.html 中的 tokenize / fnv1a 必须与这里保持一致
+"""
+import re
+import sys
+import unicodedata
+
+CJK_RUN_PATTERN = re.compile(r'[぀-ヿ㐀-䶿一-鿿豈-﫿가-힯]+')
+URL_PATTERN = re.compile(r'https?://\S+')
+
+
+def _mark_ranges():
+    """全部组合标记 (Unicode 类别 M*) 的正则字符区间"""
+    ranges = []
+    start = None
+    for code in range(sys.maxunicode + 2):
+        is_mark = code <= sys.maxunicode and unicodedata.category(chr(code)).startswith('M')
+        if is_mark and start is None:
+            start = code
+        elif not is_mark and start is not None:
+            ranges.append(f'{re.escape(chr(start))}-{re.escape(chr(code - 1))}')
+            start = None
+    return ''.join(ranges)
+
+
+# 与前端 WORD_RE ([\p{L}\p{N}\p{M}_]+) 一致: Python 的 \w 只含字母、数字和下划线，
+# 需要补上组合标记，否则天城文、泰文等文字的单词在索引和查询时切分不同
+WORD_PATTERN = re.compile(r'[\w' + _mark_ranges() + r']+')
+
+# 分词规则版本，规则变化时递增 (已有的导出会全量重建索引)
+TOKENIZER_VERSION = 2
+
+# 单词最短长度 / 最长保留长度 (更长的截断)
+MIN_WORD_LENGTH = 2
+MAX_TERM_LENGTH = 32
+
+
+def normalize(text):
+    """NFKC 规范化、小写，去掉链接"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return URL_PATTERN.sub(' ', text)
+
+
+def tokenize(text):
+    """文本 -> 词项集合"""
+    text = normalize(text)
+    terms = set()
+    for run in CJK_RUN_PATTERN.findall(text):
+        for first, second in zip(run, run[1:]):
+            terms.add(first + second)
+        terms.add(run[-1])
+    for word in WORD_PATTERN.findall(CJK_RUN_PATTERN.sub(' ', text)):
+        if len(word) >= MIN_WORD_LENGTH:
+            terms.add(word[:MAX_TERM_LENGTH])
+    return terms
+
+
+def author_term(author):
+    return '@' + normalize(author).strip()
+
+
+def shard_key(term):
+    """分片键: 中日韩词项取首字，其余取前两个字符 (前缀查询只需加载一个分片)"""
+    if CJK_RUN_PATTERN.match(term[0]):
+        return term[0]
+    return term[:2]
+
+
+def fnv1a(text):
+    """32 位 FNV-1a (按 Unicode 码点)，与前端实现一致"""
+    value = 0x811c9dc5
+    for ch in text:
+        value ^= ord(ch)
+        value = (value * 0x01000193) & 0xffffffff
+    return value
+
+
+def shard_of(term, shard_count):
+    return fnv1a(shard_key(term)) % shard_count
+
+
+def tweet_terms(tweet):
+    """一条推文的全部词项 (正文、译文、作者名和 "@作者")"""
+    terms = tokenize(tweet.get('content'))
+    terms |= tokenize(tweet.get('content_zh'))
+    terms |= tokenize(tweet.get('author'))
+    terms.add(author_term(tweet.get('author') or ''))
+    return terms
+
+
+def encode_postings(ids):
+    """升序文档编号 -> 差分编码"""
+    return [ids[0]] + [ids[i] - ids[i - 1] for i in range(1, len(ids))]
+
+
+def decode_postings(deltas):
+    ids = []
+    current = 0
+    for delta in deltas:
+        current += delta
+        ids.append(current)
+    return ids
+
+
+def build_index(tweets, shard_count=64):
+    """
+    为按导出顺序排列的推文建立倒排索引
+    返回长度为 shard_count 的列表，每项为 {词项: 差分编码的文档编号列表}
+    """
+    postings = {}
+    for doc_id, tweet in enumerate(tweets):
+        for term in tweet_terms(tweet):
+            postings.setdefault(term, []).append(doc_id)
+
+    shards = [{} for _ in range(shard_count)]
+    for term in sorted(postings):
+        shards[shard_of(term, shard_count)][term] = encode_postings(postings[term])
+    return shards
+
+
+def update_index(changes, load_shard, shard_count=64):
+    """
+    增量更新倒排索引
+    changes: [(文档编号, 旧推文 或 None, 新推文), ...]
+    load_shard: 按分片序号读取已有分片 ({词项: 差分编码列表}，不存在时返回 {})
+    只读取和改写词项有变化的分片，返回 {分片序号: 新的分片内容}
+    """
+    removed = {}
+    added = {}
+    for doc_id, old, new in changes:
+        old_terms = tweet_terms(old) if old else set()
+        new_terms = tweet_terms(new)
+        for term in old_terms - new_terms:
+            removed.setdefault(term, set()).add(doc_id)
+        for term in new_terms - old_terms:
+            added.setdefault(term, set()).add(doc_id)
+
+    by_shard = {}
+    for term in set(removed) | set(added):
+        by_shard.setdefault(shard_of(term, shard_count), []).append(term)
+
+    updated = {}
+    for index, terms in by_shard.items():
+        shard = dict(load_shard(index))
+        for term in terms:
+            ids = set(decode_postings(shard.get(term, [])))
+            ids -= removed.get(term, set())
+            ids |= added.get(term, set())
+            if ids:
+                shard[term] = encode_postings(sorted(ids))
+            else:
+                shard.pop(term, None)
+        updated[index] = {term: shard[term] for term in sorted(shard)}
+    return updated
@@ -0,0 +1,122 @@
+"""
+在数据库中全文搜索推文
+英文原文和作者走 search_vector (tsvector + GIN)，中文译文走 content_zh_ngrams (相邻两字 + GIN)，
+结果按相关度排序并分页，无需导出整个归档
+
+用法: python search_tweets.py "关键词" [--page 2] [--size 10] [--author 用户名]
+"""
+import re
+import sys
+import argparse
+from colorful_state import get_db_connection
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _quote_lexeme(lexeme):
+    return "'" + lexeme.replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def zh_ngram_query(text):
+    """
+    按 schema.sql 中 zh_ngrams() 的规则把查询切成相邻两字，返回 tsquery 字符串
+    单个字时按前缀匹配；没有可用字符时返回 None
+    """
+    normalized = re.sub(r'\s+', '', (text or '').lower())
+    if not normalized:
+        return None, ''
+    if len(normalized) == 1:
+        return _quote_lexeme(normalized) + ':*', normalized
+    bigrams = dict.fromkeys(normalized[i:i + 2] for i in range(len(normalized) - 1))
+    return ' & '.join(_quote_lexeme(b) for b in bigrams), normalized
+
+
+def search_tweets(query, page=1, page_size=10, author=None):
+    """
+    搜索推文，返回 (匹配总数, 当前页结果列表)
+    每条结果: tweet_id, author, content, content_zh, published_at, source_url, rank
+    """
+    zh_query, zh_text = zh_ngram_query(query)
+
+    match_clauses = ["search_vector @@ en_q"]
+    rank_terms = ["ts_rank_cd(search_vector, en_q)"]
+    params = [query]
+    from_clause = "tweets, websearch_to_tsquery('english', %s) AS en_q"
+    if zh_query:
+        from_clause += ", CAST(%s AS tsquery) AS zh_q"
+        params.append(zh_query)
+        # 二元组只能保证字都出现过，再核对一次原文包含整个查询，去掉误匹配
+        match_clauses.append(
+            "(content_zh_ngrams @@ zh_q AND strpos(regexp_replace(lower(content_zh), '\\s+', '', 'g'), %s) > 0)"
+        )
+        params.append(zh_text)
+        rank_terms.append("ts_rank(content_zh_ngrams, zh_q)")
+
+    where = f"({' OR '.join(match_clauses)})"
+    if author:
+        where += " AND author = %s"
+        params.append(author)
+
+    params.extend([page_size, (max(1, page) - 1) * page_size])
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT
+                tweet_id, author, content, content_zh, published_at, source_url,
+                {' + '.join(rank_terms)} AS rank,
+                COUNT(*) OVER () AS total
+            FROM {from_clause}
+            WHERE {where}
+            ORDER BY rank DESC, published_at DESC NULLS LAST
+            LIMIT %s OFFSET %s;
+        """, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+    total = rows[0][7] if rows else 0
+    results = [{
+        'tweet_id': row[0],
+        'author': row[1],
+        'content': row[2],
+        'content_zh': row[3],
+        'published_at': row[4],
+        'source_url': row[5],
+        'rank': row[6]
+    } for row in rows]
+    return total, results
+
+
+def print_results(query, total, results, page, page_size):
+    pages = (total + page_size - 1) // page_size
+    print(f"\n搜索 \"{query}\": 共 {total} 条结果，第 {page}/{max(1, pages)} 页\n")
+    for i, r in enumerate(results, (page - 1) * page_size + 1):
+        print(f"{i}. @{r['author']} | {r['published_at'] or '未知时间'} | 相关度 {r['rank']:.3f}")
+        print(f"   {r['content'][:120]}")
+        if r['content_zh']:
+            print(f"   {r['content_zh'][:120]}")
+        if r['source_url']:
+            print(f"   {r['source_url']}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='全文搜索数据库中的推文')
+    parser.add_argument('query', help='搜索词，英文支持 websearch 语法 ("短语"、-排除、or)')
+    parser.add_argument('--page', type=int, default=1, help='页码 (默认 1)')
+    parser.add_argument('--size', type=int, default=10, help='每页条数 (默认 10)')
+    parser.add_argument('--author', help='只搜索指定作者')
+    args = parser.parse_args()
+
+    try:
+        total, results = search_tweets(args.query, page=args.page, page_size=args.size, author=args.author)
+    except Exception as e:
+        print(f"搜索失败: {e}")
+        print("如果提示 search_vector 不存在，请先运行 python setup_db.py 应用迁移")
+        sys.exit(1)
+
+    print_results(args.query, total, results, args.page, args.size)
@@ -67,6 +67,12 @@ try:
         print()
         print(f"当前记录数: {count}")
         
+        print()
+        # schema.sql 的语句都可重复执行，已有表上运行即补齐新增的列、索引和表
+        print("正在应用 schema.sql 中新增的对象...")
+        cursor.execute(schema_sql)
+        print("✅ Schema 已是最新")
+        
     else:
         print("正在创建数据库表...")
         try:
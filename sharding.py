@@ -0,0 +1,42 @@
+"""
+抓取目标分片
+多个工作进程 (本地进程池或 CI 矩阵中的多个任务) 各自只处理一部分用户 / 推文:
+用一致性哈希把目标 (用户名或 tweet_id) 映射到分片，结果在所有进程间确定且互不重叠；
+分片数变化时只有约 1/N 的目标会换到别的分片，实例健康记录等缓存大部分仍然有效
+"""
+import bisect
+import hashlib
+
+
+def _hash(value):
+    """与进程无关的稳定哈希 (内置 hash() 每个进程的随机种子不同)"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    一致性哈希环
+    - shard_count: 分片数
+    - replicas: 每个分片在环上的虚拟节点数，越多分布越均匀
+    """
+
+    def __init__(self, shard_count, replicas=160):
+        self.shard_count = max(1, shard_count)
+        points = []
+        for shard in range(self.shard_count):
+            for replica in range(replicas):
+                points.append((_hash(f'shard-{shard}#{replica}'), shard))
+        points.sort()
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        """目标所在的分片编号"""
+        if self.shard_count == 1:
+            return 0
+        index = bisect.bisect(self._keys, _hash(str(key).lower()))
+        return self._shards[index % len(self._shards)]
+
+    def select(self, items, shard_index, key=lambda item: item):
+        """从 items 中取出属于 shard_index 分片的部分 (保持原顺序)"""
+        return [item for item in items if self.shard_for(key(item)) == shard_index]
@@ -0,0 +1,133 @@
+"""
+浏览器状态持久化
+按实例保存 Playwright 的 storage_state (cookie + localStorage) 和当时使用的 User-Agent，
+之后访问同一实例时带上这些 cookie，已经通过的浏览器验证 (Cloudflare 等的 clearance cookie) 不必重新做一遍
+- 只保留属于该实例域名的 cookie 和 localStorage
+- 超过 ttl 秒的记录以及已过期的 cookie 不再使用
+- 写入文件，可以在 GitHub Actions 的多次运行之间缓存
+"""
+import os
+import json
+import time
+import threading
+import urllib.parse
+
+
+def _host(instance):
+    return (urllib.parse.urlparse(instance).hostname or '').lower()
+
+
+def _origin(instance):
+    parsed = urllib.parse.urlparse(instance)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+
+def _cookie_matches(cookie, host):
+    domain = (cookie.get('domain') or '').lstrip('.').lower()
+    return bool(domain) and (host == domain or host.endswith('.' + domain))
+
+
+def _cookie_alive(cookie, now):
+    # expires 为 -1 表示会话 cookie，由记录的 ttl 控制
+    expires = cookie.get('expires', -1)
+    return expires is None or expires < 0 or expires > now
+
+
+class StorageStateStore:
+    """
+    按实例 URL 保存浏览器状态
+    - ttl: 记录保存多久 (秒)，过期后重新通过验证
+    """
+
+    def __init__(self, path, ttl=12 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._states = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """从文件加载，文件不存在或损坏时从空白开始；过期记录直接丢弃"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                now = time.time()
+                self._states = {k: v for k, v in data.items() if now - v.get('saved_at', 0) < self.ttl}
+                print(f"[浏览器状态] 已加载 {len(self._states)} 个实例的 cookie")
+        except Exception as e:
+            print(f"[浏览器状态] 加载失败: {e}")
+
+    def save(self):
+        """写回文件 (先写临时文件再替换)"""
+        with self._lock:
+            data = json.dumps(self._states, ensure_ascii=False, indent=2)
+        try:
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[浏览器状态] 保存失败: {e}")
+
+    def _key(self, instance):
+        return instance.rstrip('/')
+
+    def get(self, instance, now=None):
+        """
+        取出实例的有效状态: {'user_agent', 'storage_state': {'cookies', 'origins'}}
+        没有记录、记录超过 ttl 或 cookie 全部过期时返回 None
+        """
+        now = now or time.time()
+        with self._lock:
+            state = self._states.get(self._key(instance))
+            if not state:
+                return None
+            if now - state.get('saved_at', 0) >= self.ttl:
+                del self._states[self._key(instance)]
+                return None
+            cookies = [c for c in state.get('cookies', []) if _cookie_alive(c, now)]
+            if not cookies:
+                return None
+            return {
+                'user_agent': state.get('user_agent'),
+                'storage_state': {'cookies': cookies, 'origins': state.get('origins', [])}
+            }
+
+    def put(self, instance, storage_state, user_agent):
+        """
+        保存一次成功加载后的 context.storage_state()
+        只保留该实例的 cookie / localStorage；cookie 没有变化时不刷新保存时间，记录照常按 ttl 过期
+        返回是否保存了新的状态
+        """
+        host = _host(instance)
+        origin = _origin(instance)
+        now = time.time()
+        cookies = [c for c in storage_state.get('cookies', []) if _cookie_matches(c, host) and _cookie_alive(c, now)]
+        if not cookies:
+            return False
+        origins = [o for o in storage_state.get('origins', []) if o.get('origin', '').lower() == origin]
+
+        signature = sorted((c.get('name'), c.get('value')) for c in cookies)
+        with self._lock:
+            old = self._states.get(self._key(instance))
+            if old and old.get('user_agent') == user_agent:
+                if sorted((c.get('name'), c.get('value')) for c in old.get('cookies', [])) == signature:
+                    return False
+            self._states[self._key(instance)] = {
+                'user_agent': user_agent,
+                'cookies': cookies,
+                'origins': origins,
+                'saved_at': now
+            }
+        return True
+
+    def forget(self, instance):
+        """丢弃实例的状态 (例如带着 cookie 仍未通过验证)"""
+        with self._lock:
+            return self._states.pop(self._key(instance), None) is not None
+
+    def __len__(self):
+        return len(self._states)
@@ -0,0 +1,139 @@
+"""
+内容寻址的翻译缓存
+以 "规范化原文 + 模型 + 提示词版本" 的哈希为键，三级查找:
+内存 LRU -> 本地 SQLite -> 数据库中已有的 content_zh (可选回调)
+命中时跳过 DeepSeek API 调用
+"""
+import re
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """规范化原文: Unicode NFC、合并连续空白、去掉首尾空白"""
+    text = unicodedata.normalize('NFC', text or '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class TranslationCache:
+    """
+    翻译缓存
+    - path: SQLite 文件路径
+    - model / prompt_version: 参与计算缓存键，换模型或改提示词后旧缓存自动失效
+    - db_lookup: 可选回调，传入原文列表，返回 {原文: 译文}，用于复用数据库里已有的翻译
+    """
+
+    def __init__(self, path, model, prompt_version, max_memory=2048, db_lookup=None):
+        self.path = path
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_memory = max_memory
+        self.db_lookup = db_lookup
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+        try:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    key TEXT PRIMARY KEY,
+                    translation TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self._conn.commit()
+        except Exception as e:
+            print(f"[翻译缓存] 本地缓存不可用，仅使用内存缓存: {e}")
+            self._conn = None
+
+    def key(self, text):
+        raw = f"{self.model}\x00{self.prompt_version}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _remember(self, key, translation):
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
+
+    def _local_get(self, key):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        if self._conn is None:
+            return None
+        row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+        if row:
+            self._remember(key, row[0])
+            return row[0]
+        return None
+
+    def get_many(self, texts):
+        """批量查找，返回 {原文: 译文}，只包含命中的条目"""
+        found = {}
+        missing = []
+        with self._lock:
+            for text in texts:
+                if text in found:
+                    continue
+                translation = self._local_get(self.key(text))
+                if translation is not None:
+                    found[text] = translation
+                else:
+                    missing.append(text)
+
+        # 本地未命中的再查数据库里已有的翻译，并回填到本地
+        if missing and self.db_lookup:
+            try:
+                from_db = self.db_lookup(missing) or {}
+            except Exception as e:
+                print(f"[翻译缓存] 查询数据库已有翻译失败: {e}")
+                from_db = {}
+            for text, translation in from_db.items():
+                if translation:
+                    found[text] = translation
+                    self.put(text, translation)
+
+        unique = set(texts)
+        self.hits += sum(1 for text in unique if text in found)
+        self.misses += sum(1 for text in unique if text not in found)
+        return found
+
+    def get(self, text):
+        """查找单条原文的译文，未命中返回 None"""
+        return self.get_many([text]).get(text)
+
+    def put(self, text, translation):
+        """写入缓存 (空译文不缓存，避免把失败结果固化下来)"""
+        if not text or not translation:
+            return
+        key = self.key(text)
+        with self._lock:
+            self._remember(key, translation)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, translation) VALUES (?, ?)",
+                    (key, translation)
+                )
+                self._conn.commit()
+            except Exception as e:
+                print(f"[翻译缓存] 写入本地缓存失败: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        if self.hits or self.misses:
+            print(f"[翻译缓存] 命中 {self.hits} 次，未命中 {self.misses} 次")
@@ -0,0 +1,88 @@
+"""
+翻译流水线
+抓取线程把推文放进队列后立即返回，后台线程按批次 (数量或等待时间) 攒够后
+一次性调用批量翻译，再逐条保存，使翻译与抓取并行进行
+"""
+import time
+import queue
+import threading
+
+# 队列结束标记
+_STOP = object()
+
+
+class TranslationPipeline:
+    """
+    批量翻译流水线
+    - translate_batch: 传入原文列表，返回等长的译文列表 (失败项为 None)
+    - save: 保存单条推文的函数，推文中已带 content_zh 字段
+    - batch_size / max_wait: 攒够 batch_size 条或等待超过 max_wait 秒即发送一批
+    """
+
+    def __init__(self, translate_batch, save, batch_size=8, max_wait=2.0):
+        self.translate_batch = translate_batch
+        self.save = save
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='translation-pipeline', daemon=True)
+        self._thread.start()
+
+        # 统计信息
+        self.batches = 0
+        self.translated = 0
+
+    def submit(self, tweet):
+        """提交一条待翻译并保存的推文 (立即返回)"""
+        self._queue.put(tweet)
+        return True
+
+    def close(self):
+        """处理完队列中剩余的推文后停止后台线程"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.batches:
+            print(f"[翻译] 流水线已关闭 (共 {self.batches} 批，{self.translated} 条推文)")
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch.append(item)
+
+            deadline = time.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._process(batch)
+
+    def _process(self, batch):
+        try:
+            translations = self.translate_batch([tweet['content'] for tweet in batch])
+        except Exception as e:
+            print(f"[翻译] 批量翻译异常: {e}")
+            translations = [None] * len(batch)
+
+        self.batches += 1
+        self.translated += len(batch)
+
+        for tweet, content_zh in zip(batch, translations):
+            tweet['content_zh'] = content_zh
+            try:
+                self.save(tweet)
+            except Exception as e:
+                print(f"[翻译] 保存推文 {tweet.get('guid')} 失败: {e}")
@@ -0,0 +1,262 @@
+"""
+Nitter 页面提取引擎
+时间线条目 (.timeline-item) 和单条推文页 (.main-tweet) 共用同一套提取逻辑:
+- 用 lxml 解析 (比 BeautifulSoup 的 html.parser 快一个数量级)
+- 每个条目只做一次树遍历 (iterwalk)，用祖先栈判断 "容器内的元素"，不再逐个执行 select
+- DOM 规则 (CSS 类名等) 集中在 ExtractionRules 中，可按实例注册不同规则
+
+视频地址按以下顺序取第一个命中的:
+data-url (Nitter 主要方式) -> video src -> video 内的 source -> 指向 .mp4 / .m3u8 的链接
+"""
+import re
+import urllib.parse
+from urllib.parse import unquote
+import lxml.html
+from lxml import etree
+
+# 按空白分隔的 class 中包含某个类名 (XPath 1.0 写法)
+_HAS_CLASS = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+_TEXT = etree.XPath('.//text()')
+
+
+class ExtractionRules:
+    """
+    一个 Nitter 前端的 DOM 规则
+    image_containers 中每项为类名元组，元素同时带有这些类名即视为图片容器 (如 .attachment.image)
+    """
+
+    def __init__(self, item='timeline-item', main='main-tweet', content='tweet-content', link='tweet-link',
+                 date='tweet-date', username='username', pinned='pinned', retweet='retweet-header',
+                 more='show-more',
+                 image_containers=(('attachment', 'image'), ('tweet-image',), ('still-image',), ('attachments',)),
+                 video_indicators=('video-container', 'video-overlay'),
+                 skip_image_parents=('avatar', 'profile'),
+                 skip_image_srcs=('emoji', 'hashtag_click')):
+        self.content = content
+        self.link = link
+        self.date = date
+        self.username = username
+        self.pinned = pinned
+        self.retweet = retweet
+        self.image_containers = [frozenset(classes) for classes in image_containers]
+        self.video_indicators = frozenset(video_indicators)
+        self.skip_image_parents = skip_image_parents
+        self.skip_image_srcs = skip_image_srcs
+
+        # 页面级查询预先编译
+        self.find_items = etree.XPath(f"//*[{_HAS_CLASS.format(item)}]")
+        self.find_main = etree.XPath(f"(//*[{_HAS_CLASS.format(main)}])[1]")
+        self.find_more = etree.XPath(f"//*[{_HAS_CLASS.format(more)}]//a[contains(@href, 'cursor=')]")
+
+
+DEFAULT_RULES = ExtractionRules()
+_RULES = {}
+
+
+def register_rules(host, rules):
+    """为某个实例 (域名) 注册专用规则"""
+    _RULES[host.lower()] = rules
+
+
+def rules_for(instance):
+    host = urllib.parse.urlparse(instance).netloc.lower()
+    return _RULES.get(host, DEFAULT_RULES)
+
+
+def absolute_url(url, instance):
+    """补全协议相对地址 (//) 和站内路径 (/)"""
+    if url.startswith('//'):
+        return 'https:' + url
+    if url.startswith('/'):
+        return instance.rstrip('/') + url
+    return url
+
+
+def get_original_image_url(nitter_url):
+    """尝试从 Nitter 的代理 URL 中还原出 Twitter/X 的原始图片地址"""
+    try:
+        if 'pbs.twimg.com' in nitter_url:
+            return nitter_url
+
+        # 处理 hex 编码
+        if '/pic/enc/' in nitter_url:
+            enc_part = nitter_url.split('/pic/enc/')[-1].split('?')[0]
+            try:
+                decoded = bytes.fromhex(enc_part).decode('utf-8')
+                if 'pbs.twimg.com' in decoded:
+                    return decoded
+            except:
+                pass
+
+        # 处理标准 Nitter 路径
+        path = urllib.parse.unquote(nitter_url)
+
+        if '/media/' in path:
+            media_part = path.split('/media/')[-1].split('?')[0]
+            if '.' in media_part:
+                media_id, ext = media_part.rsplit('.', 1)
+                ext = ext.split('&')[0].split('?')[0]
+                return f"https://pbs.twimg.com/media/{media_id}?format={ext}&name=large"
+
+        if 'pbs.twimg.com' in path:
+            match = re.search(r'(pbs\.twimg\.com/media/[^?&]+)', path)
+            if match:
+                return "https://" + match.group(1)
+
+    except Exception as e:
+        print(f"[图片解析] 还原 URL 失败 {nitter_url}: {e}")
+
+    return nitter_url
+
+
+def _text(el):
+    """与 BeautifulSoup 的 get_text(strip=True) 一致: 每段文字去掉首尾空白后直接拼接"""
+    return ''.join(part.strip() for part in _TEXT(el))
+
+
+def _video_data_url(data_url, instance):
+    """解析 <video data-url>: /video/ID/<编码后的真实地址> 或普通地址"""
+    if data_url.startswith('/video/'):
+        parts = data_url.split('/', 3)
+        return unquote(parts[3]) if len(parts) > 3 else None
+    return absolute_url(data_url, instance)
+
+
+def extract_item(node, instance, rules=None):
+    """
+    从一个推文节点 (时间线条目或 .main-tweet) 提取推文记录，只遍历一次子树
+    返回字典:
+      tweet_id, link_href, content (无内容元素时为 None), published, author (无用户名元素时为 None),
+      is_pinned, is_retweet, images, video_url, video_method, poster, has_video_indicator
+    """
+    rules = rules or rules_for(instance)
+
+    content_el = link_el = date_link = author_el = video_el = None
+    source_src = video_link = None
+    is_pinned = is_retweet = has_video_indicator = False
+    images = []
+
+    # 祖先栈: (class 字符串, 是否图片容器, 是否 .tweet-date, 是否 <video>)
+    stack = []
+    image_depth = date_depth = video_depth = 0
+
+    for event, el in etree.iterwalk(node, events=('start', 'end')):
+        tag = el.tag
+        if not isinstance(tag, str):
+            # 注释 / 处理指令
+            continue
+
+        if event == 'end':
+            _, in_image, in_date, in_video = stack.pop()
+            image_depth -= in_image
+            date_depth -= in_date
+            video_depth -= in_video
+            continue
+
+        class_attr = el.get('class') or ''
+        classes = frozenset(class_attr.split()) if class_attr else frozenset()
+
+        if classes:
+            if rules.pinned in classes:
+                is_pinned = True
+            if rules.retweet in classes:
+                is_retweet = True
+            if content_el is None and rules.content in classes:
+                content_el = el
+            if link_el is None and rules.link in classes:
+                link_el = el
+            if author_el is None and rules.username in classes:
+                author_el = el
+            if classes & rules.video_indicators:
+                has_video_indicator = True
+
+        if tag == 'img' and image_depth:
+            parent_class = stack[-1][0] if stack else ''
+            src = el.get('src', '')
+            if src and not any(c in parent_class for c in rules.skip_image_parents):
+                if not any(s in src.lower() for s in rules.skip_image_srcs):
+                    images.append(get_original_image_url(absolute_url(src, instance)))
+        elif tag == 'a':
+            if date_link is None and date_depth:
+                date_link = el
+            if video_link is None:
+                href = el.get('href', '')
+                if '.mp4' in href or '.m3u8' in href:
+                    video_link = href
+        elif tag == 'video':
+            has_video_indicator = True
+            if video_el is None:
+                video_el = el
+        elif tag == 'source' and video_depth and source_src is None:
+            source_src = el.get('src', '')
+
+        in_image = any(container <= classes for container in rules.image_containers) if classes else False
+        in_date = rules.date in classes
+        in_video = tag == 'video'
+        stack.append((class_attr, in_image, in_date, in_video))
+        image_depth += in_image
+        date_depth += in_date
+        video_depth += in_video
+
+    video_url = video_method = poster = None
+    if video_el is not None:
+        data_url = video_el.get('data-url', '')
+        if data_url:
+            video_url = _video_data_url(data_url, instance)
+            video_method = 'data-url'
+        if not video_url and video_el.get('src', ''):
+            video_url = absolute_url(video_el.get('src'), instance)
+            video_method = 'src'
+        if video_el.get('poster', ''):
+            poster = get_original_image_url(absolute_url(video_el.get('poster'), instance))
+    if not video_url and source_src:
+        video_url = absolute_url(source_src, instance)
+        video_method = 'source'
+    if not video_url and video_link:
+        video_url = absolute_url(video_link, instance)
+        video_method = 'link'
+
+    link_href = link_el.get('href', '') if link_el is not None else None
+    tweet_id = None
+    if link_href is not None:
+        tweet_id = link_href.split('/status/')[-1].split('#')[0] if '/status/' in link_href else link_href
+
+    return {
+        'tweet_id': tweet_id,
+        'link_href': link_href,
+        'content': _text(content_el) if content_el is not None else None,
+        'published': date_link.get('title', '') if date_link is not None else 'Unknown Time',
+        'author': _text(author_el) if author_el is not None else None,
+        'is_pinned': is_pinned,
+        'is_retweet': is_retweet,
+        'images': images,
+        'video_url': video_url,
+        'video_method': video_method,
+        'poster': poster,
+        'has_video_indicator': has_video_indicator,
+    }
+
+
+def extract_timeline(html, instance, scan=None, rules=None):
+    """
+    提取时间线页面
+    scan: 最多提取多少个条目 (None 表示整页)
+    返回: (推文记录列表, "Load more" 链接 或 None)
+    """
+    rules = rules or rules_for(instance)
+    root = lxml.html.fromstring(html)
+    more_links = rules.find_more(root)
+    next_href = more_links[-1].get('href') if more_links else None
+    items = rules.find_items(root)
+    if scan:
+        items = items[:scan]
+    return [extract_item(item, instance, rules) for item in items], next_href
+
+
+def extract_status(html, instance, rules=None):
+    """提取单条推文页面的主推文，没有 .main-tweet 时返回 None"""
+    rules = rules or rules_for(instance)
+    main = rules.find_main(lxml.html.fromstring(html))
+    if not main:
+        return None
+    return extract_item(main[0], instance, rules)
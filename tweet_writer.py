@@ -0,0 +1,133 @@
+"""
+推文批量写入
+缓冲待保存的推文行，攒够 batch_size 条或距上次写入超过 flush_interval 秒时，
+用 execute_values 一次多行 upsert，减少与 Neon 之间的往返
+"""
+import time
+import threading
+from contextlib import nullcontext
+from psycopg2.extras import execute_values
+
+# 与 build_tweet_row() 返回的元组顺序一致
+TWEET_COLUMNS = (
+    'tweet_id', 'author', 'content', 'content_zh', 'published_at',
+    'is_retweet', 'images', 'video_url', 'source_url', 'media_pending'
+)
+
+# 重新抓取时如果媒体还待处理 (media_pending)，新行的 images 只是未处理的原始图片，保留库里已有的 images，
+# 等媒体工作线程处理完再由 update_tweet_media 覆盖
+# 库里的媒体已经处理完 (media_pending = FALSE) 且视频没变时保持 FALSE: 缓冲的行可能在媒体工作线程更新之后才写入，
+# 不能把待定标记重新置回 TRUE (否则下次运行会重新生成封面)
+UPSERT_TWEETS_SQL = f"""
+    INSERT INTO tweets ({', '.join(TWEET_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (tweet_id)
+    DO UPDATE SET
+        content = EXCLUDED.content,
+        content_zh = COALESCE(EXCLUDED.content_zh, tweets.content_zh),
+        images = CASE WHEN EXCLUDED.media_pending THEN tweets.images ELSE EXCLUDED.images END,
+        video_url = EXCLUDED.video_url,
+        source_url = EXCLUDED.source_url,
+        media_pending = EXCLUDED.media_pending AND (
+            tweets.media_pending OR EXCLUDED.video_url IS DISTINCT FROM tweets.video_url
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    RETURNING id, tweet_id, video_url;
+"""
+
+
+def upsert_tweet_rows(conn, rows):
+    """多行 upsert 并提交，返回 [(id, tweet_id, video_url), ...]"""
+    cursor = conn.cursor()
+    try:
+        returned = execute_values(cursor, UPSERT_TWEETS_SQL, rows, page_size=max(1, len(rows)), fetch=True)
+        conn.commit()
+        return returned
+    finally:
+        cursor.close()
+
+
+class TweetWriter:
+    """
+    缓冲式批量写入器
+    - connection: 返回数据库连接上下文管理器的函数 (例如连接池的 db_connection)
+    - verify: 写入后核对视频 URL 是否落库 (利用 RETURNING，无需额外查询)
+    - timer: 可选的计时函数 timer(stage) -> 上下文管理器，记录每次批量写入 (db_upsert) 耗时
+    同一批内重复的 tweet_id 只保留最后一条，避免 ON CONFLICT 同批冲突
+    """
+
+    def __init__(self, connection, batch_size=20, flush_interval=5.0, verify=False, timer=None):
+        self.connection = connection
+        self.timer = timer or (lambda stage: nullcontext())
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.verify = verify
+
+        self._buffer = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.time()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._run_timer, name='tweet-writer', daemon=True)
+        self._timer.start()
+
+        # 统计信息
+        self.written = 0
+        self.flushes = 0
+
+    def add(self, row):
+        """加入一行 (TWEET_COLUMNS 顺序的元组)，缓冲区满时立即写入"""
+        with self._lock:
+            self._buffer[row[0]] = row
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+        return True
+
+    def flush(self):
+        """写入缓冲区中的所有行；失败时放回缓冲区等待下次重试"""
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer.values())
+                self._buffer = {}
+                self._last_flush = time.time()
+            if not rows:
+                return 0
+
+            try:
+                with self.timer('db_upsert'), self.connection() as conn:
+                    returned = upsert_tweet_rows(conn, rows)
+            except Exception as e:
+                print(f"[数据库] ❌ 批量写入 {len(rows)} 条推文失败: {e}")
+                with self._lock:
+                    for row in rows:
+                        self._buffer.setdefault(row[0], row)
+                return 0
+
+            self.flushes += 1
+            self.written += len(returned)
+            print(f"[数据库] ✅ 批量写入 {len(returned)} 条推文")
+
+            if self.verify:
+                expected = {row[0]: row[TWEET_COLUMNS.index('video_url')] for row in rows}
+                for _, tweet_id, saved_video_url in returned:
+                    if expected.get(tweet_id) and not saved_video_url:
+                        print(f"[数据库] ⚠️  警告: 推文 {tweet_id} 的视频 URL 未能保存到数据库！")
+            return len(returned)
+
+    def _run_timer(self):
+        while not self._closed.wait(min(1.0, self.flush_interval)):
+            with self._lock:
+                due = self._buffer and time.time() - self._last_flush >= self.flush_interval
+            if due:
+                self.flush()
+
+    def close(self):
+        """停止定时器并写入剩余数据"""
+        self._closed.set()
+        self._timer.join()
+        self.flush()
+        if self._buffer:
+            print(f"[数据库] ⚠️  仍有 {len(self._buffer)} 条推文未能写入")
+        if self.flushes:
+            print(f"[数据库] 批量写入器已关闭 (共 {self.flushes} 批，{self.written} 条推文)")
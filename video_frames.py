@@ -0,0 +1,238 @@
+"""
+流式视频取帧
+不下载整个 MP4:
+1. 用 HTTP Range 请求读取 moov 盒 (通常只有几十 KB，位于文件头或文件尾)，
+   从视频轨的 stts / stss 表算出时长和关键帧时间
+2. 把 URL 直接交给 OpenCV 的 FFmpeg 后端 (可寻址的 HTTP 输入，按需发 Range 请求)，
+   跳到目标时间只解码一帧，全程在内存中完成；FFmpeg 发出的请求带上与 Range 探测相同的 User-Agent
+early_keyframe=True 时取开头附近 (early_offset 秒之后) 的第一个关键帧，而不是正中间那一帧，
+关键帧无需解码前面的帧，读取的数据最少
+"""
+import os
+import struct
+import threading
+import requests
+import cv2
+
+# moov 盒最大读取大小，超过视为异常文件
+MAX_MOOV_SIZE = 16 * 1024 * 1024
+# 首次读取文件头的字节数
+HEAD_SIZE = 64 * 1024
+# OpenCV 在打开 FFmpeg 输入时读取这个环境变量 ("键;值|键;值")
+FFMPEG_OPTIONS_ENV = 'OPENCV_FFMPEG_CAPTURE_OPTIONS'
+# 环境变量是进程级的，多个媒体线程同时打开视频时串行设置
+_capture_lock = threading.Lock()
+
+
+class RangeNotSupported(Exception):
+    """服务器不支持 Range 请求"""
+
+
+def fetch_range(session, url, start, end, headers=None):
+    """读取 [start, end] 字节 (含 end)，服务器忽略 Range 返回 200 时抛出 RangeNotSupported"""
+    request_headers = dict(headers or {})
+    request_headers['Range'] = f'bytes={start}-{end}'
+    with session.get(url, headers=request_headers, stream=True, timeout=20) as response:
+        if response.status_code == 200:
+            raise RangeNotSupported('status 200')
+        response.raise_for_status()
+        return response.raw.read(end - start + 1, decode_content=True)
+
+
+def _box_header(data, offset):
+    """解析盒头，返回 (盒大小, 类型, 头长度)；数据不足返回 None"""
+    if offset + 8 > len(data):
+        return None
+    size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+    header = 8
+    if size == 1:
+        if offset + 16 > len(data):
+            return None
+        size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+        header = 16
+    return size, box_type, header
+
+
+def read_moov(session, url, headers=None):
+    """通过 Range 请求找到并读取 moov 盒，返回其内容 (不含盒头)"""
+    data = fetch_range(session, url, 0, HEAD_SIZE - 1, headers)
+    base = 0
+    offset = 0
+    while True:
+        parsed = _box_header(data, offset - base)
+        if parsed is None:
+            # 盒头不在已读数据里 (例如 mdat 之后)，单独读取下一个盒头
+            data = fetch_range(session, url, offset, offset + 15, headers)
+            base = offset
+            parsed = _box_header(data, 0)
+            if parsed is None:
+                return None
+        size, box_type, header = parsed
+        if size < header:
+            # size 为 0 表示盒延伸到文件尾，后面不会再有 moov；其余为损坏的盒
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                return None
+            local = offset - base
+            if local + size <= len(data):
+                return data[local + header:local + size]
+            return fetch_range(session, url, offset + header, offset + size - 1, headers)
+        offset += size
+
+
+def _children(data):
+    offset = 0
+    while offset + 8 <= len(data):
+        parsed = _box_header(data, offset)
+        if parsed is None:
+            # 64 位盒头被截断
+            return
+        size, box_type, header = parsed
+        if size < header:
+            return
+        yield box_type, data[offset + header:offset + size]
+        offset += size
+
+
+def _find_video_stbl(moov):
+    """返回视频轨的 (timescale, stbl 子盒字典)"""
+    for box_type, trak in _children(moov):
+        if box_type != b'trak':
+            continue
+        mdia = dict(_children(trak)).get(b'mdia')
+        if not mdia:
+            continue
+        mdia_boxes = dict(_children(mdia))
+        hdlr = mdia_boxes.get(b'hdlr')
+        if not hdlr or hdlr[8:12] != b'vide':
+            continue
+        mdhd = mdia_boxes.get(b'mdhd', b'')
+        if mdhd[:1] == b'\x01':
+            timescale = struct.unpack('>I', mdhd[20:24])[0]
+        else:
+            timescale = struct.unpack('>I', mdhd[12:16])[0]
+        minf = mdia_boxes.get(b'minf')
+        stbl = dict(_children(minf)).get(b'stbl') if minf else None
+        if stbl:
+            return timescale, dict(_children(stbl))
+    return None, None
+
+
+def video_timing(moov):
+    """
+    从 moov 解析视频轨时间信息
+    返回 (时长秒数, 关键帧时间列表 (秒))；没有 stss 表表示每一帧都是关键帧，返回 None
+    """
+    timescale, stbl = _find_video_stbl(moov)
+    if not timescale or not stbl or b'stts' not in stbl:
+        return None, None
+
+    # stts: (样本数, 每个样本时长) 列表
+    stts = stbl[b'stts']
+    entry_count = struct.unpack('>I', stts[4:8])[0]
+    runs = [struct.unpack('>II', stts[8 + i * 8:16 + i * 8]) for i in range(entry_count)]
+    duration = sum(count * delta for count, delta in runs) / timescale
+
+    stss = stbl.get(b'stss')
+    if not stss:
+        return duration, None
+    sync_count = struct.unpack('>I', stss[4:8])[0]
+    sync_samples = struct.unpack(f'>{sync_count}I', stss[8:8 + sync_count * 4])
+
+    # 样本编号 (从 1 开始) -> 解码时间
+    keyframes = []
+    wanted = iter(sync_samples)
+    target = next(wanted, None)
+    sample = 1
+    elapsed = 0
+    for count, delta in runs:
+        while target is not None and target < sample + count:
+            keyframes.append((elapsed + (target - sample) * delta) / timescale)
+            target = next(wanted, None)
+        sample += count
+        elapsed += count * delta
+    return duration, keyframes
+
+
+def pick_time(duration, keyframes, early_keyframe=False, early_offset=1.0):
+    """选择取帧时间 (秒)"""
+    if not early_keyframe:
+        return duration / 2
+    if not keyframes:
+        return min(early_offset, duration / 2)
+    # 开头往往是黑屏或片头，取 early_offset 之后的第一个关键帧，没有就取最后一个
+    for t in keyframes:
+        if t >= early_offset:
+            return t
+    return keyframes[-1]
+
+
+def open_capture(url, user_agent=None):
+    """
+    用 FFmpeg 后端打开视频，HTTP 请求带上指定的 User-Agent
+    (OpenCV 不支持按次传参，只能在打开期间临时设置 OPENCV_FFMPEG_CAPTURE_OPTIONS)
+    不带 User-Agent 时同样持锁打开，避免读到其他线程临时设置的 UA
+    """
+    with _capture_lock:
+        if not user_agent:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        user_agent = user_agent.replace('|', ' ')
+        previous = os.environ.get(FFMPEG_OPTIONS_ENV)
+        options = [previous] if previous else []
+        os.environ[FFMPEG_OPTIONS_ENV] = '|'.join(options + [f'user_agent;{user_agent}'])
+        try:
+            return cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+        finally:
+            if previous is None:
+                os.environ.pop(FFMPEG_OPTIONS_ENV, None)
+            else:
+                os.environ[FFMPEG_OPTIONS_ENV] = previous
+
+
+def grab_frame(video_url, early_keyframe=False, early_offset=1.0, user_agent=None, session=None):
+    """
+    流式读取视频的一帧，返回 BGR 图像 (numpy 数组)，失败返回 None
+    优先用 moov 算出目标时间；服务器不支持 Range 或解析失败时按帧数取中间帧
+    Range 探测和 FFmpeg 解码使用同一个 User-Agent，避免 CDN 只放行其中一种请求
+    """
+    session = session or requests
+    headers = {'User-Agent': user_agent} if user_agent else None
+
+    target_seconds = None
+    try:
+        moov = read_moov(session, video_url, headers)
+        if moov:
+            duration, keyframes = video_timing(moov)
+            if duration:
+                target_seconds = pick_time(duration, keyframes, early_keyframe, early_offset)
+    except RangeNotSupported as e:
+        print(f"[视频] 服务器不支持 Range 请求 ({e})，由 FFmpeg 直接读取")
+    except Exception as e:
+        print(f"[视频] 解析 moov 失败: {e}")
+
+    cap = open_capture(video_url, user_agent)
+    try:
+        if not cap.isOpened():
+            return None
+        if target_seconds is not None:
+            cap.set(cv2.CAP_PROP_POS_MSEC, target_seconds * 1000)
+        else:
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if frame_count > 1:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count // 2)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
+def frame_dhash(frame):
+    """帧的 64 位差值哈希 (dHash)，画面相同但编码细节不同的帧得到相同的哈希"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f'{value:016x}'